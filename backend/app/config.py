@@ -0,0 +1,115 @@
+"""
+应用配置（可通过环境变量覆盖，前缀 CLAW_）
+"""
+
+from typing import Literal, Optional
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """运行时配置"""
+
+    model_config = SettingsConfigDict(env_prefix="CLAW_")
+
+    # Docker Engine API：优先直连 unix socket，socket 不存在（如 Windows）或关闭时回退 docker CLI
+    docker_use_api: bool = True
+    docker_socket: str = "/var/run/docker.sock"
+    docker_api_version: str = "v1.41"
+    docker_api_max_connections: int = 20
+    docker_api_timeout: float = 30.0
+    # 守护进程健康探测：正常时的探测间隔、不可用时退避的最大间隔、单次超时（秒）；
+    # 缓存超过 TTL（后台探测未运行）时状态接口会先探测一次
+    docker_health_interval: float = 10.0
+    docker_health_max_backoff: float = 60.0
+    docker_health_timeout: float = 5.0
+    docker_health_ttl: float = 120.0
+
+    # SQLite：连接池与数据库线程池大小、锁等待超时（毫秒）、mmap 大小（字节）
+    db_pool_size: int = 4
+    db_busy_timeout: int = 5000
+    db_mmap_size: int = 256 * 1024 * 1024
+
+    # compose 布局：single 为根目录单个 docker-compose.yml；per_instance 为每实例
+    # instances/<id>/compose.yml 独立项目，共享外部网络 openclaw-net。
+    # 切换布局前需先停止并删除旧布局创建的容器（容器名相同会冲突）
+    compose_layout: Literal["single", "per_instance"] = "single"
+
+    # 批量操作：并发上限与每次 docker compose 调用合并的服务数
+    batch_parallelism: int = 4
+    batch_chunk_size: int = 10
+
+    # 备份：incremental 为内容寻址增量存储（清单 + 去重块），full 为整包 ZIP
+    backup_mode: Literal["incremental", "full"] = "incremental"
+    # 块压缩算法（zlib / zstd / none，zstd 需安装可选依赖 zstandard）与级别；
+    # 哈希与压缩使用 backup_workers 个线程并行，默认等于 CPU 核数
+    backup_codec: Literal["zlib", "zstd", "none"] = "zlib"
+    backup_compress_level: int = 6
+    backup_workers: Optional[int] = None
+    # offline 为整体停机备份；hot 为逐实例暂停-快照-恢复，快照在后台归档（需 incremental 存储）
+    backup_strategy: Literal["offline", "hot"] = "offline"
+    # 热备份同时快照的实例数，以及快照方式（hardlink 更快，但实例恢复后原地修改文件会影响快照）
+    backup_parallelism: int = 2
+    backup_snapshot: Literal["copy", "hardlink"] = "copy"
+    # 恢复时并行还原的实例数
+    restore_parallelism: int = 4
+
+    # 实时日志：每实例环形缓冲保留的最近行数，以及每个订阅者的队列长度
+    log_buffer_lines: int = 1000
+    log_subscriber_queue: int = 1000
+    # 日志归档：后台采集运行中实例的日志，写入 instances/<id>/logs/ 下按时间分段的压缩文件。
+    # 分段按压缩后大小或时长轮转；每 log_block_bytes（或每 log_flush_seconds 秒）写出一块并记一条索引
+    log_archive_enabled: bool = True
+    log_segment_bytes: int = 64 * 1024 * 1024
+    log_segment_seconds: int = 86400
+    log_block_bytes: int = 256 * 1024
+    log_flush_seconds: float = 5.0
+    log_retention_days: int = 30
+
+    # 事件推送（SSE）：回放缓冲保留的事件数、每个订阅者的队列长度、空闲时心跳间隔（秒）
+    event_replay_size: int = 1000
+    event_queue_size: int = 256
+    event_keepalive: float = 15.0
+
+    # 已解析 openclaw.json 的缓存条目上限（LRU）
+    config_cache_size: int = 256
+
+    # 分配网关端口时跳过宿主机上已被其他进程监听的端口
+    port_check_host: bool = True
+
+    # Prometheus 指标：是否采集容器资源使用（每个运行中容器一条 stats 流，独立连接池），
+    # 容器列表校正间隔（秒），同时保持的 stats 流上限
+    metrics_container_stats: bool = True
+    metrics_sync_interval: float = 30.0
+    metrics_max_streams: int = 256
+
+    # 后台任务：各任务池的并发上限（备份/恢复共用 backup 池，互斥执行），未列出的池取默认值；
+    # 已结束任务记录的保留天数
+    job_concurrency: dict[str, int] = {"backup": 1, "instance": 4}
+    job_default_concurrency: int = 2
+    job_retention_days: int = 7
+
+    # 网关 RPC：后端直连各实例发布的网关端口（而非在容器内 exec node），每实例复用一条 WebSocket。
+    # 连接/请求超时、空闲连接关闭时间、设备列表缓存时间（秒）与协议版本
+    gateway_host: str = "127.0.0.1"
+    gateway_timeout: float = 10.0
+    gateway_idle_timeout: float = 300.0
+    gateway_devices_ttl: float = 5.0
+    gateway_protocol_version: int = 3
+    # 网关健康探测：http 请求 gateway_probe_path（需收到 HTTP 响应，5xx 视为异常）；
+    # tcp 仅检查端口可连接，经 docker-proxy 发布的端口在网关监听前就能连上，只适合不经 docker-proxy 的部署。
+    # 后台探测运行中实例的间隔（0 关闭）、同时进行的探测数（即连接数）上限、单次超时（秒）；
+    # 启动实例并等待就绪时的默认最长等待时间（秒）
+    gateway_probe_mode: Literal["tcp", "http"] = "http"
+    gateway_probe_path: str = "/"
+    gateway_probe_interval: float = 15.0
+    gateway_probe_concurrency: int = 64
+    gateway_probe_timeout: float = 3.0
+    gateway_ready_timeout: float = 60.0
+
+    # 实例预热池：预先占用端口并生成目录与默认配置的槽位数，创建实例时直接认领。
+    # 槽位会长期占用端口对，默认 0（关闭），需要时通过 CLAW_WARM_POOL_SIZE 开启
+    warm_pool_size: int = 0
+
+
+settings = Settings()
@@ -2,14 +2,22 @@
 数据库连接和会话管理
 """
 
-import os
+import asyncio
+import functools
+import sqlite3
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, TypeVar
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker
 
+from app.config import settings
 from app.models import Base
 
+T = TypeVar("T")
+
 # 项目根目录（backend 的上一级），用于 docker-compose、instances 等路径
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 
@@ -17,20 +25,126 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 DB_PATH = Path(__file__).parent.parent / "data" / "openclaw.db"
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-# 创建引擎
+# 创建引擎（连接池大小与数据库线程池一致）
 engine = create_engine(
     f"sqlite:///{DB_PATH}",
     echo=False,
-    connect_args={"check_same_thread": False},
+    connect_args={"check_same_thread": False, "timeout": settings.db_busy_timeout / 1000},
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_pool_size,
 )
 
-# 会话工厂
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@event.listens_for(engine, "connect")
+def _sqlite_pragmas(dbapi_conn, _record) -> None:
+    """WAL 模式下读写互不阻塞；synchronous=NORMAL 在 WAL 下仍可保证崩溃一致性"""
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={settings.db_busy_timeout}")
+    cursor.execute(f"PRAGMA mmap_size={settings.db_mmap_size}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+# 会话工厂；提交后不使对象过期，路由在事件循环中读取属性时不会再触发阻塞查询
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# 数据库专用线程池：阻塞的查询与提交放到这里执行，不占用事件循环
+_db_executor = ThreadPoolExecutor(settings.db_pool_size, thread_name_prefix="db")
+
+
+async def run_db(func: Callable[..., T], *args, **kwargs) -> T:
+    """在数据库线程池中执行同步的数据库操作，如 await run_db(db.commit)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(func, *args, **kwargs))
 
 
 def init_db() -> None:
     """初始化数据库，创建所有表"""
     Base.metadata.create_all(bind=engine)
+    _migrate()
+
+
+def _migrate() -> None:
+    """create_all 不会修改已存在的表：为旧库补齐新增的列与索引（新增列均为可空列）"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    col_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}'))
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+
+def snapshot_database(dest: Path, clear_tables: tuple[str, ...] = ()) -> None:
+    """用 SQLite 在线备份 API 把数据库复制到 dest（同步阻塞），并清空快照中的 clear_tables。
+    直接复制文件会漏掉仍在 -wal 中、尚未检查点的事务"""
+    with closing(sqlite3.connect(DB_PATH)) as src, closing(sqlite3.connect(dest)) as dst:
+        src.backup(dst)
+        for name in clear_tables:
+            dst.execute(f'DELETE FROM "{name}"')
+        dst.commit()
+
+
+def restore_database(src: Path, keep_tables: tuple[str, ...] = ("jobs", "backups")) -> None:
+    """把 src（备份中的数据库）的内容原地还原到当前数据库（同步阻塞），keep_tables 中的表保留当前内容。
+
+    在同一个 IMMEDIATE 事务中逐表清空并从 src 复制：其他连接的写入按 busy_timeout 等待，
+    读取在提交前仍看到旧数据；不删除或替换数据库文件，连接池中正在使用的连接不受影响。
+    jobs 表记录的是本进程正在执行的任务（包括当前这次恢复），backups 表对应备份目录中现有的文件，
+    两者都不能回退到备份时的状态。旧备份缺少的表视为空表，缺少的列取默认值。
+    """
+    init_db()
+    with closing(sqlite3.connect(
+        DB_PATH, timeout=settings.db_busy_timeout / 1000, isolation_level=None
+    )) as conn:
+        conn.execute("ATTACH DATABASE ? AS restored", (str(src),))
+        try:
+            restored = {
+                row[0] for row in conn.execute("SELECT name FROM restored.sqlite_master WHERE type = 'table'")
+            }
+            tables = [t for t in Base.metadata.sorted_tables if t.name not in keep_tables]
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for table in reversed(tables):
+                    conn.execute(f'DELETE FROM main."{table.name}"')
+                for table in tables:
+                    if table.name not in restored:
+                        continue
+                    columns, values, params = _restore_columns(conn, table)
+                    conn.execute(
+                        f'INSERT INTO main."{table.name}" ({columns}) SELECT {values} FROM restored."{table.name}"',
+                        params,
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.execute("DETACH DATABASE restored")
+
+
+def _restore_columns(conn: sqlite3.Connection, table) -> tuple[str, str, list]:
+    """从 restored 复制 table 时的 (列名, SELECT 表达式, 参数)：旧备份缺少的列按模型默认值填充"""
+    available = {row[1] for row in conn.execute(f'PRAGMA restored.table_info("{table.name}")')}
+    columns, values, params = [], [], []
+    for column in table.columns:
+        default = column.default
+        if column.name in available:
+            values.append(f'"{column.name}"')
+        elif default is not None and (default.is_scalar or default.is_callable):
+            value = default.arg(None) if default.is_callable else default.arg
+            process = column.type.bind_processor(engine.dialect)
+            values.append("?")
+            params.append(process(value) if process else value)
+        else:
+            continue
+        columns.append(f'"{column.name}"')
+    return ", ".join(columns), ", ".join(values), params
 
 
 def get_db():
@@ -8,6 +8,7 @@ import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 
 # 配置应用日志，便于排查问题
 logging.basicConfig(
@@ -18,7 +19,20 @@ logging.basicConfig(
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.database import init_db
-from app.routers import instances, backups, system
+from app.routers import instances, backups, jobs, system
+from app.services.container_stats import container_stats
+from app.services.docker_api import close_docker_client
+from app.services.docker_health import docker_health
+from app.services.event_bus import event_bus
+from app.services.gateway_client import gateway_pool
+from app.services.gateway_health import gateway_health
+from app.services.job_handlers import job_manager
+from app.services.log_archive import log_archiver
+from app.services.log_broadcaster import log_hub
+from app.services.metrics import MetricsMiddleware, registry
+from app.services.port_allocator import port_allocator
+from app.services.state_cache import state_cache
+from app.services.warm_pool import warm_pool
 
 
 @asynccontextmanager
@@ -26,8 +40,36 @@ async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # 启动时初始化数据库
     init_db()
+    event_bus.start()
+    # 由数据库重建端口分配位图
+    port_allocator.load()
+    # 重新占用预热槽位的端口，并在后台补齐预热池
+    await warm_pool.start()
+    # 订阅 Docker 事件，维护实例状态缓存
+    await state_cache.start()
+    # 后台探测 Docker 守护进程健康状态
+    await docker_health.start()
+    # 后台归档运行中实例的日志
+    await log_archiver.start()
+    # 后台采集容器资源使用，供 /metrics 导出
+    await container_stats.start()
+    # 后台并发探测运行中实例的网关端口
+    await gateway_health.start()
+    # 恢复上次退出时未完成的后台任务
+    await job_manager.start()
     yield
     # 关闭时清理资源
+    event_bus.close()
+    await job_manager.stop()
+    await warm_pool.stop()
+    await log_archiver.stop()
+    await container_stats.stop()
+    await gateway_health.stop()
+    await state_cache.stop()
+    await docker_health.stop()
+    await log_hub.close()
+    await gateway_pool.close()
+    await close_docker_client()
 
 
 app = FastAPI(
@@ -46,10 +88,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 请求耗时指标
+app.add_middleware(MetricsMiddleware)
+
 # 注册路由
 app.include_router(instances.router, prefix="/api", tags=["instances"])
 app.include_router(backups.router, prefix="/api", tags=["backups"])
 app.include_router(system.router, prefix="/api", tags=["system"])
+app.include_router(jobs.router, prefix="/api", tags=["jobs"])
 
 
 @app.get("/")
@@ -66,3 +112,9 @@ async def root():
 async def health():
     """健康检查"""
     return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 指标（文本格式 0.0.4）"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
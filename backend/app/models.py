@@ -2,10 +2,11 @@
 SQLAlchemy 数据模型
 """
 
+import json
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import DateTime, Integer, String, create_engine
+from sqlalchemy import DateTime, Float, Integer, String, Text, create_engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker
 
 
@@ -21,7 +22,7 @@ class Instance(Base):
     id: Mapped[str] = mapped_column(String, primary_key=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
     port: Mapped[int] = mapped_column(Integer, nullable=False, unique=True)
-    status: Mapped[str] = mapped_column(String, default="created")  # created/running/stopped/error
+    status: Mapped[str] = mapped_column(String, default="created", index=True)  # created/running/stopped/error
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
@@ -47,7 +48,9 @@ class Backup(Base):
     filename: Mapped[str] = mapped_column(String, nullable=False)
     size: Mapped[int] = mapped_column(Integer, default=0)
     instance_count: Mapped[int] = mapped_column(Integer, default=0)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # 单实例备份对应的实例 ID；整体备份为空
+    instance_id: Mapped[Optional[str]] = mapped_column(String, nullable=True, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
 
     def to_dict(self) -> dict:
         """转换为字典"""
@@ -56,5 +59,43 @@ class Backup(Base):
             "filename": self.filename,
             "size": self.size,
             "instance_count": self.instance_count,
+            "instance_id": self.instance_id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+
+class Job(Base):
+    """后台任务记录：长耗时操作（备份、恢复、初始化、创建实例）异步执行，客户端按 ID 查询进度"""
+    __tablename__ = "jobs"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    kind: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    status: Mapped[str] = mapped_column(String, default="queued", index=True)  # queued/running/succeeded/failed
+    # 参数与结果均为 JSON 文本；参数中的敏感字段（如密码）不落库
+    params: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    result: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    progress: Mapped[float] = mapped_column(Float, default=0.0)
+    message: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    idempotency_key: Mapped[Optional[str]] = mapped_column(String, nullable=True, unique=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "params": json.loads(self.params) if self.params else {},
+            "result": json.loads(self.result) if self.result else None,
+            "error": self.error,
+            "progress": self.progress,
+            "message": self.message,
+            "attempts": self.attempts,
             "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
         }
@@ -1,4 +1,4 @@
 # 路由包初始化
-from app.routers import backups, instances, system
+from app.routers import backups, instances, jobs, system
 
-__all__ = ["instances", "backups", "system"]
+__all__ = ["instances", "backups", "jobs", "system"]
@@ -3,15 +3,16 @@
 """
 
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
-from app.database import get_db
-from app.models import Backup
+from app.database import get_db, run_db
+from app.models import Backup, Instance
+from app.routers.jobs import submit_job
 from app.schemas import ApiResponse, BackupResponse
-from app.services.backup_service import BackupService
+from app.services.backup_service import BackupService, backup_progress
 
 router = APIRouter()
 
@@ -19,30 +20,43 @@ router = APIRouter()
 @router.get("/backups", response_model=ApiResponse)
 async def get_backups(db: Session = Depends(get_db)):
     """获取备份列表"""
-    backups = db.query(Backup).order_by(Backup.created_at.desc()).all()
+    backups = await run_db(db.query(Backup).order_by(Backup.created_at.desc()).all)
     return ApiResponse(
         data={"backups": [b.to_dict() for b in backups]}
     )
 
 
-@router.post("/backups", response_model=ApiResponse)
-async def create_backup(db: Session = Depends(get_db)):
-    """创建备份"""
-    service = BackupService(db)
-    try:
-        backup = await service.create_backup()
-        return ApiResponse(
-            data={"backup": backup.to_dict()},
-            message="备份创建成功"
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@router.get("/backups/progress", response_model=ApiResponse)
+async def get_backup_progress():
+    """获取进行中备份的归档进度"""
+    return ApiResponse(data={"tasks": backup_progress.snapshot()})
+
+
+@router.post("/backups", response_model=ApiResponse, status_code=202)
+async def create_backup(response: Response, idempotency_key: Optional[str] = Header(None)):
+    """创建备份（后台任务）；重试时携带相同的 Idempotency-Key 不会重复备份"""
+    return await submit_job(response, "backup.create", {}, idempotency_key, "备份任务已提交")
+
+
+@router.post("/instances/{instance_id}/backup", response_model=ApiResponse, status_code=202)
+async def backup_instance(
+    instance_id: str,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """单实例热备份（后台任务，仅短暂暂停该实例）"""
+    if not await run_db(db.get, Instance, instance_id):
+        raise HTTPException(status_code=404, detail="实例不存在")
+    return await submit_job(
+        response, "backup.instance", {"instance_id": instance_id}, idempotency_key, "实例备份任务已提交"
+    )
 
 
 @router.delete("/backups/{backup_id}", response_model=ApiResponse)
 async def delete_backup(backup_id: int, db: Session = Depends(get_db)):
     """删除备份"""
-    backup = db.query(Backup).filter(Backup.id == backup_id).first()
+    backup = await run_db(db.get, Backup, backup_id)
     if not backup:
         raise HTTPException(status_code=404, detail="备份不存在")
 
@@ -54,16 +68,22 @@ async def delete_backup(backup_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/backups/{backup_id}/restore", response_model=ApiResponse)
-async def restore_backup(backup_id: int, db: Session = Depends(get_db)):
-    """恢复备份"""
-    backup = db.query(Backup).filter(Backup.id == backup_id).first()
+@router.post("/backups/{backup_id}/restore", response_model=ApiResponse, status_code=202)
+async def restore_backup(
+    backup_id: int,
+    response: Response,
+    instance_id: Optional[list[str]] = Query(None),
+    idempotency_key: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """恢复备份（后台任务）；指定 instance_id（可重复）时只恢复这些实例"""
+    backup = await run_db(db.get, Backup, backup_id)
     if not backup:
         raise HTTPException(status_code=404, detail="备份不存在")
-
-    service = BackupService(db)
-    try:
-        await service.restore_backup(backup_id)
-        return ApiResponse(message="备份恢复成功")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await submit_job(
+        response,
+        "backup.restore",
+        {"backup_id": backup_id, "instance_ids": instance_id},
+        idempotency_key,
+        "恢复任务已提交",
+    )
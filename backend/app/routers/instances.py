@@ -2,64 +2,211 @@
 实例管理路由
 """
 
+import asyncio
+import base64
+import hashlib
 import json
 import logging
-import secrets
-from pathlib import Path
-from typing import List
+import re
+import zlib
+from datetime import datetime
+from typing import Any, List, Literal, Optional
 
 import pyjson5
-from fastapi import APIRouter, Depends, HTTPException, WebSocket
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request, Response, WebSocket
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from app.database import PROJECT_ROOT, get_db
+from app.database import get_db, run_db
 from app.models import Instance
-from app.schemas import ApiResponse, DeviceApproveRequest, InstanceConfig, InstanceCreate, InstanceResponse
-from app.services.docker_service import DockerService
-from app.services.instance_service import InstanceService
+from app.routers.jobs import submit_job
+from app.schemas import (
+    ApiResponse,
+    DeviceApproveRequest,
+    InstanceBatchRequest,
+    InstanceConfig,
+    InstanceConfigBatchPatch,
+    InstanceCreate,
+    InstanceResponse,
+)
+from app.services.batch_service import BatchService
+from app.services.config_cache import config_cache, instance_config_path
+from app.services.gateway_client import gateway_pool
+from app.services.gateway_health import gateway_health
+from app.services.instance_service import run_instance_op
+from app.services.log_archive import log_archiver
+from app.services.log_broadcaster import (
+    DropPolicy,
+    LogLevel,
+    LogSubscription,
+    batch_lines,
+    log_hub,
+    make_line_filter,
+)
+from app.services.state_cache import state_cache
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-@router.get("/instances", response_model=ApiResponse)
-async def get_instances(db: Session = Depends(get_db)):
-    """获取所有实例列表"""
-    instances = db.query(Instance).all()
-    return ApiResponse(
-        data={"instances": [inst.to_dict() for inst in instances]}
-    )
+# 列表接口可选择返回的字段
+_INSTANCE_FIELDS = ("id", "name", "port", "status", "health", "created_at", "updated_at")
+
+
+def _encode_cursor(instance_id: str) -> str:
+    return base64.urlsafe_b64encode(instance_id.encode("utf-8")).decode("ascii").rstrip("=")
 
 
-@router.post("/instances", response_model=ApiResponse)
+def _decode_cursor(cursor: str) -> str:
+    try:
+        # validate：非 base64 字符报错而不是被忽略（否则畸形游标会被解码为空串，从第一页重新开始）
+        raw = base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True)
+        return raw.decode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="cursor 无效")
+
+
+@router.get("/instances", response_model=ApiResponse)
+async def get_instances(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="每页数量，不传返回全部"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    status: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段，如 id,status"),
+    db: Session = Depends(get_db),
+):
+    """获取实例列表（状态取自事件驱动的内存缓存，health 为最近一次网关探测结果）；按 ID 游标分页。
+
+    ETag 由实例集合版本号与查询参数生成，实例未变化时带 If-None-Match 的轮询直接返回 304，不查询数据库。
+    """
+    etag = 'W/"{}-{}"'.format(
+        state_cache.version_tag(),
+        hashlib.sha1(str(request.query_params).encode("utf-8")).hexdigest()[:8],
+    )
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    selected = None
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = set(selected) - set(_INSTANCE_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"未知字段: {', '.join(sorted(unknown))}")
+
+    query = db.query(Instance).order_by(Instance.id)
+    if name_prefix:
+        query = query.filter(Instance.name.startswith(name_prefix, autoescape=True))
+    after = _decode_cursor(cursor) if cursor else None
+    # status 按内存状态缓存过滤（与返回的 status 一致），分批读取直到凑满一页
+    want = limit + 1 if limit else None
+    instances: list[Instance] = []
+    while True:
+        batch_query = query if after is None else query.filter(Instance.id > after)
+        batch = await run_db((batch_query.limit(want) if want else batch_query).all)
+        instances += [i for i in batch if not status or state_cache.get(i.id, i.status) == status]
+        if want is None or len(batch) < want or len(instances) >= want:
+            break
+        after = batch[-1].id
+
+    next_cursor = None
+    if limit and len(instances) > limit:
+        instances = instances[:limit]
+        next_cursor = _encode_cursor(instances[-1].id)
+
+    result = []
+    for inst in instances:
+        item = inst.to_dict()
+        item["status"] = state_cache.get(inst.id, inst.status)
+        item["health"] = gateway_health.get(inst.id)
+        if selected:
+            item = {k: item[k] for k in selected}
+        result.append(item)
+    response.headers["ETag"] = etag
+    return ApiResponse(data={"instances": result, "next_cursor": next_cursor})
+
+
+@router.post("/instances", response_model=ApiResponse, status_code=202)
 async def create_instance(
     req: InstanceCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """创建新实例"""
+    """创建新实例（后台任务）；任务结果包含实例，控制台令牌通过 gateway-token 接口获取"""
     # 检查 ID 是否已存在
-    if db.query(Instance).filter(Instance.id == req.id).first():
+    if await run_db(db.get, Instance, req.id):
         raise HTTPException(status_code=400, detail=f"实例 ID '{req.id}' 已存在")
 
     # 创建实例（密码 + 自动生成 token 写入 gateway.auth，控制台需 token 做 API 鉴权）
-    service = InstanceService(db)
+    return await submit_job(
+        response,
+        "instance.create",
+        {"id": req.id, "name": req.name, "password": req.password},
+        idempotency_key,
+        "实例创建任务已提交",
+    )
+
+
+def _check_batch_selector(ids: Optional[list[str]], status: Optional[str], all_: bool) -> None:
+    """未指定 ids 与 status 时必须显式 all=true，避免缺省参数误操作全部实例"""
+    if ids is None and status is None and not all_:
+        raise HTTPException(status_code=400, detail="请指定 ids、status，或 all=true 选择全部实例")
+
+
+@router.post("/instances:batch", response_model=ApiResponse)
+async def batch_instances(req: InstanceBatchRequest, db: Session = Depends(get_db)):
+    """批量启动/停止/重启实例"""
+    _check_batch_selector(req.ids, req.status, req.all)
+    service = BatchService(db)
+    instances = await run_db(service.select, req.ids, req.status)
+    missing = sorted(set(req.ids or []) - {inst.id for inst in instances}) if not req.status else []
     try:
-        instance, gateway_token = await service.create_instance(req.id, req.name, req.password)
-        return ApiResponse(
-            data={
-                "instance": instance.to_dict(),
-                "gateway_token": gateway_token,
-            },
-            message="实例创建成功"
-        )
+        results = await service.run(req.action, instances, req.parallelism)
     except Exception as e:
+        logger.exception("批量 %s 失败: %s", req.action, e)
         raise HTTPException(status_code=500, detail=str(e))
 
+    items = [{"id": i, "ok": err is None, "error": err} for i, err in results.items()]
+    items += [{"id": i, "ok": False, "error": "实例不存在"} for i in missing]
+    failed = sum(1 for item in items if not item["ok"])
+    return ApiResponse(
+        data={"results": items, "succeeded": len(items) - failed, "failed": failed},
+        message="批量操作完成" if not failed else f"批量操作完成，{failed} 个失败",
+    )
+
+
+@router.post("/instances:patch-config", response_model=ApiResponse)
+async def batch_patch_config(req: InstanceConfigBatchPatch, db: Session = Depends(get_db)):
+    """对一组实例并行应用同一个 merge-patch，返回逐实例结果"""
+    _check_batch_selector(req.ids, req.status, req.all)
+    service = BatchService(db)
+    instances = await run_db(service.select, req.ids, req.status)
+    missing = sorted(set(req.ids or []) - {inst.id for inst in instances}) if not req.status else []
+    results = await service.patch_config(instances, req.patch, req.parallelism)
+
+    items = [
+        {"id": i, "ok": not isinstance(r, str), "changed": r is True, "error": r if isinstance(r, str) else None}
+        for i, r in results.items()
+    ]
+    items += [{"id": i, "ok": False, "changed": False, "error": "实例不存在"} for i in missing]
+    failed = sum(1 for item in items if not item["ok"])
+    return ApiResponse(
+        data={
+            "results": items,
+            "succeeded": len(items) - failed,
+            "failed": failed,
+            "changed": sum(1 for item in items if item["changed"]),
+        },
+        message="批量修改配置完成" if not failed else f"批量修改配置完成，{failed} 个失败",
+    )
+
 
 @router.get("/instances/{instance_id}", response_model=ApiResponse)
 async def get_instance(instance_id: str, db: Session = Depends(get_db)):
     """获取实例详情"""
-    instance = db.query(Instance).filter(Instance.id == instance_id).first()
+    instance = await run_db(db.get, Instance, instance_id)
     if not instance:
         raise HTTPException(status_code=404, detail="实例不存在")
     return ApiResponse(data={"instance": instance.to_dict()})
@@ -68,45 +215,28 @@ async def get_instance(instance_id: str, db: Session = Depends(get_db)):
 @router.get("/instances/{instance_id}/gateway-token", response_model=ApiResponse)
 async def get_instance_gateway_token(instance_id: str, db: Session = Depends(get_db)):
     """获取实例控制台令牌（用于拼带 token 的 URL，仅读 gateway.auth.token）"""
-    instance = db.query(Instance).filter(Instance.id == instance_id).first()
+    instance = await run_db(db.get, Instance, instance_id)
     if not instance:
         raise HTTPException(status_code=404, detail="实例不存在")
-    config_path, _ = _instance_config_path(instance_id)
-    if not config_path.exists():
-        return ApiResponse(data={"token": None})
-    try:
-        raw = config_path.read_text(encoding="utf-8")
-        cfg = pyjson5.loads(raw)
-        auth = (cfg.get("gateway") or {}).get("auth")
-        token = auth.get("token") if isinstance(auth, dict) else None
-        return ApiResponse(data={"token": token or None})
-    except Exception:
-        return ApiResponse(data={"token": None})
+    return ApiResponse(data={"token": config_cache.gateway_token(instance_id)})
 
 
 @router.post("/instances/{instance_id}/regenerate-gateway-token", response_model=ApiResponse)
 async def regenerate_gateway_token(instance_id: str, db: Session = Depends(get_db)):
-    """重新生成实例控制台令牌（写入 gateway.auth.token）。生效需重启实例。"""
-    instance = db.query(Instance).filter(Instance.id == instance_id).first()
+    """重新生成实例控制台令牌（写入 gateway.auth.token）。生效需重启实例。
+
+    并发的重复请求合并为一次，返回同一个新令牌。
+    """
+    instance = await run_db(db.get, Instance, instance_id)
     if not instance:
         raise HTTPException(status_code=404, detail="实例不存在")
-    config_path, _ = _instance_config_path(instance_id)
+    config_path, _ = instance_config_path(instance_id)
     if not config_path.exists():
         raise HTTPException(status_code=400, detail="实例配置文件不存在")
     try:
-        raw = config_path.read_text(encoding="utf-8")
-        cfg = pyjson5.loads(raw)
-        gateway = cfg.get("gateway")
-        if not isinstance(gateway, dict):
-            gateway = {}
-            cfg["gateway"] = gateway
-        auth = gateway.get("auth")
-        if not isinstance(auth, dict):
-            auth = {}
-            gateway["auth"] = auth
-        new_token = secrets.token_urlsafe(24)
-        auth["token"] = new_token
-        config_path.write_text(json.dumps(cfg, ensure_ascii=False, indent=2), encoding="utf-8")
+        new_token = await run_instance_op(
+            "regenerate-gateway-token", instance_id, lambda s: s.regenerate_gateway_token(instance_id)
+        )
         return ApiResponse(
             data={"token": new_token, "port": instance.port},
             message="令牌已重新生成，请重启实例后使用新链接连接",
@@ -115,34 +245,19 @@ async def regenerate_gateway_token(instance_id: str, db: Session = Depends(get_d
         raise HTTPException(status_code=500, detail=f"重新生成令牌失败: {e}")
 
 
-def _get_gateway_token_from_config(instance_id: str) -> str | None:
-    """从实例 openclaw.json 读取 gateway.auth.token"""
-    config_path, _ = _instance_config_path(instance_id)
-    if not config_path.exists():
-        return None
-    try:
-        raw = config_path.read_text(encoding="utf-8")
-        cfg = pyjson5.loads(raw)
-        auth = (cfg.get("gateway") or {}).get("auth")
-        return auth.get("token") if isinstance(auth, dict) else None
-    except Exception:
-        return None
-
-
 @router.get("/instances/{instance_id}/devices", response_model=ApiResponse)
 async def list_instance_devices(instance_id: str, db: Session = Depends(get_db)):
     """获取实例设备配对列表（待批准 + 已配对），用于解决 pairing required"""
-    instance = db.query(Instance).filter(Instance.id == instance_id).first()
+    instance = await run_db(db.get, Instance, instance_id)
     if not instance:
         raise HTTPException(status_code=404, detail="实例不存在")
     if instance.status != "running":
         raise HTTPException(status_code=400, detail="实例未运行，请先启动实例")
-    token = _get_gateway_token_from_config(instance_id)
+    token = config_cache.gateway_token(instance_id)
     if not token:
         raise HTTPException(status_code=400, detail="未配置 gateway.auth.token，请使用「重新生成令牌」或编辑配置")
     try:
-        raw = await DockerService().devices_list(instance_id, token)
-        data = json.loads(raw) if raw.strip() else {}
+        data = await gateway_pool.devices_list(instance_id, instance.port, token)
         return ApiResponse(data=data)
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -157,16 +272,16 @@ async def approve_instance_device(
     db: Session = Depends(get_db),
 ):
     """批准一个待配对的设备，解决「pairing required」"""
-    instance = db.query(Instance).filter(Instance.id == instance_id).first()
+    instance = await run_db(db.get, Instance, instance_id)
     if not instance:
         raise HTTPException(status_code=404, detail="实例不存在")
     if instance.status != "running":
         raise HTTPException(status_code=400, detail="实例未运行，请先启动实例")
-    token = _get_gateway_token_from_config(instance_id)
+    token = config_cache.gateway_token(instance_id)
     if not token:
         raise HTTPException(status_code=400, detail="未配置 gateway.auth.token，请使用「重新生成令牌」或编辑配置")
     try:
-        await DockerService().devices_approve(instance_id, body.requestId, token)
+        await gateway_pool.devices_approve(instance_id, instance.port, token, body.requestId)
         return ApiResponse(message="设备已批准")
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -179,98 +294,93 @@ async def delete_instance(
     db: Session = Depends(get_db)
 ):
     """删除实例"""
-    instance = db.query(Instance).filter(Instance.id == instance_id).first()
+    instance = await run_db(db.get, Instance, instance_id)
     if not instance:
         raise HTTPException(status_code=404, detail="实例不存在")
 
-    service = InstanceService(db)
     try:
-        await service.delete_instance(instance_id, keep_data)
+        await run_instance_op(
+            "delete", instance_id, lambda s: s.delete_instance(instance_id, keep_data), keep_data
+        )
         return ApiResponse(message="实例删除成功")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/instances/{instance_id}/start", response_model=ApiResponse)
-async def start_instance(instance_id: str, db: Session = Depends(get_db)):
-    """启动实例"""
+async def start_instance(
+    instance_id: str,
+    wait_ready: bool = Query(False, description="等待网关端口探测成功后再返回"),
+    timeout: Optional[float] = Query(None, gt=0, le=600, description="等待就绪的最长秒数"),
+    db: Session = Depends(get_db),
+):
+    """启动实例；同一实例并发的启动请求合并为一次 Docker 操作。
+
+    wait_ready 时 compose 启动后继续探测网关端口，就绪后返回探测结果；超时返回 504，容器退出返回 500。
+    """
     logger.info("POST /api/instances/%s/start 请求", instance_id)
 
-    instance = db.query(Instance).filter(Instance.id == instance_id).first()
+    instance = await run_db(db.get, Instance, instance_id)
     if not instance:
         logger.warning("实例不存在: %s", instance_id)
         raise HTTPException(status_code=404, detail="实例不存在")
 
-    # 启动前确保 docker-compose.yml 与当前实例列表一致
-    instance_service = InstanceService(db)
-    await instance_service._regenerate_compose()
-
-    service = DockerService()
     try:
-        await service.start_instance(instance_id)
-        instance.status = "running"
-        db.commit()
+        health = await run_instance_op(
+            "start",
+            instance_id,
+            lambda s: s.start_instance(instance_id, wait_ready, timeout),
+            wait_ready,
+            timeout,
+        )
         logger.info("实例启动成功: %s", instance_id)
-        return ApiResponse(message="实例启动成功")
+        return ApiResponse(message="实例启动成功", data={"health": health} if wait_ready else None)
+    except TimeoutError as e:
+        logger.warning("实例网关未就绪 instance_id=%s: %s", instance_id, e)
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.exception("启动实例失败 instance_id=%s: %s", instance_id, e)
-        instance.status = "error"
-        db.commit()
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/instances/{instance_id}/stop", response_model=ApiResponse)
 async def stop_instance(instance_id: str, db: Session = Depends(get_db)):
-    """停止实例"""
-    instance = db.query(Instance).filter(Instance.id == instance_id).first()
+    """停止实例；同一实例并发的停止请求合并为一次 Docker 操作"""
+    instance = await run_db(db.get, Instance, instance_id)
     if not instance:
         raise HTTPException(status_code=404, detail="实例不存在")
 
-    service = DockerService()
     try:
-        await service.stop_instance(instance_id)
-        instance.status = "stopped"
-        db.commit()
+        await run_instance_op("stop", instance_id, lambda s: s.stop_instance(instance_id))
         return ApiResponse(message="实例停止成功")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/instances/{instance_id}/init", response_model=ApiResponse)
-async def init_instance(instance_id: str, db: Session = Depends(get_db)):
-    """初始化实例（运行 openclaw onboard）"""
-    instance = db.query(Instance).filter(Instance.id == instance_id).first()
+@router.post("/instances/{instance_id}/init", response_model=ApiResponse, status_code=202)
+async def init_instance(
+    instance_id: str,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """初始化实例（后台任务，运行 openclaw onboard）；任务结果为 onboard 输出"""
+    instance = await run_db(db.get, Instance, instance_id)
     if not instance:
         raise HTTPException(status_code=404, detail="实例不存在")
-
-    service = DockerService()
-    try:
-        result = await service.init_instance(instance_id)
-        return ApiResponse(data={"result": result}, message="初始化完成")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-
-def _instance_config_path(instance_id: str, prefer_data: bool = True) -> tuple[Path, Path]:
-    """返回 (主路径, 回退路径)。官方用 /home/node/.openclaw → 对应 data，优先 data。"""
-    base = PROJECT_ROOT / "instances" / instance_id
-    data_path = base / "data" / "openclaw.json"
-    config_path = base / "config" / "openclaw.json"
-    if prefer_data and data_path.exists():
-        return data_path, config_path
-    if config_path.exists():
-        return config_path, data_path
-    return data_path, config_path  # 默认读写 data
+    return await submit_job(
+        response, "instance.init", {"instance_id": instance_id}, idempotency_key, "初始化任务已提交"
+    )
 
 
 @router.get("/instances/{instance_id}/config", response_model=ApiResponse)
 async def get_instance_config(instance_id: str, db: Session = Depends(get_db)):
     """获取实例配置（openclaw.json）"""
-    instance = db.query(Instance).filter(Instance.id == instance_id).first()
+    instance = await run_db(db.get, Instance, instance_id)
     if not instance:
         raise HTTPException(status_code=404, detail="实例不存在")
 
-    config_path, _ = _instance_config_path(instance_id)
+    config_path, _ = instance_config_path(instance_id)
     if not config_path.exists():
         # 返回默认配置：使用 gateway.auth.token（已弃用 gateway.token），默认 bailian 模型，无 feishu
         default_config = '''{
@@ -329,7 +439,7 @@ async def update_instance_config(
     db: Session = Depends(get_db)
 ):
     """更新实例配置"""
-    instance = db.query(Instance).filter(Instance.id == instance_id).first()
+    instance = await run_db(db.get, Instance, instance_id)
     if not instance:
         raise HTTPException(status_code=404, detail="实例不存在")
 
@@ -339,26 +449,113 @@ async def update_instance_config(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"JSON5 格式错误: {e}")
 
-    # 保存配置（写入 data，对应容器内 /home/node/.openclaw/openclaw.json）
-    config_path = PROJECT_ROOT / "instances" / instance_id / "data" / "openclaw.json"
-    config_path.parent.mkdir(parents=True, exist_ok=True)
+    # 保存配置（与读取、merge-patch 使用同一路径，并持有同一把文件写锁）
+    config_path, _ = instance_config_path(instance_id)
 
     try:
-        config_path.write_text(config.content, encoding="utf-8")
+        await asyncio.to_thread(config_cache.write, config_path, config.content)
         return ApiResponse(message="配置保存成功")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"保存配置失败: {e}")
 
 
+@router.patch("/instances/{instance_id}/config", response_model=ApiResponse)
+async def patch_instance_config(
+    instance_id: str,
+    patch: dict[str, Any] = Body(..., media_type="application/merge-patch+json"),
+    db: Session = Depends(get_db),
+):
+    """按 RFC 7396 merge-patch 局部修改实例配置（null 删除键），原子写回"""
+    instance = await run_db(db.get, Instance, instance_id)
+    if not instance:
+        raise HTTPException(status_code=404, detail="实例不存在")
+    config_path, _ = instance_config_path(instance_id)
+    if not config_path.exists():
+        raise HTTPException(status_code=400, detail="实例配置文件不存在")
+    try:
+        changed = await asyncio.to_thread(config_cache.patch, config_path, patch)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"修改配置失败: {e}")
+    return ApiResponse(data={"changed": changed}, message="配置已更新" if changed else "配置无变化")
+
+
+@router.get("/instances/{instance_id}/logs")
+async def query_instance_logs(
+    instance_id: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    q: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=100000),
+    db: Session = Depends(get_db),
+):
+    """检索归档日志：按时间范围（ISO 8601，不带时区按本地时间）与正则过滤，按时间顺序流式返回纯文本"""
+    if not await run_db(db.get, Instance, instance_id):
+        raise HTTPException(status_code=404, detail="实例不存在")
+    try:
+        pattern = re.compile(q) if q else None
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"正则无效: {e}")
+    archive = log_archiver.archive(instance_id)
+    lines = archive.query(
+        since=int(since.timestamp() * 1000) if since else None,
+        until=int(until.timestamp() * 1000) if until else None,
+        pattern=pattern,
+        limit=limit,
+    )
+    # 同步生成器由 Starlette 放到线程池迭代，解压与检索不阻塞事件循环
+    return StreamingResponse(
+        (line + "\n" for line in lines), media_type="text/plain; charset=utf-8"
+    )
+
+
 @router.websocket("/instances/{instance_id}/logs")
-async def instance_logs(websocket: WebSocket, instance_id: str):
-    """WebSocket 实时日志"""
+async def instance_logs(
+    websocket: WebSocket,
+    instance_id: str,
+    policy: DropPolicy = "drop_oldest",
+    batch_ms: int = Query(100, ge=0, le=5000),
+    max_lines: int = Query(500, ge=1, le=10000),
+    max_bytes: int = Query(64 * 1024, ge=1024, le=4 * 1024 * 1024),
+    encoding: Literal["text", "deflate"] = "text",
+    level: Optional[LogLevel] = None,
+    q: Optional[str] = None,
+):
+    """WebSocket 实时日志：同一实例的所有连接共享一个上游跟随，新连接先收到最近日志。
+
+    多行合并为一帧（换行分隔，按 batch_ms / max_lines / max_bytes 截断）；
+    encoding=deflate 时以 zlib 压缩的二进制帧发送；level / q 在服务端过滤后再发送。
+    """
     await websocket.accept()
+    try:
+        accept = make_line_filter(level, q)
+    except re.error as e:
+        await websocket.send_text(f"[ERROR] 过滤正则无效: {e}")
+        await websocket.close(code=1008)
+        return
+
+    async def _send(sub: LogSubscription) -> None:
+        async for batch in batch_lines(sub, batch_ms / 1000, max_lines, max_bytes, accept):
+            text = "\n".join(batch)
+            if encoding == "deflate":
+                await websocket.send_bytes(zlib.compress(text.encode("utf-8")))
+            else:
+                await websocket.send_text(text)
+
+    async def _wait_disconnect() -> None:
+        # 前端关闭连接时及时退订，最后一个订阅者离开后上游跟随随之关闭
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
 
-    service = DockerService()
     try:
-        async for log_line in service.stream_logs(instance_id):
-            await websocket.send_text(log_line)
+        async with log_hub.subscribe(instance_id, policy) as sub:
+            sender = asyncio.create_task(_send(sub))
+            watcher = asyncio.create_task(_wait_disconnect())
+            done, pending = await asyncio.wait({sender, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task in done:
+                task.result()
     except Exception as e:
         # 连接可能已被前端关闭，此时再发送会触发 RuntimeError，这里静默忽略
         try:
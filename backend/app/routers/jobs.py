@@ -0,0 +1,86 @@
+"""
+后台任务路由
+"""
+
+import asyncio
+import json
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.schemas import ApiResponse
+from app.services.event_bus import event_bus
+from app.services.job_service import FINISHED, JobConflictError, job_manager
+
+router = APIRouter()
+
+
+async def submit_job(
+    response: Response,
+    kind: str,
+    params: dict,
+    idempotency_key: Optional[str],
+    message: str,
+) -> ApiResponse:
+    """提交后台任务并返回 202；Location 指向任务查询接口"""
+    try:
+        job, _ = await job_manager.submit(kind, params, idempotency_key)
+    except JobConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    response.headers["Location"] = f"/api/jobs/{job['id']}"
+    return ApiResponse(data={"job": job}, message=message)
+
+
+@router.get("/jobs", response_model=ApiResponse)
+async def list_jobs(
+    kind: Optional[str] = Query(None, description="任务类型，如 backup.create"),
+    status: Optional[str] = Query(None, description="queued / running / succeeded / failed"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """最近的任务（按创建时间倒序）"""
+    return ApiResponse(data={"jobs": await job_manager.list_jobs(kind, status, limit)})
+
+
+@router.get("/jobs/{job_id}", response_model=ApiResponse)
+async def get_job(job_id: str):
+    """任务状态、进度与结果"""
+    job = await job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return ApiResponse(data={"job": job})
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job(job_id: str):
+    """Server-Sent Events：先推送任务当前状态（job），随后推送 job.progress / job.status，任务结束后关闭"""
+    if not await job_manager.get(job_id):
+        raise HTTPException(status_code=404, detail="任务不存在")
+
+    async def _stream() -> AsyncIterator[str]:
+        # 先订阅再读取当前状态，两者之间的更新不会丢失
+        async with event_bus.subscribe(types=("job.",)) as sub:
+            job = await job_manager.get(job_id)
+            yield f"event: job\ndata: {json.dumps(job, ensure_ascii=False)}\n\n"
+            if job["status"] in FINISHED:
+                return
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.get(), settings.event_keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break
+                if event.data.get("id") != job_id:
+                    continue
+                yield event.to_sse()
+                if event.type == "job.status" and event.data.get("status") in FINISHED:
+                    break
+
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
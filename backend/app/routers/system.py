@@ -2,69 +2,83 @@
 系统状态路由
 """
 
-import subprocess
+import asyncio
+from typing import AsyncIterator, Optional
 
-from fastapi import APIRouter
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Header, Query
+from fastapi.responses import StreamingResponse
 
-from app.database import get_db, SessionLocal
-from app.models import Instance
+from app.config import settings
 from app.schemas import ApiResponse, SystemStatus
+from app.services.docker_health import docker_health
+from app.services.event_bus import event_bus
+from app.services.port_allocator import port_allocator
+from app.services.state_cache import state_cache
 
 router = APIRouter()
 
 
-def check_docker() -> bool:
-    """检查 Docker 是否运行"""
-    try:
-        result = subprocess.run(
-            ["docker", "info"],
-            capture_output=True,
-            timeout=5
-        )
-        return result.returncode == 0
-    except Exception:
-        return False
-
-
 @router.get("/system/status", response_model=ApiResponse)
 async def get_system_status():
-    """获取系统状态"""
-    db = SessionLocal()
-    try:
-        instances = db.query(Instance).all()
-        running_count = sum(1 for i in instances if i.status == "running")
-
-        status = SystemStatus(
-            docker_running=check_docker(),
-            base_port=18789,
-            instance_count=len(instances),
-            running_count=running_count
-        )
-        return ApiResponse(data={"status": status.model_dump()})
-    finally:
-        db.close()
+    """获取系统状态（实例计数取自内存状态缓存，Docker 状态取自后台健康探测缓存）"""
+    instance_count, running_count = state_cache.counts()
+    health = await docker_health.status()
+    status = SystemStatus(
+        docker_running=health["running"],
+        base_port=port_allocator.base_port,
+        instance_count=instance_count,
+        running_count=running_count,
+        docker=health,
+    )
+    return ApiResponse(data={"status": status.model_dump()})
 
 
 @router.get("/system/ports", response_model=ApiResponse)
 async def get_available_ports():
-    """获取可用端口范围"""
-    db = SessionLocal()
-    try:
-        used_ports = [i.port for i in db.query(Instance.port).all()]
-        # 推荐端口：从 18789 开始，跳过已使用的
-        base_port = 18789
-        recommended = []
-        port = base_port
-        while len(recommended) < 10:  # 推荐 10 个可用端口
-            if port not in used_ports:
-                recommended.append(port)
-            port += 1
+    """获取端口占用情况；推荐端口即接下来会分配的网关端口（每实例占 port 与 port+1）"""
+    return ApiResponse(data={
+        "used_ports": port_allocator.used_ports(),
+        "recommended_ports": await asyncio.to_thread(port_allocator.recommended, 10),
+        "base_port": port_allocator.base_port,
+    })
+
+
+@router.get("/events")
+async def stream_events(
+    last_event_id: Optional[int] = Header(None),
+    since: Optional[int] = Query(None, description="等同 Last-Event-ID，供无法设置请求头的客户端使用"),
+    types: Optional[str] = Query(None, description="逗号分隔的事件类型前缀，如 instance.,backup."),
+):
+    """Server-Sent Events：推送 instance.created / instance.deleted / instance.status、
+    backup.created / backup.deleted / backup.progress、job.status / job.progress、system.health 事件。
+
+    断线重连时携带 Last-Event-ID 从回放缓冲补发；无法补齐时先发送 resync 事件，客户端应全量刷新。
+    """
+    resume_from = last_event_id if last_event_id is not None else since
+    prefixes = tuple(t.strip() for t in types.split(",") if t.strip()) if types else None
+
+    async def _stream() -> AsyncIterator[str]:
+        async with event_bus.subscribe(resume_from, prefixes) as sub:
+            # 让浏览器在断线 3 秒后自动重连
+            yield "retry: 3000\n\n"
+            if sub.backlog is None:
+                yield "event: resync\ndata: {}\n\n"
+            else:
+                for event in sub.backlog:
+                    yield event.to_sse()
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.get(), settings.event_keepalive)
+                except asyncio.TimeoutError:
+                    # 心跳注释行，防止代理因空闲断开连接
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield event.to_sse()
 
-        return ApiResponse(data={
-            "used_ports": used_ports,
-            "recommended_ports": recommended,
-            "base_port": base_port
-        })
-    finally:
-        db.close()
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -3,7 +3,7 @@ Pydantic 模型（请求/响应数据验证）
 """
 
 from datetime import datetime
-from typing import Optional
+from typing import Any, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -28,17 +28,36 @@ class InstanceResponse(BaseModel):
         from_attributes = True
 
 
+class InstanceBatchRequest(BaseModel):
+    """批量操作请求：按 ids 和/或 status 选择实例；选择全部实例需显式传 all=true"""
+    action: Literal["start", "stop", "restart"]
+    ids: Optional[list[str]] = Field(None, description="实例 ID 列表，空列表不选择任何实例")
+    status: Optional[str] = Field(None, description="按当前状态选择实例，如 stopped")
+    all: bool = Field(False, description="未指定 ids 与 status 时须为 true，表示选择全部实例")
+    parallelism: Optional[int] = Field(None, ge=1, le=64, description="并发上限，默认取配置")
+
+
 class InstanceConfig(BaseModel):
     """实例配置（openclaw.json）"""
     content: str = Field(..., description="JSON5 格式的配置内容")
 
 
+class InstanceConfigBatchPatch(BaseModel):
+    """批量修改配置：对选中的实例应用同一个 RFC 7396 merge-patch（选择规则同批量操作）"""
+    patch: dict[str, Any] = Field(..., description="merge-patch 对象，null 表示删除该键")
+    ids: Optional[list[str]] = Field(None, description="实例 ID 列表，空列表不选择任何实例")
+    status: Optional[str] = Field(None, description="按当前状态选择实例")
+    all: bool = Field(False, description="未指定 ids 与 status 时须为 true，表示选择全部实例")
+    parallelism: Optional[int] = Field(None, ge=1, le=64, description="并发上限，默认取配置")
+
+
 class BackupResponse(BaseModel):
     """备份响应"""
     id: int
     filename: str
     size: int
     instance_count: int
+    instance_id: Optional[str] = None
     created_at: Optional[str] = None
 
     class Config:
@@ -51,6 +70,7 @@ class SystemStatus(BaseModel):
     base_port: int
     instance_count: int
     running_count: int
+    docker: Optional[dict] = Field(None, description="守护进程探测详情：版本、容器数、存储驱动等")
 
 
 class DeviceApproveRequest(BaseModel):
@@ -3,63 +3,284 @@
 """
 
 import asyncio
+import logging
+import os
+import shutil
+import time
+import uuid
 import zipfile
+import zlib
 from datetime import datetime
 from pathlib import Path
+from typing import Callable, Iterator, Optional
 
 from sqlalchemy.orm import Session
 
+from app.config import settings
+from app.database import DB_PATH, PROJECT_ROOT, restore_database, run_db, snapshot_database
 from app.models import Backup, Instance
+from app.services.backup_store import CHUNK_SIZE, ChunkStore, is_manifest
+from app.services.docker_service import DockerService
+from app.services.event_bus import event_bus
+from app.services.instance_locks import fleet_lock, instance_locks
+from app.services.job_service import job_manager
+from app.services.log_archive import ARCHIVE_DIRNAME
+from app.services.port_allocator import port_allocator
+from app.services.scheduler import run_bounded
+from app.services.state_cache import state_cache
+
+logger = logging.getLogger(__name__)
+
+# 备份中数据库文件的归档路径
+DB_ARCNAME = "database/openclaw.db"
+
+
+class BackupProgress:
+    """进行中备份的进度（进程内共享），键为备份文件名"""
+
+    def __init__(self):
+        self._tasks: dict[str, dict] = {}
+
+    # 进度事件的最小推送间隔（秒）
+    PUBLISH_INTERVAL = 0.5
+
+    def tracker(self, name: str) -> Callable[[int, int], None]:
+        """返回供归档线程调用的进度回调；完成（done >= total）后自动移除"""
+        self._tasks[name] = {"name": name, "done_bytes": 0, "total_bytes": 0, "percent": 0.0}
+        last_published = 0.0
+
+        def _update(done: int, total: int) -> None:
+            nonlocal last_published
+            if done >= total:
+                self._tasks.pop(name, None)
+                event_bus.publish(
+                    "backup.progress",
+                    {"name": name, "done_bytes": total, "total_bytes": total, "percent": 100.0},
+                )
+                return
+            self._tasks[name] = {
+                "name": name,
+                "done_bytes": done,
+                "total_bytes": total,
+                "percent": round(done * 100 / total, 1) if total else 100.0,
+            }
+            now = time.monotonic()
+            if now - last_published >= self.PUBLISH_INTERVAL:
+                last_published = now
+                event_bus.publish("backup.progress", self._tasks[name])
+
+        return _update
+
+    def discard(self, name: str) -> None:
+        self._tasks.pop(name, None)
+
+    def snapshot(self) -> list[dict]:
+        return list(self._tasks.values())
+
+
+backup_progress = BackupProgress()
 
 
 class BackupService:
-    """备份管理服务"""
+    """备份管理服务：默认写入内容寻址的增量存储（清单 + 去重块），full 模式为整包 ZIP"""
 
-    BACKUP_DIR = Path("../backup")
+    BACKUP_DIR = PROJECT_ROOT / "backup"
+    INSTANCES_DIR = PROJECT_ROOT / "instances"
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, progress: Optional[Callable[[float, Optional[str]], None]] = None):
         self.db = db
+        # 后台任务的进度回调 (百分比, 说明)；同步调用时为空
+        self.progress = progress
         self.BACKUP_DIR.mkdir(parents=True, exist_ok=True)
+        self.store = ChunkStore(
+            self.BACKUP_DIR,
+            codec=settings.backup_codec,
+            compress_level=settings.backup_compress_level,
+            workers=settings.backup_workers,
+        )
+
+    STAGING_DIR = BACKUP_DIR / ".staging"
+
+    def _report(self, percent: float, message: Optional[str] = None) -> None:
+        if self.progress is not None:
+            self.progress(percent, message)
+
+    def _tracker(self, filename: str) -> Callable[[int, int], None]:
+        """归档进度回调：同时更新 /backups/progress 与所属任务的进度"""
+        track = backup_progress.tracker(filename)
+        if self.progress is None:
+            return track
+
+        def _update(done: int, total: int) -> None:
+            track(done, total)
+            self._report(done * 100 / total if total else 100.0)
+
+        return _update
+
+    def _backup_files(
+        self, snapshots: Optional[dict[str, Path]] = None, db_snapshot: Optional[Path] = None
+    ) -> Iterator[tuple[str, Path]]:
+        """待备份文件：(归档路径, 本地路径)；snapshots 中的实例改为读取其快照目录，数据库读取 db_snapshot"""
+        snapshots = snapshots or {}
+        # 备份 instances 目录
+        if self.INSTANCES_DIR.exists():
+            for instance_dir in self.INSTANCES_DIR.iterdir():
+                if instance_dir.is_dir():
+                    yield from _tree_files(
+                        snapshots.get(instance_dir.name, instance_dir), f"instances/{instance_dir.name}"
+                    )
+                elif instance_dir.is_file():
+                    yield f"instances/{instance_dir.name}", instance_dir
+        # 备份数据库（在线备份得到的一致快照）
+        if db_snapshot is not None:
+            yield DB_ARCNAME, db_snapshot
+
+    async def _snapshot_db(self) -> Optional[Path]:
+        """在暂存区生成数据库快照，调用方负责删除。快照不含 jobs 表的记录：
+        备份时运行中的任务（包括这次备份本身）恢复后不应再被当作未完成任务重新执行"""
+        if not DB_PATH.exists():
+            return None
+        self.STAGING_DIR.mkdir(parents=True, exist_ok=True)
+        dest = self.STAGING_DIR / f"openclaw-{uuid.uuid4().hex[:8]}.db"
+        try:
+            await asyncio.to_thread(snapshot_database, dest, ("jobs",))
+        except BaseException:
+            dest.unlink(missing_ok=True)
+            raise
+        return dest
+
+    async def _snapshot_instance(self, inst: Instance) -> Path:
+        """热备份：暂停单个实例，复制（或硬链接）其目录到暂存区后立即恢复，返回快照目录"""
+        src = self.INSTANCES_DIR / inst.id
+        staging = self.STAGING_DIR / f"{inst.id}-{uuid.uuid4().hex[:8]}"
+        docker = DockerService()
+        async with instance_locks.hold(inst.id):
+            paused = inst.status == "running" and await docker.pause_container(inst.id)
+            try:
+                if src.exists():
+                    await asyncio.to_thread(_copy_tree, src, staging, settings.backup_snapshot == "hardlink")
+                else:
+                    staging.mkdir(parents=True, exist_ok=True)
+            finally:
+                if paused:
+                    await docker.unpause_container(inst.id)
+        return staging
+
+    async def backup_instance(self, instance_id: str) -> Backup:
+        """单实例热备份：仅短暂暂停该实例，其余实例不受影响"""
+        inst = await run_db(self.db.get, Instance, instance_id)
+        if not inst:
+            raise ValueError(f"实例 {instance_id} 不存在")
+
+        timestamp = _backup_stamp()
+        filename = f"openclaw-backup-{timestamp}-{instance_id}.json"
+        self._report(0, "创建快照")
+        staging = await self._snapshot_instance(inst)
+        self._report(0, "归档")
+        try:
+            # 快照已落盘、实例已恢复运行，归档在线程池中进行
+            total_size, written = await asyncio.to_thread(
+                self.store.snapshot,
+                filename,
+                _tree_files(staging, f"instances/{instance_id}"),
+                {"created_at": timestamp, "instances": [instance_id], "instance_id": instance_id},
+                self._tracker(filename),
+            )
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+            backup_progress.discard(filename)
+        logger.info("实例备份 %s: 逻辑大小 %d，新写入 %d 字节", filename, total_size, written)
+
+        backup = Backup(
+            filename=filename,
+            size=total_size,
+            instance_count=1,
+            instance_id=instance_id,
+        )
+        return await self._save(backup)
+
+    async def _create_hot_backup(self, instances: list[Instance], filename: str, timestamp: str) -> int:
+        """整体热备份：逐实例（有界并发）暂停-快照-恢复，全部快照完成后统一归档"""
+        self._report(0, "创建快照")
+        outcomes = await run_bounded(instances, self._snapshot_instance, settings.backup_parallelism)
+        snapshots = {inst.id: r for inst, r in outcomes if isinstance(r, Path)}
+        db_snapshot = None
+        try:
+            errors = [r for _, r in outcomes if isinstance(r, BaseException)]
+            if errors:
+                raise RuntimeError(f"实例快照失败: {errors[0]}")
+            db_snapshot = await self._snapshot_db()
+            self._report(0, "归档")
+            total_size, written = await asyncio.to_thread(
+                self.store.snapshot,
+                filename,
+                self._backup_files(snapshots, db_snapshot),
+                {"created_at": timestamp, "instances": [inst.id for inst in instances]},
+                self._tracker(filename),
+            )
+        finally:
+            for staging in snapshots.values():
+                shutil.rmtree(staging, ignore_errors=True)
+            if db_snapshot is not None:
+                db_snapshot.unlink(missing_ok=True)
+            backup_progress.discard(filename)
+        logger.info("热备份 %s: 逻辑大小 %d，新写入 %d 字节", filename, total_size, written)
+        return total_size
 
     async def create_backup(self) -> Backup:
         """创建备份"""
         # 获取所有实例
-        instances = self.db.query(Instance).all()
+        instances = await run_db(self.db.query(Instance).all)
+
+        # 生成备份文件名
+        timestamp = _backup_stamp()
+        instance_count = len(instances)
+
+        if settings.backup_strategy == "hot":
+            # 热备份：不整体停机，每个实例仅在复制自身数据时短暂暂停
+            filename = f"openclaw-backup-{timestamp}.json"
+            total_size = await self._create_hot_backup(instances, filename, timestamp)
+            backup = Backup(filename=filename, size=total_size, instance_count=instance_count)
+            return await self._save(backup)
 
         # 停止所有实例
+        self._report(0, "停止实例")
         for inst in instances:
             if inst.status == "running":
                 await self._stop_container(inst.id)
 
-        # 生成备份文件名
-        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-        filename = f"openclaw-backup-{timestamp}.zip"
-        backup_path = self.BACKUP_DIR / filename
-
-        # 打包备份
-        instance_count = len(instances)
-        total_size = 0
-
-        with zipfile.ZipFile(backup_path, "w", zipfile.ZIP_DEFLATED) as zf:
-            # 备份 instances 目录
-            instances_dir = Path("../instances")
-            if instances_dir.exists():
-                for file_path in instances_dir.rglob("*"):
-                    if file_path.is_file():
-                        arcname = f"instances/{file_path.relative_to(instances_dir)}"
-                        zf.write(file_path, arcname)
-                        total_size += file_path.stat().st_size
-
-            # 备份数据库
-            db_path = Path("../backend/data/openclaw.db")
-            if db_path.exists():
-                zf.write(db_path, "database/openclaw.db")
-                total_size += db_path.stat().st_size
-
-        # 重启所有实例
-        for inst in instances:
-            if inst.status == "running":
-                await self._start_container(inst.id)
+        filename = f"openclaw-backup-{timestamp}.{'json' if settings.backup_mode == 'incremental' else 'zip'}"
+        self._report(0, "归档")
+        db_snapshot = None
+        try:
+            db_snapshot = await self._snapshot_db()
+            # 归档在工作线程中执行，不阻塞事件循环
+            if settings.backup_mode == "incremental":
+                # 增量备份：只写清单与新增块
+                total_size, written = await asyncio.to_thread(
+                    self.store.snapshot,
+                    filename,
+                    self._backup_files(db_snapshot=db_snapshot),
+                    {"created_at": timestamp, "instances": [inst.id for inst in instances]},
+                    self._tracker(filename),
+                )
+                logger.info("增量备份 %s: 逻辑大小 %d，新写入 %d 字节", filename, total_size, written)
+            else:
+                total_size = await asyncio.to_thread(
+                    _write_zip,
+                    self.BACKUP_DIR / filename,
+                    self._backup_files(db_snapshot=db_snapshot),
+                    self._tracker(filename),
+                )
+        finally:
+            if db_snapshot is not None:
+                db_snapshot.unlink(missing_ok=True)
+            backup_progress.discard(filename)
+            self._report(100, "启动实例")
+            # 重启所有实例（归档失败也要恢复）
+            for inst in instances:
+                if inst.status == "running":
+                    await self._start_container(inst.id)
 
         # 保存备份记录
         backup = Backup(
@@ -67,15 +288,18 @@ class BackupService:
             size=total_size,
             instance_count=instance_count
         )
-        self.db.add(backup)
-        self.db.commit()
-        self.db.refresh(backup)
+        return await self._save(backup)
 
+    async def _save(self, backup: Backup) -> Backup:
+        """保存备份记录并发布事件"""
+        self.db.add(backup)
+        await run_db(self.db.commit)
+        event_bus.publish("backup.created", backup.to_dict())
         return backup
 
     async def delete_backup(self, backup_id: int) -> None:
         """删除备份"""
-        backup = self.db.query(Backup).filter(Backup.id == backup_id).first()
+        backup = await run_db(self.db.get, Backup, backup_id)
         if not backup:
             raise ValueError(f"备份 {backup_id} 不存在")
 
@@ -86,11 +310,26 @@ class BackupService:
 
         # 删除记录
         self.db.delete(backup)
-        self.db.commit()
+        await run_db(self.db.commit)
+        event_bus.publish("backup.deleted", {"id": backup_id})
+
+        # 回收不再被任何清单引用的块：遍历全部清单与块且需等待进行中的备份完成，
+        # 交给 backup 任务池在后台执行（与备份串行），删除请求立即返回
+        if is_manifest(backup.filename):
+            await job_manager.submit("backup.gc", {})
+
+    async def gc(self) -> int:
+        """回收未引用的块（在工作线程中执行），返回删除数量"""
+        return await asyncio.to_thread(self.store.gc)
 
-    async def restore_backup(self, backup_id: int) -> None:
-        """恢复备份"""
-        backup = self.db.query(Backup).filter(Backup.id == backup_id).first()
+    async def restore_backup(self, backup_id: int, instance_ids: Optional[list[str]] = None) -> dict:
+        """恢复备份。
+
+        指定 instance_ids（或备份本身为单实例备份）时只恢复这些实例的文件，其余实例保持运行。
+        各实例在线程池中并行还原：停止 → 还原（大小与校验和一致的文件跳过）→ 若原本在运行则立即启动，
+        不必等待整个备份还原完成。返回 {"restored": 写入文件数, "skipped": 跳过文件数}。
+        """
+        backup = await run_db(self.db.get, Backup, backup_id)
         if not backup:
             raise ValueError(f"备份 {backup_id} 不存在")
 
@@ -98,34 +337,237 @@ class BackupService:
         if not backup_path.exists():
             raise ValueError(f"备份文件不存在: {backup.filename}")
 
-        # 停止所有实例
-        instances = self.db.query(Instance).all()
-        for inst in instances:
-            if inst.status == "running":
-                await self._stop_container(inst.id)
+        if backup.instance_id:
+            if instance_ids and set(instance_ids) != {backup.instance_id}:
+                raise ValueError(f"备份 {backup_id} 仅包含实例 {backup.instance_id}")
+            instance_ids = [backup.instance_id]
 
-        # 解压备份
-        with zipfile.ZipFile(backup_path, "r") as zf:
-            zf.extractall("../")
+        if instance_ids:
+            query = self.db.query(Instance).filter(Instance.id.in_(instance_ids))
+            instances = await run_db(query.all)
+            missing = set(instance_ids) - {inst.id for inst in instances}
+            if missing:
+                raise ValueError(f"实例 {', '.join(sorted(missing))} 不存在")
+        else:
+            instances = await run_db(self.db.query(Instance).all)
+        running = {
+            inst.id for inst in instances if state_cache.get(inst.id, inst.status) == "running"
+        }
 
-        # 重启所有实例
-        for inst in instances:
-            await self._start_container(inst.id)
+        # 按实例分组备份内容；非实例文件（如 database/）归入 None 组，仅整体恢复时还原
+        groups = await asyncio.to_thread(self._member_groups, backup)
+        keys: list[Optional[str]] = [k for k in (instance_ids or list(groups)) if k in groups]
+        if None in keys:
+            # 数据库内容将被整体还原：先归还本会话持有的连接（已加载的对象在会话关闭后仍可读取）
+            await run_db(self.db.close)
+
+        async def _restore_group(key: Optional[str]) -> tuple[int, int]:
+            if key is not None:
+                async with instance_locks.hold(key):
+                    return await _restore_group_locked(key)
+            # 公共文件（含数据库）：与创建实例、渲染 compose 等跨实例操作互斥
+            async with fleet_lock:
+                try:
+                    return await _restore_group_locked(key)
+                finally:
+                    # 按还原后的实例重建端口分配位图与状态缓存
+                    await run_db(port_allocator.load)
+                    await run_db(state_cache.load)
+
+        async def _restore_group_locked(key: Optional[str]) -> tuple[int, int]:
+            was_running = key in running
+            if was_running:
+                await self._stop_container(key)
+            try:
+                return await asyncio.to_thread(
+                    self._restore_members, backup_path, groups.get(key, [])
+                )
+            finally:
+                if was_running:
+                    await self._start_container(key)
+
+        finished = 0
+        self._report(0, "恢复文件")
+
+        async def _tracked(key: Optional[str]) -> tuple[int, int]:
+            nonlocal finished
+            try:
+                return await _restore_group(key)
+            finally:
+                finished += 1
+                self._report(finished * 100 / len(keys))
+
+        restored = skipped = 0
+        errors = []
+        for key, outcome in await run_bounded(keys, _tracked, settings.restore_parallelism):
+            if isinstance(outcome, BaseException):
+                errors.append(f"{key or '公共文件'}: {outcome}")
+            else:
+                restored += outcome[0]
+                skipped += outcome[1]
+        logger.info("恢复备份 %s: 写入 %d 个文件，跳过 %d 个未变化文件", backup.filename, restored, skipped)
+        if errors:
+            raise RuntimeError("部分内容恢复失败: " + "; ".join(errors))
+        return {"restored": restored, "skipped": skipped}
+
+    def _member_groups(self, backup: Backup) -> dict[Optional[str], list]:
+        """读取备份成员并按实例分组：清单备份为 [(归档路径, 条目)]，ZIP 为 [ZipInfo]"""
+        groups: dict[Optional[str], list] = {}
+        if is_manifest(backup.filename):
+            members = list(self.store.read_manifest(backup.filename).get("files", {}).items())
+            names = [m[0] for m in members]
+        else:
+            with zipfile.ZipFile(self.BACKUP_DIR / backup.filename, "r") as zf:
+                members = [info for info in zf.infolist() if not info.is_dir()]
+            names = [info.filename for info in members]
+        for name, member in zip(names, members):
+            parts = name.split("/")
+            if _is_log_archive(parts):
+                # 旧备份中的日志归档不还原，避免覆盖归档进程正在追加的分段
+                continue
+            key = parts[1] if parts[0] == "instances" and len(parts) > 2 else None
+            groups.setdefault(key, []).append(member)
+        return groups
+
+    def _restore_members(self, backup_path: Path, members: list) -> tuple[int, int]:
+        """还原一组成员（在工作线程中执行），返回 (写入数, 跳过数)"""
+        root = PROJECT_ROOT.resolve()
+        restored = skipped = 0
+        zf = None
+        try:
+            for member in members:
+                arcname = member.filename if isinstance(member, zipfile.ZipInfo) else member[0]
+                if arcname == DB_ARCNAME:
+                    zf = self._restore_database(backup_path, member, zf)
+                    restored += 1
+                    continue
+                dest = (PROJECT_ROOT / arcname).resolve()
+                if not dest.is_relative_to(root):
+                    raise ValueError(f"备份包含非法路径: {arcname}")
+
+                if isinstance(member, zipfile.ZipInfo):
+                    if _zip_member_matches(member, dest):
+                        skipped += 1
+                        continue
+                    if zf is None:
+                        # 每个工作线程单独打开 ZIP，避免共享文件句柄
+                        zf = zipfile.ZipFile(backup_path, "r")
+                    _extract_zip_member(zf, member, dest)
+                else:
+                    entry = member[1]
+                    if self.store.matches(entry, dest):
+                        skipped += 1
+                        continue
+                    self.store.restore_file(entry, dest)
+                restored += 1
+        finally:
+            if zf is not None:
+                zf.close()
+        return restored, skipped
+
+    def _restore_database(
+        self, backup_path: Path, member, zf: Optional[zipfile.ZipFile]
+    ) -> Optional[zipfile.ZipFile]:
+        """把备份中的数据库解出到临时文件，再原地还原到当前数据库（jobs、backups 表保留当前内容），返回 ZIP 句柄"""
+        tmp = DB_PATH.with_name(f".{DB_PATH.name}.restore")
+        try:
+            if isinstance(member, zipfile.ZipInfo):
+                if zf is None:
+                    zf = zipfile.ZipFile(backup_path, "r")
+                _extract_zip_member(zf, member, tmp)
+            else:
+                self.store.restore_file(member[1], tmp)
+            restore_database(tmp)
+        finally:
+            tmp.unlink(missing_ok=True)
+        return zf
 
     async def _stop_container(self, instance_id: str) -> None:
         """停止容器"""
-        proc = await asyncio.create_subprocess_exec(
-            "docker", "stop", f"openclaw-{instance_id}",
-            stdout=asyncio.subprocess.DEVNULL,
-            stderr=asyncio.subprocess.DEVNULL
-        )
-        await proc.wait()
+        await DockerService().stop_container(instance_id)
 
     async def _start_container(self, instance_id: str) -> None:
         """启动容器"""
-        proc = await asyncio.create_subprocess_exec(
-            "docker", "compose", "-f", "../docker-compose.yml", "start", instance_id,
-            stdout=asyncio.subprocess.DEVNULL,
-            stderr=asyncio.subprocess.DEVNULL
-        )
-        await proc.wait()
+        await DockerService().start_container(instance_id)
+
+
+def _backup_stamp() -> str:
+    """备份文件名中的时间戳：毫秒精度加随机后缀，同一秒内的多次备份不会互相覆盖"""
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')[:-3]}-{uuid.uuid4().hex[:6]}"
+
+
+def _is_log_archive(parts: list[str]) -> bool:
+    """归档路径（按 / 拆分）是否位于 instances/<id>/logs/ 下"""
+    return len(parts) > 3 and parts[0] == "instances" and parts[2] == ARCHIVE_DIRNAME
+
+
+def _tree_files(root: Path, arc_prefix: str) -> Iterator[tuple[str, Path]]:
+    """遍历实例目录下的文件（跳过日志归档目录），生成 (归档路径, 本地路径)"""
+    for file_path in root.rglob("*"):
+        rel = file_path.relative_to(root)
+        if rel.parts[0] != ARCHIVE_DIRNAME and file_path.is_file():
+            yield f"{arc_prefix}/{rel.as_posix()}", file_path
+
+
+def _copy_tree(src: Path, dst: Path, hardlink: bool) -> None:
+    """复制目录（保留 mtime 以便增量索引命中）；hardlink 模式跨文件系统时回退为复制"""
+    def _link_or_copy(s: str, d: str) -> None:
+        try:
+            os.link(s, d)
+        except OSError:
+            shutil.copy2(s, d)
+
+    def _ignore(directory: str, names: list[str]) -> list[str]:
+        # 热备份暂停容器期间不复制日志归档
+        return [ARCHIVE_DIRNAME] if Path(directory) == src and ARCHIVE_DIRNAME in names else []
+
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copytree(
+        src, dst, symlinks=True, ignore=_ignore, copy_function=_link_or_copy if hardlink else shutil.copy2
+    )
+
+
+def _write_zip(path: Path, files: Iterator[tuple[str, Path]], progress: Callable[[int, int], None]) -> int:
+    """full 模式：逐文件流式写入 ZIP（先写临时文件，完成后改名），返回原始总大小"""
+    files = [(arcname, p, p.stat().st_size) for arcname, p in files]
+    total = sum(size for _, _, size in files)
+    compression = zipfile.ZIP_STORED if settings.backup_codec == "none" else zipfile.ZIP_DEFLATED
+    tmp = path.with_name(f".{path.name}.tmp")
+    done = 0
+    try:
+        with zipfile.ZipFile(
+            tmp, "w", compression, compresslevel=settings.backup_compress_level
+        ) as zf:
+            for arcname, file_path, size in files:
+                zf.write(file_path, arcname)
+                done += size
+                progress(done, total)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    progress(total, total)
+    return total
+
+
+def _zip_member_matches(info: zipfile.ZipInfo, dest: Path) -> bool:
+    """本地文件与 ZIP 成员大小及 CRC32 一致时视为无需还原"""
+    try:
+        if dest.stat().st_size != info.file_size:
+            return False
+    except FileNotFoundError:
+        return False
+    crc = 0
+    with dest.open("rb") as f:
+        while data := f.read(CHUNK_SIZE):
+            crc = zlib.crc32(data, crc)
+    return crc == info.CRC
+
+
+def _extract_zip_member(zf: zipfile.ZipFile, info: zipfile.ZipInfo, dest: Path) -> None:
+    """流式解压单个成员（先写临时文件再替换）"""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.restore")
+    with zf.open(info) as src, tmp.open("wb") as out:
+        shutil.copyfileobj(src, out, CHUNK_SIZE)
+    os.replace(tmp, dest)
@@ -0,0 +1,293 @@
+"""
+内容寻址的增量备份存储：文件按块切分并以 SHA-256 去重，每次备份只写清单与新增块
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from app.services.fileutil import atomic_write_text
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖：pip install claw-multi-deploy[backup]
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# 定长分块大小
+CHUNK_SIZE = 4 * 1024 * 1024
+
+MANIFEST_SUFFIX = ".json"
+
+# 块文件首字节标记压缩方式
+_CODEC_ZLIB = b"Z"
+_CODEC_ZSTD = b"S"
+_CODEC_NONE = b"N"
+
+# 进度回调：(已处理字节数, 总字节数)
+ProgressCallback = Callable[[int, int], None]
+
+
+def available_codecs() -> list[str]:
+    return ["zlib", "none"] + (["zstd"] if zstandard is not None else [])
+
+
+def _compress(codec: str, data: bytes, level: int) -> bytes:
+    """压缩数据块并加上编码标记；压缩无收益时原样存储"""
+    if codec == "zstd":
+        packed, tag = zstandard.ZstdCompressor(level=level).compress(data), _CODEC_ZSTD
+    elif codec == "zlib":
+        packed, tag = zlib.compress(data, level), _CODEC_ZLIB
+    else:
+        return _CODEC_NONE + data
+    return tag + packed if len(packed) < len(data) else _CODEC_NONE + data
+
+
+def _decompress(payload: bytes) -> bytes:
+    codec, body = payload[:1], payload[1:]
+    if codec == _CODEC_ZLIB:
+        return zlib.decompress(body)
+    if codec == _CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("该备份使用 zstd 压缩，请先安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(body)
+    if codec == _CODEC_NONE:
+        return body
+    raise ValueError(f"未知的块编码: {codec!r}")
+
+# 创建备份与垃圾回收互斥，避免回收掉尚未写入清单的新块
+_store_lock = threading.Lock()
+
+
+def is_manifest(filename: str) -> bool:
+    return filename.endswith(MANIFEST_SUFFIX)
+
+
+class ChunkStore:
+    """备份目录下的块存储：
+
+    - chunks/<hash[:2]>/<hash>：压缩后的数据块
+    - <backup>.json：备份清单（归档路径 → 大小、mtime、权限、块列表）
+    - .index.json：上次备份的 (size, mtime_ns) 索引，未变化的文件跳过重新哈希
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        codec: str = "zlib",
+        compress_level: int = 6,
+        workers: Optional[int] = None,
+    ):
+        self.root = root
+        self.chunks_dir = root / "chunks"
+        self.index_path = root / ".index.json"
+        if codec not in available_codecs():
+            logger.warning("备份压缩算法 %s 不可用，回退为 zlib", codec)
+            codec = "zlib"
+        self.codec = codec
+        self.compress_level = compress_level
+        # 哈希与压缩在线程池中并行（hashlib/zlib/zstd 处理大块数据时释放 GIL）
+        self.workers = workers or os.cpu_count() or 1
+        self.chunks_dir.mkdir(parents=True, exist_ok=True)
+
+    # ---- 块 ----
+
+    def chunk_path(self, digest: str) -> Path:
+        return self.chunks_dir / digest[:2] / digest
+
+    def has_chunk(self, digest: str) -> bool:
+        return self.chunk_path(digest).exists()
+
+    def put_chunk(self, data: bytes) -> tuple[str, int]:
+        """写入数据块，返回 (哈希, 新写入的字节数)；已存在则不写"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.chunk_path(digest)
+        if path.exists():
+            return digest, 0
+        payload = _compress(self.codec, data, self.compress_level)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 并行写入同一块时各自使用独立临时文件
+        tmp = path.with_name(f"{digest}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(payload)
+        os.replace(tmp, path)
+        return digest, len(payload)
+
+    def get_chunk(self, digest: str) -> bytes:
+        return _decompress(self.chunk_path(digest).read_bytes())
+
+    # ---- 文件 ----
+
+    def _reusable(self, st: os.stat_result, previous: Optional[dict]) -> bool:
+        """上次索引条目的大小与 mtime 一致且块仍存在时可直接复用"""
+        return (
+            previous is not None
+            and previous.get("size") == st.st_size
+            and previous.get("mtime_ns") == st.st_mtime_ns
+            and all(self.has_chunk(c) for c in previous.get("chunks", []))
+        )
+
+    def matches(self, entry: dict, path: Path) -> bool:
+        """本地文件大小一致且逐块 SHA-256 与清单相同时返回 True"""
+        try:
+            if path.stat().st_size != entry.get("size"):
+                return False
+        except FileNotFoundError:
+            return False
+        chunks = entry.get("chunks", [])
+        with path.open("rb") as f:
+            for digest in chunks:
+                if hashlib.sha256(f.read(CHUNK_SIZE)).hexdigest() != digest:
+                    return False
+        return True
+
+    def restore_file(self, entry: dict, dest: Path) -> None:
+        """按清单条目还原文件（先写临时文件再替换）"""
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{dest.name}.restore")
+        with tmp.open("wb") as f:
+            for digest in entry.get("chunks", []):
+                f.write(self.get_chunk(digest))
+        if entry.get("mode"):
+            os.chmod(tmp, entry["mode"])
+        os.replace(tmp, dest)
+        if entry.get("mtime_ns"):
+            os.utime(dest, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+
+    # ---- 清单与索引 ----
+
+    def manifest_path(self, name: str) -> Path:
+        return self.root / name
+
+    def write_manifest(self, name: str, manifest: dict) -> int:
+        content = json.dumps(manifest, ensure_ascii=False, separators=(",", ":"))
+        atomic_write_text(self.manifest_path(name), content)
+        return len(content.encode("utf-8"))
+
+    def read_manifest(self, name: str) -> dict:
+        return json.loads(self.manifest_path(name).read_text(encoding="utf-8"))
+
+    def load_index(self) -> dict:
+        try:
+            return json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_index(self, files: dict) -> None:
+        atomic_write_text(
+            self.index_path,
+            json.dumps(
+                {k: {kk: v[kk] for kk in ("size", "mtime_ns", "chunks")} for k, v in files.items()},
+                separators=(",", ":"),
+            ),
+        )
+
+    def snapshot(
+        self,
+        name: str,
+        files: Iterable[tuple[str, Path]],
+        meta: dict,
+        progress: Optional[ProgressCallback] = None,
+    ) -> tuple[int, int]:
+        """存储一组 (归档路径, 本地路径) 并写入清单 name，返回 (逻辑总大小, 新写入字节数)。
+
+        逐文件流式读取，数据块提交到线程池并行哈希压缩；在途块数有上限以控制内存。
+        同步阻塞，调用方应放到工作线程中执行。
+        """
+        files = [(arcname, path, path.stat()) for arcname, path in files]
+        total_bytes = sum(st.st_size for _, _, st in files)
+        done_bytes = 0
+        # 在途（已读入内存尚未写盘）的块数上限
+        slots = threading.BoundedSemaphore(self.workers * 2)
+
+        def _put(data: bytes) -> tuple[str, int]:
+            try:
+                return self.put_chunk(data)
+            finally:
+                slots.release()
+
+        with _store_lock, ThreadPoolExecutor(self.workers, thread_name_prefix="backup") as pool:
+            index = self.load_index()
+            result: dict[str, dict] = {}
+            written = 0
+            # 按提交顺序等待完成的文件：(归档路径, 条目, 块 futures)
+            pending: deque[tuple[str, dict, list[Future]]] = deque()
+
+            def _finish(block: bool) -> None:
+                nonlocal written, done_bytes
+                while pending and (block or all(f.done() for f in pending[0][2])):
+                    arcname, entry, futures = pending.popleft()
+                    for fut in futures:
+                        digest, n = fut.result()
+                        entry["chunks"].append(digest)
+                        written += n
+                    result[arcname] = entry
+                    done_bytes += entry["size"]
+                    if progress:
+                        progress(done_bytes, total_bytes)
+
+            for arcname, path, st in files:
+                previous = index.get(arcname)
+                if self._reusable(st, previous):
+                    entry = dict(previous, chunks=list(previous["chunks"]), mode=st.st_mode & 0o777)
+                    pending.append((arcname, entry, []))
+                else:
+                    entry = {
+                        "size": st.st_size,
+                        "mtime_ns": st.st_mtime_ns,
+                        "mode": st.st_mode & 0o777,
+                        "chunks": [],
+                    }
+                    futures: list[Future] = []
+                    pending.append((arcname, entry, futures))
+                    with path.open("rb") as f:
+                        while data := f.read(CHUNK_SIZE):
+                            slots.acquire()
+                            futures.append(pool.submit(_put, data))
+                _finish(block=False)
+            _finish(block=True)
+            if progress:
+                progress(total_bytes, total_bytes)
+
+            total = sum(e["size"] for e in result.values())
+            written += self.write_manifest(name, {"version": 1, **meta, "files": result})
+            index.update(result)
+            self.save_index(index)
+        return total, written
+
+    def gc(self) -> int:
+        """删除所有清单都不再引用的块，返回删除数量"""
+        with _store_lock:
+            referenced: set[str] = set()
+            for manifest_file in self.root.glob(f"*{MANIFEST_SUFFIX}"):
+                if manifest_file.name.startswith("."):
+                    continue
+                try:
+                    manifest = json.loads(manifest_file.read_text(encoding="utf-8"))
+                except ValueError:
+                    logger.warning("无法解析备份清单，跳过回收以免误删: %s", manifest_file)
+                    return 0
+                for entry in manifest.get("files", {}).values():
+                    referenced.update(entry.get("chunks", []))
+
+            removed = 0
+            for chunk_file in self.chunks_dir.glob("*/*"):
+                if chunk_file.name not in referenced:
+                    chunk_file.unlink(missing_ok=True)
+                    removed += 1
+
+            # 索引中引用已删除块的条目会在下次备份时因块缺失而重新哈希，这里顺便清理
+            index = self.load_index()
+            pruned = {k: v for k, v in index.items() if set(v.get("chunks", [])) <= referenced}
+            if len(pruned) != len(index):
+                self.save_index(pruned)
+        if removed:
+            logger.info("备份块回收: 删除 %d 个未引用块", removed)
+        return removed
@@ -0,0 +1,137 @@
+"""
+批量实例操作服务（start/stop/restart、配置修改）
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import run_db
+from app.models import Instance
+from app.services.config_cache import config_cache, instance_config_path
+from app.services.docker_service import DockerService
+from app.services.instance_locks import instance_locks
+from app.services.instance_service import InstanceService
+from app.services.scheduler import chunked, run_bounded
+from app.services.state_cache import state_cache
+
+logger = logging.getLogger(__name__)
+
+# 操作成功后写入的实例状态
+_ACTION_STATUS = {"start": "running", "stop": "stopped", "restart": "running"}
+
+
+class BatchService:
+    """批量实例操作：compose 文件只生成一次，按块合并 docker 调用并以有界并发执行"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.docker = DockerService()
+
+    def select(self, ids: Optional[list[str]] = None, status: Optional[str] = None) -> list[Instance]:
+        """按 ID 列表和/或状态选择实例；ids 为空列表时不选择任何实例，两者都为 None 时选择全部。
+        状态与列表接口展示的一致，取自内存状态缓存"""
+        if ids is not None and not ids:
+            return []
+        query = self.db.query(Instance)
+        if ids is not None:
+            query = query.filter(Instance.id.in_(ids))
+        instances = query.order_by(Instance.port).all()
+        if status:
+            instances = [i for i in instances if state_cache.get(i.id, i.status) == status]
+        return instances
+
+    async def run(
+        self,
+        action: str,
+        instances: list[Instance],
+        parallelism: Optional[int] = None,
+    ) -> dict[str, Optional[str]]:
+        """执行批量操作，返回 {instance_id: 错误信息或 None}"""
+        if action not in _ACTION_STATUS:
+            raise ValueError(f"不支持的操作: {action}")
+        ids = [inst.id for inst in instances]
+        if not ids:
+            return {}
+
+        if action in ("start", "restart"):
+            # 启动前确保 docker-compose.yml 与当前实例列表一致（整批只生成一次）
+            await InstanceService(self.db)._regenerate_compose(ids)
+
+        results: dict[str, Optional[str]] = {}
+        chunks = chunked(ids, settings.batch_chunk_size)
+        for chunk, outcome in await run_bounded(
+            chunks,
+            lambda c: self._run_chunk(action, c),
+            parallelism or settings.batch_parallelism,
+        ):
+            if isinstance(outcome, BaseException):
+                results.update({i: str(outcome) for i in chunk})
+            else:
+                results.update(outcome)
+
+        # 与单实例路由一致：启动失败标记为 error，停止失败保持原状态
+        for inst in instances:
+            if results.get(inst.id) is None:
+                inst.status = _ACTION_STATUS[action]
+            elif action != "stop":
+                inst.status = "error"
+        await run_db(self.db.commit)
+        for inst in instances:
+            state_cache.set(inst.id, inst.status)
+        return results
+
+    async def patch_config(
+        self,
+        instances: list[Instance],
+        patch: dict,
+        parallelism: Optional[int] = None,
+    ) -> dict[str, bool | str]:
+        """对每个实例的配置应用 merge-patch，返回 {instance_id: 是否变化 或 错误信息}"""
+
+        async def _one(instance_id: str) -> bool:
+            config_path, _ = instance_config_path(instance_id)
+            if not config_path.exists():
+                raise FileNotFoundError("实例配置文件不存在")
+            return await asyncio.to_thread(config_cache.patch, config_path, patch)
+
+        results: dict[str, bool | str] = {}
+        for instance_id, outcome in await run_bounded(
+            [inst.id for inst in instances], _one, parallelism or settings.batch_parallelism
+        ):
+            results[instance_id] = str(outcome) if isinstance(outcome, BaseException) else outcome
+        return results
+
+    async def _run_chunk(self, action: str, ids: list[str]) -> dict[str, Optional[str]]:
+        """整块一次调用；失败时逐个重试以得到单实例结果。执行期间持有块内各实例的锁"""
+        async with instance_locks.hold_many(ids):
+            return await self._run_chunk_locked(action, ids)
+
+    async def _run_chunk_locked(self, action: str, ids: list[str]) -> dict[str, Optional[str]]:
+        try:
+            await self._call(action, ids)
+            return {i: None for i in ids}
+        except Exception as e:
+            if len(ids) == 1:
+                return {ids[0]: str(e)}
+            logger.warning("批量 %s 失败，逐个重试 %s: %s", action, ids, e)
+
+        results: dict[str, Optional[str]] = {}
+        for instance_id in ids:
+            try:
+                await self._call(action, [instance_id])
+                results[instance_id] = None
+            except Exception as e:
+                results[instance_id] = str(e)
+        return results
+
+    async def _call(self, action: str, ids: list[str]) -> None:
+        if action == "start":
+            await self.docker.start_instances(ids)
+        elif action == "stop":
+            await self.docker.stop_instances(ids)
+        else:
+            await self.docker.restart_instances(ids)
@@ -0,0 +1,223 @@
+"""
+docker-compose.yml 增量渲染：按服务缓存渲染结果，内容哈希不变时不写文件
+"""
+
+import hashlib
+import logging
+import re
+import threading
+from pathlib import Path
+from typing import Optional
+
+from app.database import PROJECT_ROOT
+from app.services.fileutil import atomic_write_text
+
+logger = logging.getLogger(__name__)
+
+# 默认模板（Compose V2 已废弃 version，不再写入）
+DEFAULT_TEMPLATE = """services:
+{services}
+"""
+
+NETWORKS_BLOCK = """
+networks:
+  openclaw-net:
+    driver: bridge
+"""
+
+# 按实例布局下各 compose 项目共享的外部网络
+SHARED_NETWORK = "openclaw-net"
+
+# 容器标签：服务定义（连同模板）的哈希。启动已有容器前与当前渲染结果比对，
+# 不一致说明端口或模板已修改，需经 docker compose up 重建容器
+SERVICE_HASH_LABEL = "claw.service-hash"
+
+PROJECT_NETWORKS_BLOCK = f"""
+networks:
+  openclaw-net:
+    name: {SHARED_NETWORK}
+    external: true
+"""
+
+
+def project_name(instance_id: str) -> str:
+    """按实例布局下的 compose 项目名（仅允许小写字母、数字、- 和 _；含大写时追加哈希避免大小写冲突）"""
+    name = re.sub(r"[^a-z0-9_-]", "-", instance_id.lower())
+    if name != instance_id:
+        name += "-" + hashlib.sha1(instance_id.encode("utf-8")).hexdigest()[:6]
+    return f"openclaw-{name}"
+
+
+def project_compose_path(instance_id: str) -> Path:
+    return PROJECT_ROOT / "instances" / instance_id / "compose.yml"
+
+
+def render_service(
+    instance_id: str, port: int, data_path: Optional[str] = None, salt: str = ""
+) -> tuple[str, str]:
+    """渲染单个实例的服务定义，返回 (服务块, 服务哈希)；data_path 为相对 compose 文件的数据目录，
+    salt 为参与哈希的模板内容（对齐官方 docker-compose：Gateway 18789 + Bridge 18790，卷 /home/node/.openclaw）
+    见 openclaw 仓库 docker-compose.yml 与 docker-setup.sh
+    """
+    # 服务名必须为字符串，否则 ID 为纯数字（如 1）时 YAML 会解析成数字键，docker compose 报 non-string key
+    sid = instance_id
+    data = data_path or f"./instances/{sid}/data"
+    block = f'''  "{sid}":
+    image: openclaw:local
+    container_name: openclaw-{sid}
+    ports:
+      - "{port}:18789"
+      - "{port + 1}:18790"
+    volumes:
+      - {data}:/home/node/.openclaw
+      - {data}/workspace:/home/node/.openclaw/workspace
+    environment:
+      - HOME=/home/node
+      - TERM=xterm-256color
+      - NODE_ENV=production
+      - TZ=Asia/Shanghai
+    init: true
+    restart: unless-stopped
+    command:
+      - node
+      - dist/index.js
+      - gateway
+      - --bind
+      - lan
+      - --port
+      - "18789"
+    networks:
+      - openclaw-net'''
+    digest = hashlib.sha256((salt + block).encode("utf-8")).hexdigest()[:16]
+    return block + f'''
+    labels:
+      - "{SERVICE_HASH_LABEL}={digest}"''', digest
+
+
+class ComposeRenderer:
+    """缓存每个服务的渲染块；实例定义与模板均未变化时直接返回，不做任何文件读写"""
+
+    def __init__(self, compose_path: Path, template_path: Path):
+        self.compose_path = compose_path
+        self.template_path = template_path
+        # instance_id -> ((port, 模板 mtime), 服务块, 服务哈希)
+        self._blocks: dict[str, tuple[tuple[int, int], str, str]] = {}
+        self._template: Optional[tuple[int, str]] = None
+        self._last_key: Optional[tuple] = None
+        self._written_hash: Optional[str] = None
+        # 按实例布局：instance_id -> ((port, 模板 mtime), 已写入内容的哈希, 服务哈希)
+        self._projects: dict[str, tuple[tuple[int, int], str, str]] = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        """丢弃全部缓存，下次 render 时重新渲染并比对文件内容"""
+        with self._lock:
+            self._blocks.clear()
+            self._template = None
+            self._last_key = None
+            self._written_hash = None
+            self._projects.clear()
+
+    def service_hash(self, instance_id: str) -> Optional[str]:
+        """最近一次渲染的服务哈希（与容器标签 SERVICE_HASH_LABEL 比对）；尚未渲染过时返回 None"""
+        with self._lock:
+            project = self._projects.get(instance_id)
+            if project is not None:
+                return project[2]
+            block = self._blocks.get(instance_id)
+            return block[2] if block is not None else None
+
+    def render(self, instances: list[tuple[str, int]]) -> bool:
+        """根据 [(instance_id, port), ...] 生成 docker-compose.yml，返回是否写入了文件"""
+        with self._lock:
+            template_mtime = self._template_mtime()
+            key = (template_mtime, tuple(instances))
+            if key == self._last_key and self.compose_path.exists():
+                return False
+
+            template = self._load_template(template_mtime)
+            services = []
+            alive = set()
+            for instance_id, port in instances:
+                alive.add(instance_id)
+                cached = self._blocks.get(instance_id)
+                if cached is None or cached[0] != (port, template_mtime):
+                    cached = ((port, template_mtime), *render_service(instance_id, port, salt=template))
+                    self._blocks[instance_id] = cached
+                services.append(cached[1])
+            for stale in set(self._blocks) - alive:
+                del self._blocks[stale]
+
+            # services 不能为空否则 YAML 解析报 "services must be a mapping"
+            services_block = "\n".join(services) if services else "  {}"
+            content = template.format(services=services_block) + NETWORKS_BLOCK
+            digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+            if self._written_hash is None and self.compose_path.exists():
+                existing = self.compose_path.read_bytes()
+                self._written_hash = hashlib.sha256(existing).hexdigest()
+            self._last_key = key
+            if digest == self._written_hash and self.compose_path.exists():
+                return False
+
+            atomic_write_text(self.compose_path, content)
+            self._written_hash = digest
+            logger.info("docker-compose.yml 已更新: %d 个服务", len(services))
+            return True
+
+    def render_project(self, instance_id: str, port: int) -> bool:
+        """按实例布局：生成 instances/<id>/compose.yml，只包含该实例并接入共享外部网络；
+        与单文件布局使用同一模板，两种布局生成的容器定义一致"""
+        path = project_compose_path(instance_id)
+        with self._lock:
+            template_mtime = self._template_mtime()
+            key = (port, template_mtime)
+            cached = self._projects.get(instance_id)
+            if cached is not None and cached[0] == key and path.exists():
+                return False
+
+            template = self._load_template(template_mtime)
+            block, service_digest = render_service(
+                instance_id, port, data_path="./data", salt=template
+            )
+            content = (
+                f"name: {project_name(instance_id)}\n"
+                + template.format(services=block)
+                + PROJECT_NETWORKS_BLOCK
+            )
+            digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            if path.exists() and hashlib.sha256(path.read_bytes()).hexdigest() == digest:
+                self._projects[instance_id] = (key, digest, service_digest)
+                return False
+
+            atomic_write_text(path, content)
+            self._projects[instance_id] = (key, digest, service_digest)
+            logger.info("compose 项目已更新: %s", path)
+            return True
+
+    def remove_project(self, instance_id: str) -> None:
+        """删除实例的 compose 项目文件"""
+        with self._lock:
+            self._projects.pop(instance_id, None)
+            project_compose_path(instance_id).unlink(missing_ok=True)
+
+    def _template_mtime(self) -> int:
+        try:
+            return self.template_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def _load_template(self, mtime: int) -> str:
+        if self._template is None or self._template[0] != mtime:
+            text = (
+                self.template_path.read_text(encoding="utf-8") if mtime else DEFAULT_TEMPLATE
+            )
+            self._template = (mtime, text)
+        return self._template[1]
+
+
+# 进程内共享实例
+compose_renderer = ComposeRenderer(
+    PROJECT_ROOT / "docker-compose.yml",
+    PROJECT_ROOT / "docker-compose.template.yml",
+)
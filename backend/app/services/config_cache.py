@@ -0,0 +1,128 @@
+"""
+实例配置（openclaw.json）解析缓存：按文件 mtime 与大小判断是否失效，命中时只需一次 stat
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+import pyjson5
+
+from app.config import settings
+from app.database import PROJECT_ROOT
+from app.services.fileutil import atomic_write_text
+
+
+def instance_config_path(instance_id: str) -> tuple[Path, Path]:
+    """返回 (主路径, 回退路径)。官方用 /home/node/.openclaw → 对应 data，优先 data。"""
+    base = PROJECT_ROOT / "instances" / instance_id
+    data_path = base / "data" / "openclaw.json"
+    config_path = base / "config" / "openclaw.json"
+    if data_path.exists():
+        return data_path, config_path
+    if config_path.exists():
+        return config_path, data_path
+    return data_path, config_path  # 默认读写 data
+
+
+def merge_patch(target: Any, patch: Any) -> Any:
+    """RFC 7396 JSON Merge Patch：对象逐键递归合并，null 表示删除，其余值整体替换。
+    不修改 target，未改动的子树与 target 共享"""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+class ConfigCache:
+    """解析结果的 LRU 缓存，键为路径，条目记录解析时的 (st_mtime_ns, st_size)。
+
+    返回的 dict 为缓存共享对象，调用方需要修改时应先 copy.deepcopy。
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Path, tuple[tuple[int, int], dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        # 每个文件一把写锁，串行化同一配置的读-改-写
+        self._write_locks: dict[Path, threading.Lock] = {}
+
+    def load(self, path: Path) -> dict:
+        """读取并解析配置；文件不存在抛出 FileNotFoundError，格式错误抛出解析异常"""
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            self.invalidate(path)
+            raise
+        key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None and cached[0] == key:
+                self._entries.move_to_end(path)
+                return cached[1]
+
+        cfg = pyjson5.loads(path.read_text(encoding="utf-8"))
+        if not isinstance(cfg, dict):
+            raise ValueError("配置顶层必须是对象")
+        with self._lock:
+            self._entries[path] = (key, cfg)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return cfg
+
+    def gateway_token(self, instance_id: str) -> str | None:
+        """读取实例 gateway.auth.token；配置缺失或无法解析时返回 None"""
+        config_path, _ = instance_config_path(instance_id)
+        try:
+            cfg = self.load(config_path)
+        except Exception:
+            return None
+        auth = (cfg.get("gateway") or {}).get("auth")
+        return (auth.get("token") if isinstance(auth, dict) else None) or None
+
+    def _write_lock(self, path: Path) -> threading.Lock:
+        with self._lock:
+            return self._write_locks.setdefault(path, threading.Lock())
+
+    def patch(self, path: Path, patch: dict) -> bool:
+        """对配置应用 merge-patch 并原子写回，返回内容是否变化；同步阻塞。
+
+        写回为标准 JSON：原文件中的 JSON5 注释、尾逗号与未加引号的键不会保留。
+        需要保留原始格式时使用 write 整体替换。
+        """
+        with self._write_lock(path):
+            current = self.load(path)
+            updated = merge_patch(current, patch)
+            if updated == current:
+                return False
+            atomic_write_text(path, json.dumps(updated, ensure_ascii=False, indent=2))
+            self.invalidate(path)
+        return True
+
+    def write(self, path: Path, content: str) -> None:
+        """整体替换配置原文（原样写入，保留注释）；与 patch 共用写锁，同步阻塞"""
+        with self._write_lock(path):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_text(path, content)
+            self.invalidate(path)
+
+    def invalidate(self, path: Path) -> None:
+        """写入配置后调用（同一时间粒度内的写入 mtime 可能不变）"""
+        with self._lock:
+            self._entries.pop(path, None)
+
+    def invalidate_instance(self, instance_id: str) -> None:
+        for path in instance_config_path(instance_id):
+            self.invalidate(path)
+
+
+# 进程内共享实例
+config_cache = ConfigCache(settings.config_cache_size)
@@ -0,0 +1,202 @@
+"""
+容器资源采样：为每个运行中的 openclaw-* 容器保持一条 Docker stats 流，缓存最新一条样本供 /metrics 导出
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+from app.config import settings
+from app.services.docker_api import DockerAPIClient
+from app.services.metrics import GaugeFamily, registry
+from app.services.state_cache import CONTAINER_PREFIX, state_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _memory_usage(mem: dict) -> int:
+    """与 docker stats 一致：扣除可回收的页缓存（cgroup v2 为 inactive_file，v1 为 total_inactive_file）"""
+    usage = mem.get("usage") or 0
+    stats = mem.get("stats") or {}
+    cache = stats.get("inactive_file", stats.get("total_inactive_file", 0))
+    return max(usage - cache, 0)
+
+
+def _cpu_percent(sample: dict) -> float:
+    cpu, pre = sample.get("cpu_stats") or {}, sample.get("precpu_stats") or {}
+    cpu_delta = (cpu.get("cpu_usage") or {}).get("total_usage", 0) - (
+        pre.get("cpu_usage") or {}
+    ).get("total_usage", 0)
+    system_delta = cpu.get("system_cpu_usage", 0) - pre.get("system_cpu_usage", 0)
+    online = cpu.get("online_cpus") or len((cpu.get("cpu_usage") or {}).get("percpu_usage") or []) or 1
+    if cpu_delta <= 0 or system_delta <= 0:
+        return 0.0
+    return cpu_delta / system_delta * online * 100.0
+
+
+def _blkio(sample: dict) -> tuple[int, int]:
+    read = write = 0
+    for entry in (sample.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []:
+        op = (entry.get("op") or "").lower()
+        if op == "read":
+            read += entry.get("value", 0)
+        elif op == "write":
+            write += entry.get("value", 0)
+    return read, write
+
+
+def summarize(sample: dict) -> dict[str, float]:
+    """从一条 stats 样本提取导出字段"""
+    cpu = sample.get("cpu_stats") or {}
+    mem = sample.get("memory_stats") or {}
+    networks = (sample.get("networks") or {}).values()
+    read, write = _blkio(sample)
+    return {
+        "cpu_seconds": (cpu.get("cpu_usage") or {}).get("total_usage", 0) / 1e9,
+        "cpu_percent": _cpu_percent(sample),
+        "memory_usage": _memory_usage(mem),
+        "memory_limit": mem.get("limit") or 0,
+        "rx_bytes": sum(n.get("rx_bytes", 0) for n in networks),
+        "tx_bytes": sum(n.get("tx_bytes", 0) for n in networks),
+        "blkio_read": read,
+        "blkio_write": write,
+        "pids": (sample.get("pids_stats") or {}).get("current") or 0,
+    }
+
+
+# (字段, 指标名, 类型, 说明)
+_FIELDS = [
+    ("cpu_seconds", "claw_container_cpu_seconds_total", "counter", "容器累计 CPU 时间（秒）"),
+    ("cpu_percent", "claw_container_cpu_percent", "gauge", "容器 CPU 使用率（%，按核数累加）"),
+    ("memory_usage", "claw_container_memory_usage_bytes", "gauge", "容器内存使用（不含页缓存）"),
+    ("memory_limit", "claw_container_memory_limit_bytes", "gauge", "容器内存上限"),
+    ("rx_bytes", "claw_container_network_receive_bytes_total", "counter", "容器网络累计接收字节"),
+    ("tx_bytes", "claw_container_network_transmit_bytes_total", "counter", "容器网络累计发送字节"),
+    ("blkio_read", "claw_container_blkio_read_bytes_total", "counter", "容器块设备累计读取字节"),
+    ("blkio_write", "claw_container_blkio_write_bytes_total", "counter", "容器块设备累计写入字节"),
+    ("pids", "claw_container_pids", "gauge", "容器内进程数"),
+]
+_FAMILIES = [(key, GaugeFamily(name, help, ("instance",), kind)) for key, name, kind, help in _FIELDS]
+_RESTARTS = GaugeFamily(
+    "claw_container_restarts_total", "容器重启次数（Docker RestartCount）", ("instance",), "counter"
+)
+_INSTANCES = GaugeFamily("claw_instances", "各状态的实例数", ("status",))
+
+
+class ContainerStatsSampler:
+    """定期按容器列表校正：新运行的容器开一条 stats 流，已停止的容器流自然结束并清除样本"""
+
+    def __init__(self):
+        self._samples: dict[str, dict[str, float]] = {}
+        self._restarts: dict[str, int] = {}
+        self._streams: dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        # stats 为长连接，使用独立连接池，避免占满共享客户端的连接
+        self._api: Optional[DockerAPIClient] = None
+
+    def samples(self) -> dict[str, dict[str, float]]:
+        return dict(self._samples)
+
+    async def start(self) -> None:
+        if not settings.metrics_container_stats or not settings.docker_use_api:
+            return
+        self._api = DockerAPIClient(
+            settings.docker_socket,
+            api_version=settings.docker_api_version,
+            max_connections=settings.metrics_max_streams + 1,
+            timeout=settings.docker_api_timeout,
+        )
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        tasks = list(self._streams.values())
+        if self._task is not None:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._streams.clear()
+        if self._api is not None:
+            await self._api.aclose()
+            self._api = None
+
+    async def _loop(self) -> None:
+        failing = False
+        while True:
+            try:
+                await self._sync()
+                if failing:
+                    logger.info("容器资源采样已恢复")
+                failing = False
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not failing:
+                    logger.warning("容器资源采样失败（Docker API 不可用？）: %s", e)
+                failing = True
+            await asyncio.sleep(settings.metrics_sync_interval)
+
+    async def _sync(self) -> None:
+        running: set[str] = set()
+        for c in await self._api.list_containers(CONTAINER_PREFIX, all=False):
+            for name in c.get("Names") or []:
+                name = name.lstrip("/")
+                if name.startswith(CONTAINER_PREFIX):
+                    running.add(name[len(CONTAINER_PREFIX):])
+
+        for instance_id in list(self._streams):
+            if instance_id not in running:
+                self._streams.pop(instance_id).cancel()
+        for instance_id in set(self._samples) - running:
+            self._samples.pop(instance_id, None)
+        for instance_id in set(self._restarts) - running:
+            self._restarts.pop(instance_id, None)
+
+        for instance_id in sorted(running):
+            info = await self._api.inspect_container(CONTAINER_PREFIX + instance_id)
+            if info is not None:
+                self._restarts[instance_id] = info.get("RestartCount") or 0
+            task = self._streams.get(instance_id)
+            if task is not None and not task.done():
+                continue
+            if len(self._streams) >= settings.metrics_max_streams:
+                logger.warning("stats 流数量已达上限 %d，跳过 %s", settings.metrics_max_streams, instance_id)
+                continue
+            self._streams[instance_id] = asyncio.create_task(self._stream(instance_id))
+
+    async def _stream(self, instance_id: str) -> None:
+        try:
+            async for sample in self._api.stats(CONTAINER_PREFIX + instance_id):
+                self._samples[instance_id] = summarize(sample)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug("实例 %s stats 流结束: %s", instance_id, e)
+        finally:
+            # 流结束（容器停止）后丢弃样本；仍在运行则下一轮校正时重新打开
+            if self._streams.get(instance_id) is asyncio.current_task():
+                self._streams.pop(instance_id, None)
+                self._samples.pop(instance_id, None)
+
+    def collect(self) -> list[str]:
+        samples = sorted(self._samples.items())
+        lines: list[str] = []
+        for key, family in _FAMILIES:
+            lines += family.render(((i,), s[key]) for i, s in samples)
+        lines += _RESTARTS.render(((i,), n) for i, n in sorted(self._restarts.items()))
+        return lines
+
+
+def _instance_metrics() -> list[str]:
+    counts: dict[str, int] = {s: 0 for s in ("created", "running", "stopped", "error")}
+    for status in state_cache.snapshot().values():
+        counts[status] = counts.get(status, 0) + 1
+    return _INSTANCES.render(((s,), n) for s, n in counts.items())
+
+
+# 进程内共享实例，由 main.lifespan 启停
+container_stats = ContainerStatsSampler()
+
+registry.add_collector(_instance_metrics)
+registry.add_collector(container_stats.collect)
@@ -0,0 +1,294 @@
+"""
+Docker Engine API 客户端（直连 unix socket，连接池 + keep-alive）
+"""
+
+import json
+import logging
+import os
+from typing import AsyncGenerator, Optional
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DockerAPIError(RuntimeError):
+    """Docker Engine API 返回非成功状态码"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _error_message(resp: httpx.Response) -> str:
+    try:
+        return resp.json().get("message") or resp.text
+    except Exception:
+        return resp.text or f"HTTP {resp.status_code}"
+
+
+async def _frames(chunks: AsyncGenerator[bytes, None]) -> AsyncGenerator[tuple[int, bytes], None]:
+    """拆分非 TTY 容器的多路复用流：每帧 8 字节头（流类型 + 3 字节填充 + 4 字节大端长度）"""
+    buf = bytearray()
+    async for chunk in chunks:
+        buf += chunk
+        pos = 0
+        while len(buf) - pos >= 8:
+            size = int.from_bytes(buf[pos + 4:pos + 8], "big")
+            if len(buf) - pos < 8 + size:
+                break
+            yield buf[pos], bytes(buf[pos + 8:pos + 8 + size])
+            pos += 8 + size
+        # 已解析的帧一次性移出缓冲区
+        del buf[:pos]
+
+
+async def _demux(chunks: AsyncGenerator[bytes, None]) -> AsyncGenerator[bytes, None]:
+    async for _, payload in _frames(chunks):
+        yield payload
+
+
+async def _split_lines(chunks: AsyncGenerator[bytes, None]) -> AsyncGenerator[bytes, None]:
+    """按行切分字节流，末尾不完整的行在流结束时输出"""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+class DockerAPIClient:
+    """基于 httpx 的异步 Docker Engine API 客户端，所有请求复用同一连接池"""
+
+    def __init__(
+        self,
+        socket_path: str,
+        api_version: str = "v1.41",
+        max_connections: int = 20,
+        timeout: float = 30.0,
+    ):
+        transport = httpx.AsyncHTTPTransport(
+            uds=socket_path,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        self._client = httpx.AsyncClient(
+            transport=transport,
+            base_url=f"http://docker/{api_version}",
+            timeout=httpx.Timeout(timeout),
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        resp = await self._client.request(method, url, **kwargs)
+        if resp.status_code >= 400:
+            raise DockerAPIError(resp.status_code, _error_message(resp))
+        return resp
+
+    async def ping(self) -> bool:
+        try:
+            resp = await self._client.get("/_ping")
+            return resp.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    async def info(self, timeout: Optional[float] = None) -> dict:
+        """守护进程信息（GET /info）"""
+        kwargs = {"timeout": timeout} if timeout is not None else {}
+        return (await self._request("GET", "/info", **kwargs)).json()
+
+    async def inspect_container(self, name: str) -> Optional[dict]:
+        """查看容器详情；容器不存在返回 None"""
+        try:
+            resp = await self._request("GET", f"/containers/{name}/json")
+        except DockerAPIError as e:
+            if e.status_code == 404:
+                return None
+            raise
+        return resp.json()
+
+    async def list_containers(self, name_prefix: str = "", all: bool = True) -> list[dict]:
+        params: dict = {"all": "true" if all else "false"}
+        if name_prefix:
+            params["filters"] = json.dumps({"name": [name_prefix]})
+        resp = await self._request("GET", "/containers/json", params=params)
+        return resp.json()
+
+    async def start_container(self, name: str) -> None:
+        """启动容器；已在运行（304）视为成功"""
+        await self._request("POST", f"/containers/{name}/start")
+
+    async def stop_container(self, name: str, timeout: int = 10) -> None:
+        """停止容器；已停止（304）视为成功"""
+        await self._request(
+            "POST",
+            f"/containers/{name}/stop",
+            params={"t": timeout},
+            timeout=httpx.Timeout(self._client.timeout.read + timeout),
+        )
+
+    async def restart_container(self, name: str, timeout: int = 10) -> None:
+        await self._request(
+            "POST",
+            f"/containers/{name}/restart",
+            params={"t": timeout},
+            timeout=httpx.Timeout(self._client.timeout.read + timeout),
+        )
+
+    async def pause_container(self, name: str) -> None:
+        await self._request("POST", f"/containers/{name}/pause")
+
+    async def unpause_container(self, name: str) -> None:
+        await self._request("POST", f"/containers/{name}/unpause")
+
+    async def remove_container(self, name: str, force: bool = False) -> None:
+        await self._request(
+            "DELETE", f"/containers/{name}", params={"force": "true" if force else "false"}
+        )
+
+    async def create_network(self, name: str, driver: str = "bridge") -> None:
+        """创建网络；同名网络已存在时 Docker 返回 409"""
+        await self._request(
+            "POST", "/networks/create",
+            json={"Name": name, "Driver": driver, "CheckDuplicate": True},
+        )
+
+    async def exec_run(self, name: str, cmd: list[str]) -> tuple[int, str, str]:
+        """在容器内执行命令，返回 (exit_code, stdout, stderr)"""
+        resp = await self._request(
+            "POST",
+            f"/containers/{name}/exec",
+            json={"AttachStdout": True, "AttachStderr": True, "Tty": False, "Cmd": cmd},
+        )
+        exec_id = resp.json()["Id"]
+
+        stdout, stderr = bytearray(), bytearray()
+        async with self._client.stream(
+            "POST",
+            f"/exec/{exec_id}/start",
+            json={"Detach": False, "Tty": False},
+            timeout=httpx.Timeout(self._client.timeout.connect, read=None),
+        ) as stream:
+            if stream.status_code >= 400:
+                await stream.aread()
+                raise DockerAPIError(stream.status_code, _error_message(stream))
+            async for kind, payload in _frames(stream.aiter_bytes()):
+                (stderr if kind == 2 else stdout).extend(payload)
+
+        info = (await self._request("GET", f"/exec/{exec_id}/json")).json()
+        return (
+            info.get("ExitCode") or 0,
+            stdout.decode("utf-8", errors="replace"),
+            stderr.decode("utf-8", errors="replace"),
+        )
+
+    async def stream_logs(
+        self,
+        name: str,
+        follow: bool = True,
+        tail: str = "all",
+        since: Optional[str] = None,
+        timestamps: bool = False,
+    ) -> AsyncGenerator[bytes, None]:
+        """按行输出容器日志（stdout + stderr 合并），follow 时持续跟随；
+        since 为 UNIX 时间戳（可带小数），timestamps 时每行以 RFC3339Nano 时间戳开头"""
+        info = await self.inspect_container(name)
+        if info is None:
+            raise DockerAPIError(404, f"No such container: {name}")
+        tty = bool((info.get("Config") or {}).get("Tty"))
+
+        params = {
+            "stdout": "true",
+            "stderr": "true",
+            "follow": "true" if follow else "false",
+            "tail": tail,
+            "timestamps": "true" if timestamps else "false",
+        }
+        if since is not None:
+            params["since"] = since
+        async with self._client.stream(
+            "GET",
+            f"/containers/{name}/logs",
+            params=params,
+            timeout=httpx.Timeout(self._client.timeout.connect, read=None),
+        ) as stream:
+            if stream.status_code >= 400:
+                await stream.aread()
+                raise DockerAPIError(stream.status_code, _error_message(stream))
+            chunks = stream.aiter_bytes() if tty else _demux(stream.aiter_bytes())
+            async for line in _split_lines(chunks):
+                yield line
+
+    async def events(
+        self, filters: Optional[dict] = None, since: Optional[int] = None
+    ) -> AsyncGenerator[dict, None]:
+        """订阅 Docker 事件流，逐条输出事件 JSON"""
+        params: dict = {}
+        if filters:
+            params["filters"] = json.dumps(filters)
+        if since is not None:
+            params["since"] = str(since)
+        async with self._client.stream(
+            "GET",
+            "/events",
+            params=params,
+            timeout=httpx.Timeout(self._client.timeout.connect, read=None),
+        ) as stream:
+            if stream.status_code >= 400:
+                await stream.aread()
+                raise DockerAPIError(stream.status_code, _error_message(stream))
+            async for line in stream.aiter_lines():
+                if line.strip():
+                    yield json.loads(line)
+
+    async def stats(self, name: str, stream: bool = True) -> AsyncGenerator[dict, None]:
+        """容器资源使用统计；stream 时守护进程约每秒推送一条，直到容器停止"""
+        async with self._client.stream(
+            "GET",
+            f"/containers/{name}/stats",
+            params={"stream": "true" if stream else "false"},
+            timeout=httpx.Timeout(self._client.timeout.connect, read=None),
+        ) as resp:
+            if resp.status_code >= 400:
+                await resp.aread()
+                raise DockerAPIError(resp.status_code, _error_message(resp))
+            async for line in resp.aiter_lines():
+                if line.strip():
+                    yield json.loads(line)
+
+
+_client: Optional[DockerAPIClient] = None
+
+
+def get_docker_client() -> Optional[DockerAPIClient]:
+    """获取共享的 API 客户端；未启用或 socket 不存在时返回 None，调用方回退到 docker CLI"""
+    global _client
+    if _client is not None:
+        return _client
+    if not settings.docker_use_api or not os.path.exists(settings.docker_socket):
+        return None
+    _client = DockerAPIClient(
+        settings.docker_socket,
+        api_version=settings.docker_api_version,
+        max_connections=settings.docker_api_max_connections,
+        timeout=settings.docker_api_timeout,
+    )
+    logger.info("使用 Docker Engine API: unix://%s", settings.docker_socket)
+    return _client
+
+
+async def close_docker_client() -> None:
+    """关闭共享客户端（应用退出时调用）"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
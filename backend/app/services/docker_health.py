@@ -0,0 +1,101 @@
+"""
+Docker 守护进程健康探测：后台定期 docker info 并缓存结果，状态接口直接读缓存
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from app.config import settings
+from app.services.docker_service import DockerService
+from app.services.event_bus import event_bus
+
+logger = logging.getLogger(__name__)
+
+
+def _summarize(info: dict) -> dict:
+    """从 docker info 中提取展示用字段"""
+    return {
+        "server_version": info.get("ServerVersion"),
+        "containers": info.get("Containers"),
+        "containers_running": info.get("ContainersRunning"),
+        "containers_paused": info.get("ContainersPaused"),
+        "containers_stopped": info.get("ContainersStopped"),
+        "images": info.get("Images"),
+        "storage_driver": info.get("Driver"),
+        "operating_system": info.get("OperatingSystem"),
+        "cpus": info.get("NCPU"),
+        "mem_total": info.get("MemTotal"),
+    }
+
+
+class DockerHealthProbe:
+    """缓存最近一次探测结果；守护进程不可用时探测间隔指数退避"""
+
+    def __init__(self):
+        self.running = False
+        self.details: dict = {}
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def snapshot(self) -> dict:
+        return {
+            "running": self.running,
+            "details": self.details,
+            "error": self.error,
+            "checked_at": self.checked_at,
+        }
+
+    async def status(self) -> dict:
+        """返回缓存状态；尚未探测过或缓存超过 TTL（后台探测未运行）时先探测一次"""
+        if self.checked_at is None or time.time() - self.checked_at > settings.docker_health_ttl:
+            await self.probe(max_age=settings.docker_health_ttl)
+        return self.snapshot()
+
+    async def probe(self, max_age: float = 0.0) -> bool:
+        """执行一次 docker info；并发调用只探测一次（等锁期间已有新结果则直接复用）"""
+        async with self._lock:
+            if self.checked_at is not None and time.time() - self.checked_at <= max_age:
+                return self.running
+            was_running = self.running
+            try:
+                info = await DockerService().info(timeout=settings.docker_health_timeout)
+            except Exception as e:
+                if self.running or self.error is None:
+                    logger.warning("Docker 守护进程不可用: %s", e)
+                self.running, self.error = False, str(e)
+            else:
+                if not self.running and self.error is not None:
+                    logger.info("Docker 守护进程已恢复")
+                self.running, self.error = True, None
+                self.details = _summarize(info)
+            changed = self.checked_at is None or was_running != self.running
+            self.checked_at = time.time()
+            if changed:
+                event_bus.publish("system.health", self.snapshot())
+            return self.running
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        delay = settings.docker_health_interval
+        while True:
+            if await self.probe():
+                delay = settings.docker_health_interval
+            else:
+                delay = min(delay * 2, settings.docker_health_max_backoff)
+            await asyncio.sleep(delay)
+
+
+# 进程内共享实例
+docker_health = DockerHealthProbe()
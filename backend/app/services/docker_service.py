@@ -3,87 +3,331 @@ Docker 操作服务
 """
 
 import asyncio
+import json
 import logging
 from pathlib import Path
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Callable, Optional
 
+import httpx
+
+from app.config import settings
 from app.database import PROJECT_ROOT
+from app.services.compose_renderer import (
+    SERVICE_HASH_LABEL,
+    SHARED_NETWORK,
+    compose_renderer,
+    project_compose_path,
+    project_name,
+)
+from app.services.docker_api import DockerAPIError, get_docker_client
+from app.services.metrics import timed_docker_operation
 
 logger = logging.getLogger(__name__)
 
+# 按实例布局下共享网络是否已确认存在
+_network_ready = False
+
 
 def _decode(b: bytes) -> str:
     return b.decode("utf-8", errors="replace").strip()
 
 
+def _container_name(instance_id: str) -> str:
+    return f"openclaw-{instance_id}"
+
+
+def _up_to_date(instance_id: str, info: Optional[dict]) -> bool:
+    """容器存在且其服务哈希标签与当前渲染的服务定义一致（可直接启动，无需 compose 重建）"""
+    if info is None:
+        return False
+    expected = compose_renderer.service_hash(instance_id)
+    labels = (info.get("Config") or {}).get("Labels") or {}
+    return expected is not None and labels.get(SERVICE_HASH_LABEL) == expected
+
+
+async def _run_cli(*cmd: str, cwd: str | None = None) -> tuple[int, str, str]:
+    """执行 docker CLI，返回 (returncode, stdout, stderr)"""
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=cwd,
+    )
+    stdout, stderr = await proc.communicate()
+    return proc.returncode, _decode(stdout), _decode(stderr)
+
+
 class DockerService:
-    """Docker 操作服务"""
+    """Docker 操作服务：优先走 Docker Engine API（unix socket），不可用时回退 docker CLI"""
+
+    def __init__(self):
+        self.api = get_docker_client()
 
     def _compose_file(self) -> Path:
         return PROJECT_ROOT / "docker-compose.yml"
 
-    async def start_instance(self, instance_id: str) -> None:
-        """启动实例容器"""
+    def _compose_targets(self, instance_ids: list[str]) -> list[tuple[list[str], Path, list[str]]]:
+        """返回 [(docker compose 基础命令, compose 文件, 服务列表)]。
+        单文件布局下所有服务合并为一次调用；按实例布局下每个实例是独立的 compose 项目。"""
+        if settings.compose_layout == "per_instance":
+            return [
+                (
+                    ["docker", "compose", "-p", project_name(i), "-f", str(project_compose_path(i))],
+                    project_compose_path(i),
+                    [i],
+                )
+                for i in instance_ids
+            ]
         compose_path = self._compose_file()
-        logger.info("start_instance: instance_id=%s, PROJECT_ROOT=%s, compose_path=%s", instance_id, PROJECT_ROOT, compose_path)
+        return [(["docker", "compose", "-f", str(compose_path)], compose_path, list(instance_ids))]
+
+    async def _ensure_network(self) -> None:
+        """按实例布局下各项目共享外部网络 openclaw-net，不存在时创建"""
+        global _network_ready
+        if _network_ready or settings.compose_layout != "per_instance":
+            return
+        if self.api is not None:
+            try:
+                await self.api.create_network(SHARED_NETWORK)
+                _network_ready = True
+                return
+            except DockerAPIError as e:
+                if e.status_code != 409:
+                    raise RuntimeError(f"创建网络 {SHARED_NETWORK} 失败: {e}") from e
+                _network_ready = True
+                return
+            except httpx.TransportError as e:
+                self._api_unavailable(e)
+        returncode, out, err = await _run_cli("docker", "network", "create", SHARED_NETWORK)
+        if returncode != 0 and "already exists" not in (err or out):
+            raise RuntimeError(f"创建网络 {SHARED_NETWORK} 失败: {err or out}")
+        _network_ready = True
+
+    def _api_unavailable(self, e: Exception) -> None:
+        logger.warning("Docker API 调用失败，回退 docker CLI: %s", e)
 
-        if not compose_path.exists():
-            logger.error("docker-compose.yml 不存在: %s", compose_path)
-            raise FileNotFoundError(
-                f"docker-compose.yml 不存在: {compose_path}，请先创建实例以生成该文件"
+    @timed_docker_operation()
+    async def info(self, timeout: float = 5.0) -> dict:
+        """守护进程信息（docker info）；守护进程不可用或超时时抛出 RuntimeError"""
+        if self.api is not None:
+            try:
+                return await self.api.info(timeout=timeout)
+            except DockerAPIError as e:
+                raise RuntimeError(f"docker info 失败: {e}") from e
+            except httpx.TransportError as e:
+                self._api_unavailable(e)
+
+        try:
+            returncode, out, err = await asyncio.wait_for(
+                _run_cli("docker", "info", "--format", "{{json .}}"), timeout
             )
+        except asyncio.TimeoutError:
+            raise RuntimeError("docker info 超时")
+        if returncode != 0:
+            raise RuntimeError(f"docker info 失败: {err or out}")
+        return json.loads(out)
 
-        cmd = ["docker", "compose", "-f", str(compose_path), "up", "-d", instance_id]
-        logger.info("执行命令: %s, cwd=%s", " ".join(cmd), PROJECT_ROOT)
+    @timed_docker_operation()
+    async def start_instance(self, instance_id: str) -> None:
+        """启动实例容器；容器已存在且服务定义未变时直接通过 API 启动，
+        否则 docker compose up -d 创建或按新的端口/模板重建"""
+        if self.api is not None:
+            try:
+                info = await self.api.inspect_container(_container_name(instance_id))
+                if _up_to_date(instance_id, info):
+                    await self.api.start_container(_container_name(instance_id))
+                    return
+            except DockerAPIError as e:
+                raise RuntimeError(f"启动失败: {e}") from e
+            except httpx.TransportError as e:
+                self._api_unavailable(e)
 
-        proc = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=str(PROJECT_ROOT),
-        )
-        stdout, stderr = await proc.communicate()
+        await self._compose_up([instance_id])
+
+    async def _compose_up(self, instance_ids: list[str]) -> None:
+        """docker compose up -d <id...>；单文件布局下多个服务合并为一次调用，按实例布局下各项目并行"""
+        targets = self._compose_targets(instance_ids)
+        logger.info("compose up: instance_ids=%s, PROJECT_ROOT=%s, layout=%s", instance_ids, PROJECT_ROOT, settings.compose_layout)
+
+        for _, compose_path, _ in targets:
+            if not compose_path.exists():
+                logger.error("compose 文件不存在: %s", compose_path)
+                raise FileNotFoundError(
+                    f"compose 文件不存在: {compose_path}，请先创建实例以生成该文件"
+                )
+        await self._ensure_network()
 
-        out, err = _decode(stdout), _decode(stderr)
-        logger.info("docker compose 返回: returncode=%s, stdout=%r, stderr=%r", proc.returncode, out, err)
+        async def _up(base: list[str], services: list[str]) -> None:
+            cmd = [*base, "up", "-d", *services]
+            logger.info("执行命令: %s, cwd=%s", " ".join(cmd), PROJECT_ROOT)
 
-        if proc.returncode != 0:
-            msg = err or out or "未知错误"
-            logger.error("启动失败: %s", msg)
-            hint = ""
-            if "size validation" in msg or "failed precondition" in msg:
-                hint = " 建议: 若为镜像拉取校验失败，请从源码构建镜像: git clone https://github.com/openclaw/openclaw.git && cd openclaw && docker build -t openclaw:local -f Dockerfile ."
-            raise RuntimeError(f"启动失败: {msg}{hint}")
+            returncode, out, err = await _run_cli(*cmd, cwd=str(PROJECT_ROOT))
+            logger.info("docker compose 返回: returncode=%s, stdout=%r, stderr=%r", returncode, out, err)
 
+            if returncode != 0:
+                msg = err or out or "未知错误"
+                logger.error("启动失败: %s", msg)
+                hint = ""
+                if "size validation" in msg or "failed precondition" in msg:
+                    hint = " 建议: 若为镜像拉取校验失败，请从源码构建镜像: git clone https://github.com/openclaw/openclaw.git && cd openclaw && docker build -t openclaw:local -f Dockerfile ."
+                raise RuntimeError(f"启动失败: {msg}{hint}")
+
+        await asyncio.gather(*(_up(base, services) for base, _, services in targets))
+
+    async def _compose_stop(self, instance_ids: list[str]) -> None:
+        """docker compose stop <id...>；compose 文件不存在时视为无容器可停"""
+        async def _stop(base: list[str], compose_path: Path, services: list[str]) -> None:
+            if not compose_path.exists():
+                return
+            returncode, out, err = await _run_cli(*base, "stop", *services, cwd=str(PROJECT_ROOT))
+            if returncode != 0:
+                raise RuntimeError(f"停止失败: {err or out or '未知错误'}")
+
+        await asyncio.gather(*(_stop(*t) for t in self._compose_targets(instance_ids)))
+
+    @timed_docker_operation()
     async def stop_instance(self, instance_id: str) -> None:
         """停止实例容器"""
-        compose_path = self._compose_file()
-        if not compose_path.exists():
+        if self.api is not None:
+            try:
+                await self.api.stop_container(_container_name(instance_id))
+                return
+            except DockerAPIError as e:
+                if e.status_code == 404:
+                    return
+                raise RuntimeError(f"停止失败: {e}") from e
+            except httpx.TransportError as e:
+                self._api_unavailable(e)
+
+        await self._compose_stop([instance_id])
+
+    @timed_docker_operation()
+    async def start_instances(self, instance_ids: list[str]) -> None:
+        """批量启动：已存在且服务定义未变的容器经 API 并发启动，其余合并为一次 docker compose up -d"""
+        missing = list(instance_ids)
+        if self.api is not None:
+            try:
+                infos = await asyncio.gather(
+                    *(self.api.inspect_container(_container_name(i)) for i in instance_ids)
+                )
+                existing = [i for i, info in zip(instance_ids, infos) if _up_to_date(i, info)]
+                missing = [i for i, info in zip(instance_ids, infos) if not _up_to_date(i, info)]
+                await asyncio.gather(
+                    *(self.api.start_container(_container_name(i)) for i in existing)
+                )
+            except DockerAPIError as e:
+                raise RuntimeError(f"启动失败: {e}") from e
+            except httpx.TransportError as e:
+                self._api_unavailable(e)
+                missing = list(instance_ids)
+        if missing:
+            await self._compose_up(missing)
+
+    @timed_docker_operation()
+    async def stop_instances(self, instance_ids: list[str]) -> None:
+        """批量停止：API 可用时并发停止，否则合并为一次 docker compose stop"""
+        if self.api is not None:
+            await asyncio.gather(*(self.stop_instance(i) for i in instance_ids))
             return
-        proc = await asyncio.create_subprocess_exec(
-            "docker",
-            "compose",
-            "-f",
-            str(compose_path),
-            "stop",
-            instance_id,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=str(PROJECT_ROOT),
-        )
-        stdout, stderr = await proc.communicate()
+        await self._compose_stop(instance_ids)
+
+    @timed_docker_operation()
+    async def restart_instances(self, instance_ids: list[str]) -> None:
+        """批量重启（先停止再启动）"""
+        await self.stop_instances(instance_ids)
+        await self.start_instances(instance_ids)
 
-        if proc.returncode != 0:
-            out, err = _decode(stdout), _decode(stderr)
-            raise RuntimeError(f"停止失败: {err or out or '未知错误'}")
+    @timed_docker_operation()
+    async def start_container(self, instance_id: str) -> None:
+        """启动已存在的容器（忽略错误，用于备份/恢复后拉起实例）"""
+        if self.api is not None:
+            try:
+                await self.api.start_container(_container_name(instance_id))
+                return
+            except DockerAPIError as e:
+                logger.warning("启动容器失败 %s: %s", instance_id, e)
+                return
+            except httpx.TransportError as e:
+                self._api_unavailable(e)
+        base, _, services = self._compose_targets([instance_id])[0]
+        await _run_cli(*base, "start", *services, cwd=str(PROJECT_ROOT))
 
-    async def init_instance(self, instance_id: str) -> str:
-        """初始化实例（运行 onboard，对齐官方：docker compose run --rm openclaw-cli onboard）"""
+    @timed_docker_operation()
+    async def stop_container(self, instance_id: str) -> None:
+        """停止容器（忽略错误，容器不存在时无操作）"""
+        if self.api is not None:
+            try:
+                await self.api.stop_container(_container_name(instance_id))
+                return
+            except DockerAPIError as e:
+                if e.status_code != 404:
+                    logger.warning("停止容器失败 %s: %s", instance_id, e)
+                return
+            except httpx.TransportError as e:
+                self._api_unavailable(e)
+        await _run_cli("docker", "stop", _container_name(instance_id))
+
+    @timed_docker_operation()
+    async def pause_container(self, instance_id: str) -> bool:
+        """冻结容器进程（用于热备份时保证数据一致），返回是否已暂停；未运行的容器不处理"""
+        if self.api is not None:
+            try:
+                await self.api.pause_container(_container_name(instance_id))
+                return True
+            except DockerAPIError as e:
+                if e.status_code not in (404, 409):
+                    raise RuntimeError(f"暂停容器失败: {e}") from e
+                return False
+            except httpx.TransportError as e:
+                self._api_unavailable(e)
+        returncode, _, _ = await _run_cli("docker", "pause", _container_name(instance_id))
+        return returncode == 0
+
+    @timed_docker_operation()
+    async def unpause_container(self, instance_id: str) -> None:
+        """恢复已暂停的容器"""
+        if self.api is not None:
+            try:
+                await self.api.unpause_container(_container_name(instance_id))
+                return
+            except DockerAPIError as e:
+                raise RuntimeError(f"恢复容器失败: {e}") from e
+            except httpx.TransportError as e:
+                self._api_unavailable(e)
+        returncode, out, err = await _run_cli("docker", "unpause", _container_name(instance_id))
+        if returncode != 0:
+            raise RuntimeError(f"恢复容器失败: {err or out}")
+
+    @timed_docker_operation()
+    async def remove_container(self, instance_id: str) -> None:
+        """删除容器（忽略错误，容器不存在时无操作）"""
+        if self.api is not None:
+            try:
+                await self.api.remove_container(_container_name(instance_id), force=True)
+                return
+            except DockerAPIError as e:
+                if e.status_code != 404:
+                    logger.warning("删除容器失败 %s: %s", instance_id, e)
+                return
+            except httpx.TransportError as e:
+                self._api_unavailable(e)
+        await _run_cli("docker", "rm", _container_name(instance_id))
+
+    @timed_docker_operation()
+    async def init_instance(
+        self,
+        instance_id: str,
+        progress: Optional[Callable[[float, Optional[str]], None]] = None,
+    ) -> str:
+        """初始化实例（运行 onboard，对齐官方：docker compose run --rm openclaw-cli onboard）；
+        progress 为后台任务的进度回调"""
         data_dir = PROJECT_ROOT / "instances" / instance_id / "data"
         if not data_dir.exists():
             raise FileNotFoundError(f"实例数据目录不存在: {data_dir}")
+        if progress is not None:
+            progress(0, "运行 onboard")
         # 与官方一致：挂载 .openclaw 目录，运行 node dist/index.js onboard
-        proc = await asyncio.create_subprocess_exec(
+        _, out, err = await _run_cli(
             "docker",
             "run",
             "--rm",
@@ -93,73 +337,109 @@ class DockerService:
             "node",
             "dist/index.js",
             "onboard",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
         )
-        stdout, stderr = await proc.communicate()
-        return _decode(stdout) + _decode(stderr)
+        return out + err
 
-    async def stream_logs(self, instance_id: str) -> AsyncGenerator[str, None]:
-        """实时流式日志"""
+    async def stream_logs(
+        self,
+        instance_id: str,
+        tail: str = "all",
+        since: Optional[str] = None,
+        timestamps: bool = False,
+    ) -> AsyncGenerator[str, None]:
+        """实时流式日志；tail 为起始输出的历史行数（all 为全部），since 为起始 UNIX 时间戳，
+        timestamps 时每行带 RFC3339Nano 时间戳前缀"""
+        if self.api is not None:
+            started = False
+            try:
+                async for line in self.api.stream_logs(
+                    _container_name(instance_id), tail=tail, since=since, timestamps=timestamps
+                ):
+                    started = True
+                    yield _decode(line)
+                return
+            except DockerAPIError as e:
+                raise RuntimeError(f"获取日志失败: {e}") from e
+            except httpx.TransportError as e:
+                if started:
+                    raise
+                self._api_unavailable(e)
+
+        options = ["--tail", tail]
+        if since is not None:
+            options += ["--since", since]
+        if timestamps:
+            options.append("--timestamps")
         proc = await asyncio.create_subprocess_exec(
-            "docker", "logs", "-f", f"openclaw-{instance_id}",
+            "docker", "logs", "-f", *options, f"openclaw-{instance_id}",
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.STDOUT
         )
 
-        if proc.stdout:
-            while True:
-                line = await proc.stdout.readline()
-                if not line:
-                    break
-                yield _decode(line)
+        try:
+            if proc.stdout:
+                while True:
+                    line = await proc.stdout.readline()
+                    if not line:
+                        break
+                    yield _decode(line)
+        finally:
+            # 订阅方提前退出（生成器被关闭或取消）时结束 docker logs 进程，避免泄漏
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
 
+    @timed_docker_operation()
     async def get_container_status(self, instance_id: str) -> str:
         """获取容器状态"""
-        proc = await asyncio.create_subprocess_exec(
+        if self.api is not None:
+            try:
+                info = await self.api.inspect_container(_container_name(instance_id))
+                if info is None:
+                    return "not_created"
+                return (info.get("State") or {}).get("Status") or "not_created"
+            except httpx.TransportError as e:
+                self._api_unavailable(e)
+
+        _, status, _ = await _run_cli(
             "docker", "ps", "-a", "--filter", f"name=openclaw-{instance_id}",
             "--format", "{{.State}}",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
         )
-        stdout, stderr = await proc.communicate()
-
-        status = _decode(stdout)
         return status if status else "not_created"
 
+    async def _exec(self, instance_id: str, cmd: list[str]) -> tuple[int, str, str]:
+        """在实例容器内执行命令，返回 (returncode, stdout, stderr)"""
+        if self.api is not None:
+            try:
+                code, out, err = await self.api.exec_run(_container_name(instance_id), cmd)
+                return code, out.strip(), err.strip()
+            except DockerAPIError as e:
+                return 1, "", str(e)
+            except httpx.TransportError as e:
+                self._api_unavailable(e)
+        return await _run_cli("docker", "exec", _container_name(instance_id), *cmd)
+
+    @timed_docker_operation()
     async def devices_list(self, instance_id: str, token: str) -> str:
         """在实例容器内执行 openclaw devices list --json，需传入 gateway token"""
         cmd = [
-            "docker", "exec", f"openclaw-{instance_id}",
             "node", "dist/index.js", "devices", "list", "--json",
             "--url", "ws://127.0.0.1:18789",
             "--token", token,
         ]
-        proc = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        stdout, stderr = await proc.communicate()
-        out, err = _decode(stdout), _decode(stderr)
-        if proc.returncode != 0:
+        returncode, out, err = await self._exec(instance_id, cmd)
+        if returncode != 0:
             raise RuntimeError(f"devices list 失败: {err or out or '未知错误'}")
         return out
 
+    @timed_docker_operation()
     async def devices_approve(self, instance_id: str, request_id: str, token: str) -> None:
         """在实例容器内执行 openclaw devices approve <requestId>"""
         cmd = [
-            "docker", "exec", f"openclaw-{instance_id}",
             "node", "dist/index.js", "devices", "approve", request_id,
             "--url", "ws://127.0.0.1:18789",
             "--token", token,
         ]
-        proc = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        stdout, stderr = await proc.communicate()
-        out, err = _decode(stdout), _decode(stderr)
-        if proc.returncode != 0:
+        returncode, out, err = await self._exec(instance_id, cmd)
+        if returncode != 0:
             raise RuntimeError(f"devices approve 失败: {err or out or '未知错误'}")
@@ -0,0 +1,134 @@
+"""
+进程内事件总线：服务发布实例状态、备份进度等事件，SSE 客户端订阅并可按 Last-Event-ID 续传
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Event:
+    id: int
+    type: str
+    data: dict
+    ts: float = field(default_factory=time.time)
+
+    def to_sse(self) -> str:
+        payload = json.dumps({**self.data, "ts": self.ts}, ensure_ascii=False, default=str)
+        return f"id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n"
+
+
+class EventSubscription:
+    """单个订阅者：有界队列；积压超过上限时断开，由客户端携带 Last-Event-ID 重连补齐"""
+
+    def __init__(self, maxsize: int, types: Optional[tuple[str, ...]] = None):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.types = types
+        # 订阅时需要补发的事件；None 表示 Last-Event-ID 已超出回放缓冲，客户端需全量刷新
+        self.backlog: Optional[list[Event]] = []
+        self._closed = False
+
+    def wants(self, event: Event) -> bool:
+        return self.types is None or event.type.startswith(self.types)
+
+    def offer(self, event: Event) -> None:
+        if self._closed or not self.wants(event):
+            return
+        if self.queue.full():
+            logger.info("事件订阅者消费过慢，断开连接等待重连")
+            self.close()
+            return
+        self.queue.put_nowait(event)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        # 清空积压，保证结束标记能入队
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self) -> Optional[Event]:
+        """取下一个事件；订阅结束返回 None"""
+        return await self.queue.get()
+
+
+class EventBus:
+    """事件编号单调递增，最近的事件保存在有界回放缓冲中"""
+
+    def __init__(self, replay_size: int, queue_size: int):
+        self.queue_size = queue_size
+        self._buffer: deque[Event] = deque(maxlen=replay_size)
+        self._next_id = 1
+        self._subscribers: set[EventSubscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+
+    def publish(self, type: str, data: dict) -> None:
+        """发布事件；可在工作线程中调用（转交事件循环线程处理）"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None or (self._loop is not None and loop is not self._loop):
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._dispatch, type, data)
+            return
+        self._dispatch(type, data)
+
+    def _dispatch(self, type: str, data: dict) -> None:
+        event = Event(self._next_id, type, data)
+        self._next_id += 1
+        self._buffer.append(event)
+        for sub in list(self._subscribers):
+            sub.offer(event)
+
+    def _backlog(self, last_event_id: Optional[int]) -> Optional[list[Event]]:
+        if last_event_id is None:
+            return []
+        oldest = self._buffer[0].id if self._buffer else self._next_id
+        # 编号超前（服务已重启）或已滚出缓冲：无法补齐
+        if last_event_id >= self._next_id or last_event_id < oldest - 1:
+            return None
+        return [e for e in self._buffer if e.id > last_event_id]
+
+    @asynccontextmanager
+    async def subscribe(
+        self,
+        last_event_id: Optional[int] = None,
+        types: Optional[tuple[str, ...]] = None,
+    ) -> AsyncIterator[EventSubscription]:
+        sub = EventSubscription(self.queue_size, types)
+        # 计算补发列表与登记订阅之间没有 await，不会漏掉或重复事件
+        backlog = self._backlog(last_event_id)
+        sub.backlog = None if backlog is None else [e for e in backlog if sub.wants(e)]
+        self._subscribers.add(sub)
+        try:
+            yield sub
+        finally:
+            self._subscribers.discard(sub)
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def close(self) -> None:
+        """关闭全部订阅，使 SSE 响应结束"""
+        for sub in list(self._subscribers):
+            sub.close()
+
+
+# 进程内共享实例
+event_bus = EventBus(settings.event_replay_size, settings.event_queue_size)
@@ -0,0 +1,246 @@
+"""
+OpenClaw 网关 RPC 客户端：直连实例发布的网关端口（WebSocket + JSON 帧），每实例复用一条连接
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import time
+import uuid
+from typing import Any, Optional
+
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import WebSocketException
+
+from app.config import settings
+from app.services.docker_service import DockerService
+
+logger = logging.getLogger(__name__)
+
+# 与 openclaw CLI 一致的客户端标识与权限范围
+CLIENT_INFO = {
+    "id": "cli",
+    "displayName": "ClawMultiDeploy",
+    "version": "1.0.0",
+    "platform": sys.platform,
+    "mode": "cli",
+}
+SCOPES = ["operator.admin", "operator.pairing"]
+
+METHOD_DEVICES_LIST = "device.pair.list"
+METHOD_DEVICES_APPROVE = "device.pair.approve"
+
+
+class GatewayError(RuntimeError):
+    """网关返回的请求错误"""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class GatewayUnavailable(RuntimeError):
+    """请求帧发出前无法建立或保持网关连接（端口不通、握手被拒绝、连接已断开）；可安全重试或回退"""
+
+
+class GatewayRequestLost(RuntimeError):
+    """请求帧已发出但未收到响应（超时或连接中断）；网关可能已执行，不能重试"""
+
+
+class GatewayConnection:
+    """单个实例的网关连接：首帧 connect 握手，之后按请求 ID 匹配响应；断开后下次请求时重连"""
+
+    def __init__(self, instance_id: str, url: str, token: str):
+        self.instance_id = instance_id
+        self.url = url
+        self.token = token
+        self.last_used = time.monotonic()
+        self._ws: Optional[ClientConnection] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._pending: dict[str, asyncio.Future] = {}
+        self._connect_lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None and self._reader is not None and not self._reader.done()
+
+    async def request(self, method: str, params: Optional[dict] = None) -> Any:
+        """发送请求并等待响应 payload；连接已断开时先重连"""
+        self.last_used = time.monotonic()
+        await self._ensure_connected()
+        try:
+            return await self._call(method, params or {})
+        except GatewayUnavailable:
+            # 复用的连接可能已被对端关闭（帧未发出）：重连后重试一次
+            await self.close()
+            await self._ensure_connected()
+            return await self._call(method, params or {})
+
+    async def _ensure_connected(self) -> None:
+        if self.connected:
+            return
+        async with self._connect_lock:
+            if self.connected:
+                return
+            try:
+                self._ws = await connect(
+                    self.url, open_timeout=settings.gateway_timeout, max_size=None
+                )
+            except (OSError, asyncio.TimeoutError, WebSocketException) as e:
+                raise GatewayUnavailable(f"连接网关失败 {self.url}: {e}") from e
+            self._reader = asyncio.create_task(self._read_loop(self._ws))
+            try:
+                await self._call("connect", {
+                    "minProtocol": settings.gateway_protocol_version,
+                    "maxProtocol": settings.gateway_protocol_version,
+                    "client": CLIENT_INFO,
+                    "role": "operator",
+                    "scopes": SCOPES,
+                    "auth": {"token": self.token},
+                })
+            except GatewayError as e:
+                await self.close()
+                raise GatewayUnavailable(f"网关拒绝连接: {e}") from e
+            except (GatewayUnavailable, GatewayRequestLost) as e:
+                # 握手未完成，业务请求尚未发出
+                await self.close()
+                raise GatewayUnavailable(f"网关握手失败: {e}") from e
+            logger.info("已连接实例 %s 的网关 %s", self.instance_id, self.url)
+
+    async def _call(self, method: str, params: dict) -> Any:
+        ws = self._ws
+        if ws is None:
+            raise GatewayUnavailable("网关连接已关闭")
+        request_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            try:
+                await ws.send(json.dumps({"type": "req", "id": request_id, "method": method, "params": params}))
+            except WebSocketException as e:
+                raise GatewayUnavailable(f"网关连接已断开: {e}") from e
+            try:
+                return await asyncio.wait_for(future, settings.gateway_timeout)
+            except asyncio.TimeoutError as e:
+                raise GatewayRequestLost(f"网关请求 {method} 超时") from e
+        finally:
+            self._pending.pop(request_id, None)
+            if future.done() and not future.cancelled():
+                # 发送失败时读循环可能已给 future 设置了异常
+                future.exception()
+
+    async def _read_loop(self, ws: ClientConnection) -> None:
+        try:
+            async for raw in ws:
+                try:
+                    frame = json.loads(raw)
+                except ValueError:
+                    continue
+                if frame.get("type") == "res":
+                    future = self._pending.get(frame.get("id"))
+                    if future is None or future.done():
+                        continue
+                    if frame.get("ok"):
+                        future.set_result(frame.get("payload"))
+                    else:
+                        error = frame.get("error") or {}
+                        future.set_exception(
+                            GatewayError(error.get("code", "ERROR"), error.get("message", "网关请求失败"))
+                        )
+                elif frame.get("type") == "event":
+                    gateway_pool.on_event(self.instance_id, frame.get("event") or "")
+        except WebSocketException:
+            pass
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(GatewayRequestLost("网关连接在响应前断开"))
+
+    async def close(self) -> None:
+        ws, reader = self._ws, self._reader
+        self._ws = self._reader = None
+        if ws is not None:
+            await ws.close()
+        if reader is not None and reader is not asyncio.current_task():
+            reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+
+
+class GatewayPool:
+    """按实例复用网关连接，并短暂缓存设备列表；连不上网关或网关不支持该方法时回退到容器内执行 openclaw CLI"""
+
+    def __init__(self):
+        self._connections: dict[str, GatewayConnection] = {}
+        self._devices: dict[str, tuple[float, dict]] = {}
+
+    async def _connection(self, instance_id: str, port: int, token: str) -> GatewayConnection:
+        await self._reap_idle()
+        url = f"ws://{settings.gateway_host}:{port}"
+        conn = self._connections.get(instance_id)
+        if conn is not None and (conn.url != url or conn.token != token):
+            # 端口或令牌已变化
+            await conn.close()
+            conn = None
+        if conn is None:
+            conn = self._connections[instance_id] = GatewayConnection(instance_id, url, token)
+        return conn
+
+    async def _reap_idle(self) -> None:
+        deadline = time.monotonic() - settings.gateway_idle_timeout
+        for instance_id, conn in list(self._connections.items()):
+            if conn.last_used < deadline:
+                del self._connections[instance_id]
+                await conn.close()
+
+    def on_event(self, instance_id: str, event: str) -> None:
+        """网关推送的配对请求/结果事件使设备列表缓存失效"""
+        if event.startswith("device.pair"):
+            self._devices.pop(instance_id, None)
+
+    async def devices_list(self, instance_id: str, port: int, token: str) -> dict:
+        """设备配对列表（待批准 + 已配对）"""
+        cached = self._devices.get(instance_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        try:
+            conn = await self._connection(instance_id, port, token)
+            data = await conn.request(METHOD_DEVICES_LIST) or {}
+        except (GatewayUnavailable, GatewayError) as e:
+            logger.info("实例 %s 网关不可直连，改用容器内 CLI: %s", instance_id, e)
+            raw = await DockerService().devices_list(instance_id, token)
+            data = json.loads(raw) if raw.strip() else {}
+        except GatewayRequestLost as e:
+            raise RuntimeError(f"devices list 失败: {e}") from e
+        self._devices[instance_id] = (time.monotonic() + settings.gateway_devices_ttl, data)
+        return data
+
+    async def devices_approve(self, instance_id: str, port: int, token: str, request_id: str) -> None:
+        """批准待配对设备"""
+        self._devices.pop(instance_id, None)
+        try:
+            conn = await self._connection(instance_id, port, token)
+            await conn.request(METHOD_DEVICES_APPROVE, {"requestId": request_id})
+        except (GatewayUnavailable, GatewayError) as e:
+            logger.info("实例 %s 网关不可直连，改用容器内 CLI: %s", instance_id, e)
+            await DockerService().devices_approve(instance_id, request_id, token)
+        except GatewayRequestLost as e:
+            # 批准可能已生效，不再经 CLI 重复发送
+            raise RuntimeError(f"devices approve 失败: {e}") from e
+        finally:
+            self._devices.pop(instance_id, None)
+
+    async def close_instance(self, instance_id: str) -> None:
+        """实例停止或删除时关闭其连接"""
+        self._devices.pop(instance_id, None)
+        conn = self._connections.pop(instance_id, None)
+        if conn is not None:
+            await conn.close()
+
+    async def close(self) -> None:
+        for instance_id in list(self._connections):
+            await self.close_instance(instance_id)
+
+
+# 进程内共享实例，由 main.lifespan 关闭
+gateway_pool = GatewayPool()
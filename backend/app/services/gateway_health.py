@@ -0,0 +1,178 @@
+"""
+实例网关健康探测：HTTP 请求（默认）或 TCP 连接实例发布的网关端口。
+后台定期并发探测所有运行中实例并缓存最近结果，启动实例时可等待网关就绪
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import httpx
+
+from app.config import settings
+from app.database import SessionLocal, run_db
+from app.models import Instance
+from app.services.event_bus import event_bus
+from app.services.metrics import GaugeFamily, registry
+from app.services.scheduler import run_bounded
+from app.services.state_cache import state_cache
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayHealthMonitor:
+    """每实例保留最近一次探测结果（up / latency_ms / error / checked_at）。
+    连通状态变化时推送 instance.health 事件并使实例列表 ETag 失效；仅延迟变化不会。"""
+
+    # 等待就绪时的重试间隔（秒）
+    POLL_INTERVAL = 0.5
+
+    def __init__(self):
+        self._results: dict[str, dict] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, instance_id: str) -> Optional[dict]:
+        return self._results.get(instance_id)
+
+    def snapshot(self) -> dict[str, dict]:
+        return dict(self._results)
+
+    def discard(self, instance_id: str) -> None:
+        """实例停止或删除后不再展示旧的探测结果"""
+        if self._results.pop(instance_id, None) is not None:
+            state_cache.touch()
+
+    async def start(self) -> None:
+        if settings.gateway_probe_interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def check(self, instance_id: str, port: int) -> dict:
+        """探测一次并记录结果"""
+        started = time.monotonic()
+        try:
+            await self._probe(port)
+        except (OSError, asyncio.TimeoutError, httpx.HTTPError, RuntimeError) as e:
+            return self._record(instance_id, None, str(e) or type(e).__name__)
+        return self._record(instance_id, time.monotonic() - started, None)
+
+    async def wait_ready(self, instance_id: str, port: int, timeout: float) -> dict:
+        """重复探测直到网关可用；容器在等待期间退出时立即失败，超过 timeout 抛出 TimeoutError"""
+        deadline = time.monotonic() + timeout
+        while True:
+            result = await self.check(instance_id, port)
+            if result["up"]:
+                return result
+            status = state_cache.get(instance_id)
+            if status != "running":
+                raise RuntimeError(f"网关未就绪，容器已退出（{status}）: {result['error']}")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"网关在 {timeout:g}s 内未就绪: {result['error']}")
+            await asyncio.sleep(min(self.POLL_INTERVAL, remaining))
+
+    async def probe_all(self) -> None:
+        """并发探测所有运行中实例，同时进行的探测（连接）数不超过 gateway_probe_concurrency"""
+        running = {i for i, s in state_cache.snapshot().items() if s == "running"}
+        for instance_id in set(self._results) - running:
+            self.discard(instance_id)
+        if not running:
+            return
+        ports = await run_db(_instance_ports, running)
+        for (instance_id, _), outcome in await run_bounded(
+            ports.items(), lambda item: self.check(*item), settings.gateway_probe_concurrency
+        ):
+            if isinstance(outcome, BaseException):
+                logger.warning("探测实例 %s 网关失败: %s", instance_id, outcome)
+
+    # ---- 内部实现 ----
+
+    async def _probe(self, port: int) -> None:
+        timeout = settings.gateway_probe_timeout
+        if settings.gateway_probe_mode == "http":
+            resp = await self._http().get(
+                f"http://{settings.gateway_host}:{port}{settings.gateway_probe_path}"
+            )
+            if resp.status_code >= 500:
+                raise RuntimeError(f"HTTP {resp.status_code}")
+            return
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(settings.gateway_host, port), timeout
+        )
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+    def _http(self) -> httpx.AsyncClient:
+        """HTTP 探测共用的连接池，连接数与后台探测并发上限一致"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.gateway_probe_timeout),
+                limits=httpx.Limits(max_connections=max(1, settings.gateway_probe_concurrency)),
+                follow_redirects=False,
+            )
+        return self._client
+
+    def _record(self, instance_id: str, latency: Optional[float], error: Optional[str]) -> dict:
+        result = {
+            "up": error is None,
+            "latency_ms": round(latency * 1000, 1) if latency is not None else None,
+            "error": error,
+            "checked_at": time.time(),
+        }
+        previous = self._results.get(instance_id)
+        self._results[instance_id] = result
+        if previous is None or previous["up"] != result["up"]:
+            if previous is not None:
+                logger.info(
+                    "实例 %s 网关%s", instance_id, "已恢复" if result["up"] else f"不可用: {error}"
+                )
+            state_cache.touch()
+            event_bus.publish("instance.health", {"id": instance_id, **result})
+        return result
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logger.warning("网关健康探测失败: %s", e)
+            await asyncio.sleep(settings.gateway_probe_interval)
+
+
+def _instance_ports(ids: set[str]) -> dict[str, int]:
+    db = SessionLocal()
+    try:
+        rows = db.query(Instance.id, Instance.port).filter(Instance.id.in_(ids)).all()
+        return {instance_id: port for instance_id, port in rows}
+    finally:
+        db.close()
+
+
+# 进程内共享实例，由 main.lifespan 启停
+gateway_health = GatewayHealthMonitor()
+
+_UP = GaugeFamily("claw_gateway_up", "最近一次网关探测是否成功", ("instance",))
+_LATENCY = GaugeFamily("claw_gateway_probe_latency_seconds", "最近一次成功探测的耗时", ("instance",))
+
+
+def _collect() -> list[str]:
+    results = sorted(gateway_health.snapshot().items())
+    return _UP.render([((i,), 1 if r["up"] else 0) for i, r in results]) + _LATENCY.render(
+        [((i,), r["latency_ms"] / 1000) for i, r in results if r["up"]]
+    )
+
+
+registry.add_collector(_collect)
@@ -0,0 +1,80 @@
+"""
+实例目录布局与默认配置
+"""
+
+import json
+from pathlib import Path
+from typing import Optional
+
+from app.services.fileutil import atomic_write_text
+
+
+def default_config(port: int) -> dict:
+    """新实例的默认 openclaw.json；gateway.auth 的 token 与 password 由创建时写入"""
+    # 使用 gateway.auth.token（官方已弃用 gateway.token），默认模型为 bailian，不包含 feishu 等渠道
+    return {
+        "meta": {
+            "lastTouchedVersion": "2026.2.25",
+        },
+        "wizard": {
+            "lastRunCommand": "onboard",
+            "lastRunMode": "local",
+        },
+        "models": {
+            "mode": "merge",
+            "providers": {
+                "bailian": {
+                    "baseUrl": "https://coding.dashscope.aliyuncs.com/v1",
+                    "apiKey": "",
+                    "api": "openai-completions",
+                    "models": [
+                        {"id": "qwen3.5-plus", "name": "qwen3.5-plus", "api": "openai-completions", "reasoning": False, "input": ["text", "image"], "contextWindow": 1000000, "maxTokens": 65536},
+                        {"id": "glm-5", "name": "glm-5", "api": "openai-completions", "reasoning": False, "input": ["text"], "contextWindow": 202752, "maxTokens": 16384},
+                        {"id": "glm-4.7", "name": "glm-4.7", "api": "openai-completions", "reasoning": False, "input": ["text"], "contextWindow": 202752, "maxTokens": 16384},
+                    ],
+                }
+            },
+        },
+        "agents": {
+            "defaults": {
+                "model": {"primary": "bailian/glm-5"},
+                "models": {
+                    "bailian/qwen3.5-plus": {},
+                    "bailian/glm-5": {},
+                    "bailian/glm-4.7": {},
+                },
+                "workspace": "/home/node/.openclaw/workspace",
+                "compaction": {"mode": "safeguard"},
+                "maxConcurrent": 4,
+            }
+        },
+        "gateway": {
+            "port": 18789,
+            "mode": "local",
+            "bind": "lan",
+            "controlUi": {
+                "allowedOrigins": [
+                    f"http://127.0.0.1:{port}",
+                    f"http://localhost:{port}",
+                ],
+            },
+            "auth": {"mode": "token"},
+        },
+        "channels": {},
+        "session": {"dmScope": "per-channel-peer"},
+        "commands": {"native": "auto", "nativeSkills": "auto", "restart": True},
+    }
+
+
+def write_instance_files(base_path: Path, port: int, auth: Optional[dict] = None) -> None:
+    """创建实例目录并写入默认配置（同步阻塞）"""
+    # 目录结构对齐官方：data → /home/node/.openclaw，workspace 在其下
+    (base_path / "data" / "workspace").mkdir(parents=True, exist_ok=True)
+    config = default_config(port)
+    if auth:
+        config["gateway"]["auth"].update(auth)
+    # 默认配置写入 data/openclaw.json（容器内即 /home/node/.openclaw/openclaw.json）
+    atomic_write_text(
+        base_path / "data" / "openclaw.json",
+        json.dumps(config, indent=2, ensure_ascii=False),
+    )
@@ -0,0 +1,76 @@
+"""
+实例操作并发控制：每实例一把异步锁、compose/端口等全局状态一把锁，以及相同进行中请求的合并
+"""
+
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Hashable, Iterable, TypeVar
+
+T = TypeVar("T")
+
+
+class KeyedLocks:
+    """按键的异步锁：同一键上的操作串行，不同键完全并行；无人持有或等待的锁随即回收"""
+
+    def __init__(self):
+        # key -> (锁, 持有与等待者数量)
+        self._locks: dict[Hashable, tuple[asyncio.Lock, int]] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        lock, users = self._locks.get(key) or (asyncio.Lock(), 0)
+        self._locks[key] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[key]
+            if users <= 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+    @asynccontextmanager
+    async def hold_many(self, keys: Iterable[Hashable]) -> AsyncIterator[None]:
+        """同时持有多把锁；按固定顺序获取，与其他批量操作之间不会死锁"""
+        async with AsyncExitStack() as stack:
+            for key in sorted(set(keys), key=str):
+                await stack.enter_async_context(self.hold(key))
+            yield
+
+    def locked(self, key: Hashable) -> bool:
+        entry = self._locks.get(key)
+        return entry is not None and entry[0].locked()
+
+
+class Coalescer:
+    """合并相同的进行中操作：同一键的并发请求共享一次执行及其结果（或异常）"""
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._discard(key, t))
+        # 单个请求断开不取消共享的操作
+        return await asyncio.shield(task)
+
+    def _discard(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # 所有等待者都已断开时，避免 "exception was never retrieved" 警告
+            task.exception()
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+
+# 进程内共享实例
+instance_locks = KeyedLocks()
+# 保护 compose 文件与端口分配等跨实例状态
+fleet_lock = asyncio.Lock()
+coalescer = Coalescer()
@@ -3,144 +3,132 @@
 """
 
 import asyncio
-import json
 import secrets
-from pathlib import Path
-from typing import Optional
+from typing import Awaitable, Callable, Optional, TypeVar
 
 from sqlalchemy.orm import Session
 
-from app.database import PROJECT_ROOT
+from app.config import settings
+from app.database import PROJECT_ROOT, SessionLocal, run_db
 from app.models import Instance
+from app.services.compose_renderer import compose_renderer
+from app.services.config_cache import config_cache, instance_config_path
+from app.services.docker_service import DockerService
+from app.services.event_bus import event_bus
+from app.services.gateway_client import gateway_pool
+from app.services.gateway_health import gateway_health
+from app.services.instance_layout import write_instance_files
+from app.services.instance_locks import coalescer, fleet_lock, instance_locks
+from app.services.log_archive import log_archiver
+from app.services.port_allocator import port_allocator
+from app.services.state_cache import state_cache
+from app.services.warm_pool import warm_pool
+
+T = TypeVar("T")
 
 
 class InstanceService:
     """实例管理服务"""
 
-    # 与官方 Gateway 端口一致：18789 / 18790，每实例占 2 个连续端口
-    BASE_PORT = 18789
-
     def __init__(self, db: Session):
         self.db = db
 
-    def _get_next_port(self) -> int:
-        """获取下一个可用网关端口（宿主机）；每实例占用 port 与 port+1"""
-        used = set()
-        for i in self.db.query(Instance.port).all():
-            used.add(i.port)
-            used.add(i.port + 1)
-        port = self.BASE_PORT
-        while port in used or (port + 1) in used:
-            port += 2
-        return port
-
     async def create_instance(self, instance_id: str, name: str, password: str) -> tuple[Instance, str]:
         """创建新实例；password 与生成的 token 写入 gateway.auth（控制台需 token 做 API 鉴权）。返回 (instance, gateway_token)。"""
-        # 分配端口
-        port = self._get_next_port()
-        gateway_token = secrets.token_urlsafe(24)
+        async with instance_locks.hold(instance_id):
+            if await run_db(self.db.get, Instance, instance_id):
+                raise ValueError(f"实例 ID '{instance_id}' 已存在")
+            instance, gateway_token = await self._create_instance(instance_id, name, password)
+        # 实例入库后再生成 docker-compose.yml，并发创建时各自都能看到对方
+        await self._regenerate_compose([instance_id])
+        return instance, gateway_token
 
-        # 目录结构对齐官方：data → /home/node/.openclaw，workspace 在其下
+    async def _create_instance(self, instance_id: str, name: str, password: str) -> tuple[Instance, str]:
+        gateway_token = secrets.token_urlsafe(24)
+        auth = {"token": gateway_token, "password": password}
         base_path = PROJECT_ROOT / "instances" / instance_id
-        (base_path / "data").mkdir(parents=True, exist_ok=True)
-        (base_path / "data" / "workspace").mkdir(parents=True, exist_ok=True)
-
-        # 默认配置写入 data/openclaw.json（容器内即 /home/node/.openclaw/openclaw.json）
-        # 使用 gateway.auth.token（官方已弃用 gateway.token），默认模型为 bailian，不包含 feishu 等渠道
-        config_path = base_path / "data" / "openclaw.json"
-        default_config = {
-            "meta": {
-                "lastTouchedVersion": "2026.2.25",
-                "lastTouchedAt": None,
-            },
-            "wizard": {
-                "lastRunCommand": "onboard",
-                "lastRunMode": "local",
-            },
-            "models": {
-                "mode": "merge",
-                "providers": {
-                    "bailian": {
-                        "baseUrl": "https://coding.dashscope.aliyuncs.com/v1",
-                        "apiKey": "",
-                        "api": "openai-completions",
-                        "models": [
-                            {"id": "qwen3.5-plus", "name": "qwen3.5-plus", "api": "openai-completions", "reasoning": False, "input": ["text", "image"], "contextWindow": 1000000, "maxTokens": 65536},
-                            {"id": "glm-5", "name": "glm-5", "api": "openai-completions", "reasoning": False, "input": ["text"], "contextWindow": 202752, "maxTokens": 16384},
-                            {"id": "glm-4.7", "name": "glm-4.7", "api": "openai-completions", "reasoning": False, "input": ["text"], "contextWindow": 202752, "maxTokens": 16384},
-                        ],
-                    }
-                },
-            },
-            "agents": {
-                "defaults": {
-                    "model": {"primary": "bailian/glm-5"},
-                    "models": {
-                        "bailian/qwen3.5-plus": {},
-                        "bailian/glm-5": {},
-                        "bailian/glm-4.7": {},
-                    },
-                    "workspace": "/home/node/.openclaw/workspace",
-                    "compaction": {"mode": "safeguard"},
-                    "maxConcurrent": 4,
-                }
-            },
-            "gateway": {
-                "port": 18789,
-                "mode": "local",
-                "bind": "lan",
-                "controlUi": {
-                    "allowedOrigins": [
-                        f"http://127.0.0.1:{port}",
-                        f"http://localhost:{port}",
-                    ],
-                },
-                "auth": {
-                    "mode": "token",
-                    "token": gateway_token,
-                    "password": password,
-                },
-            },
-            "channels": {},
-            "session": {"dmScope": "per-channel-peer"},
-            "commands": {"native": "auto", "nativeSkills": "auto", "restart": True},
-        }
-        # 不写入 meta.lastTouchedAt 的 null，让 JSON 更干净
-        def _drop_none(obj):
-            if isinstance(obj, dict):
-                return {k: _drop_none(v) for k, v in obj.items() if v is not None}
-            if isinstance(obj, list):
-                return [_drop_none(x) for x in obj]
-            return obj
-        config_path.write_text(
-            json.dumps(_drop_none(default_config), indent=2, ensure_ascii=False),
-            encoding="utf-8",
-        )
-
-        # 生成 docker-compose.yml
-        await self._regenerate_compose()
 
-        # 保存到数据库
-        instance = Instance(
-            id=instance_id,
-            name=name,
-            port=port,
-            status="created"
+        # 优先认领预热槽位：目录与端口已就绪，只需写入用户相关的 gateway.auth
+        slot_port = await warm_pool.claim(base_path)
+        # 分配端口：在内存位图中立即占用，并发创建不会拿到同一端口；宿主机端口探测在线程池中进行
+        reserved = slot_port if slot_port is not None else await asyncio.to_thread(port_allocator.reserve)
+        # 块内失败时释放端口
+        with port_allocator.reservation(reserved) as port:
+            config_path = base_path / "data" / "openclaw.json"
+            if slot_port is not None and config_path.exists():
+                await asyncio.to_thread(config_cache.patch, config_path, {"gateway": {"auth": auth}})
+            else:
+                await asyncio.to_thread(write_instance_files, base_path, port, auth)
+            config_cache.invalidate_instance(instance_id)
+
+            # 保存到数据库
+            instance = Instance(
+                id=instance_id,
+                name=name,
+                port=port,
+                status="created"
+            )
+            self.db.add(instance)
+            await run_db(self.db.commit)
+            state_cache.set(instance_id, instance.status)
+            event_bus.publish("instance.created", instance.to_dict())
+
+            return instance, gateway_token
+
+    async def start_instance(
+        self, instance_id: str, wait_ready: bool = False, timeout: Optional[float] = None
+    ) -> Optional[dict]:
+        """启动实例；失败时标记为 error（调用方持有实例锁）。
+        wait_ready 时等待网关端口探测成功并返回探测结果，超时抛出 TimeoutError（状态仍为 running）"""
+        # 启动前确保 docker-compose.yml 与当前实例列表一致
+        await self._regenerate_compose([instance_id])
+        try:
+            await DockerService().start_instance(instance_id)
+        except Exception:
+            await self._save_status(instance_id, "error")
+            raise
+        await self._save_status(instance_id, "running")
+        if not wait_ready:
+            return None
+        instance = await run_db(self.db.get, Instance, instance_id)
+        return await gateway_health.wait_ready(
+            instance_id, instance.port, timeout or settings.gateway_ready_timeout
         )
-        self.db.add(instance)
-        self.db.commit()
-        self.db.refresh(instance)
 
-        return instance, gateway_token
+    async def stop_instance(self, instance_id: str) -> None:
+        """停止实例；失败时保持原状态（调用方持有实例锁）"""
+        await DockerService().stop_instance(instance_id)
+        await gateway_pool.close_instance(instance_id)
+        gateway_health.discard(instance_id)
+        await self._save_status(instance_id, "stopped")
+
+    async def regenerate_gateway_token(self, instance_id: str) -> str:
+        """重新生成控制台令牌写入 gateway.auth.token，返回新令牌（调用方持有实例锁）"""
+        config_path, _ = instance_config_path(instance_id)
+        if not config_path.exists():
+            raise FileNotFoundError("实例配置文件不存在")
+        token = secrets.token_urlsafe(24)
+        await asyncio.to_thread(config_cache.patch, config_path, {"gateway": {"auth": {"token": token}}})
+        return token
+
+    async def _save_status(self, instance_id: str, status: str) -> None:
+        instance = await run_db(self.db.get, Instance, instance_id)
+        if instance is not None:
+            instance.status = status
+            await run_db(self.db.commit)
+        state_cache.set(instance_id, status)
 
     async def delete_instance(self, instance_id: str, keep_data: bool = False) -> None:
-        """删除实例：若正在运行则先停止并删除容器，再删除实例数据"""
-        instance = self.db.query(Instance).filter(Instance.id == instance_id).first()
+        """删除实例：若正在运行则先停止并删除容器，再删除实例数据（调用方持有实例锁）"""
+        instance = await run_db(self.db.get, Instance, instance_id)
         if not instance:
             raise ValueError(f"实例 {instance_id} 不存在")
 
         # 若实例正在运行或容器仍存在，先停止并删除容器再删实例
         await self._stop_container(instance_id)
+        await gateway_pool.close_instance(instance_id)
+        gateway_health.discard(instance_id)
+        await log_archiver.stop_instance(instance_id)
 
         # 删除目录（如果不保留数据）
         if not keep_data:
@@ -148,86 +136,62 @@ class InstanceService:
             if base_path.exists():
                 import shutil
                 shutil.rmtree(base_path)
+            config_cache.invalidate_instance(instance_id)
 
-        # 重新生成 docker-compose.yml
-        await self._regenerate_compose()
+        # 按实例布局只需移除该实例的 compose 项目，其余实例不受影响；否则重新生成 docker-compose.yml
+        if settings.compose_layout == "per_instance":
+            compose_renderer.remove_project(instance_id)
+        else:
+            await self._regenerate_compose()
 
         # 从数据库删除
         self.db.delete(instance)
-        self.db.commit()
+        await run_db(self.db.commit)
+        port_allocator.release(instance.port)
+        state_cache.discard(instance_id)
+        event_bus.publish("instance.deleted", {"id": instance_id})
 
     async def _stop_container(self, instance_id: str) -> None:
-        """停止容器"""
-        proc = await asyncio.create_subprocess_exec(
-            "docker", "stop", f"openclaw-{instance_id}",
-            stdout=asyncio.subprocess.DEVNULL,
-            stderr=asyncio.subprocess.DEVNULL
-        )
-        await proc.wait()
-
-        # 删除容器
-        proc = await asyncio.create_subprocess_exec(
-            "docker", "rm", f"openclaw-{instance_id}",
-            stdout=asyncio.subprocess.DEVNULL,
-            stderr=asyncio.subprocess.DEVNULL
-        )
-        await proc.wait()
-
-    async def _regenerate_compose(self) -> None:
-        """重新生成 docker-compose.yml"""
-        instances = self.db.query(Instance).all()
-
-        # 读取模板
-        template_path = PROJECT_ROOT / "docker-compose.template.yml"
-        if template_path.exists():
-            template = template_path.read_text(encoding="utf-8")
-        else:
-            # 默认模板（Compose V2 已废弃 version，不再写入）
-            template = """services:
-{services}
-"""
-
-        # 生成服务配置（对齐官方 docker-compose：Gateway 18789 + Bridge 18790，卷 /home/node/.openclaw）
-        # 见 openclaw 仓库 docker-compose.yml 与 docker-setup.sh
-        services = []
-        for inst in instances:
-            # 服务名必须为字符串，否则 ID 为纯数字（如 1）时 YAML 会解析成数字键，docker compose 报 non-string key
-            sid = inst.id
-            service_def = f'''  "{sid}":
-    image: openclaw:local
-    container_name: openclaw-{sid}
-    ports:
-      - "{inst.port}:18789"
-      - "{inst.port + 1}:18790"
-    volumes:
-      - ./instances/{sid}/data:/home/node/.openclaw
-      - ./instances/{sid}/data/workspace:/home/node/.openclaw/workspace
-    environment:
-      - HOME=/home/node
-      - TERM=xterm-256color
-      - NODE_ENV=production
-      - TZ=Asia/Shanghai
-    init: true
-    restart: unless-stopped
-    command:
-      - node
-      - dist/index.js
-      - gateway
-      - --bind
-      - lan
-      - --port
-      - "18789"
-    networks:
-      - openclaw-net'''
-            services.append(service_def)
-
-        # 写入 docker-compose.yml（含 networks）；services 不能为空否则 YAML 解析报 "services must be a mapping"
-        services_block = "\n".join(services) if services else "  {}"
-        compose_body = template.format(services=services_block)
-        compose_content = compose_body + """
-networks:
-  openclaw-net:
-    driver: bridge
-"""
-        compose_path = PROJECT_ROOT / "docker-compose.yml"
-        compose_path.write_text(compose_content, encoding="utf-8")
+        """停止并删除容器"""
+        docker = DockerService()
+        await docker.stop_container(instance_id)
+        await docker.remove_container(instance_id)
+
+    async def _regenerate_compose(self, instance_ids: Optional[list[str]] = None) -> None:
+        """重新生成 docker-compose.yml（仅重新渲染变化的服务，内容未变时不写文件）。
+
+        按实例布局下只渲染 instance_ids 对应的项目（None 时渲染全部），其他实例不受影响；
+        单文件布局始终需要完整的实例列表。读取实例列表与写文件在全局锁内完成，
+        并发调用不会用较旧的列表覆盖较新的结果。
+        """
+        if settings.compose_layout == "per_instance":
+            query = self.db.query(Instance.id, Instance.port)
+            if instance_ids is not None:
+                query = query.filter(Instance.id.in_(instance_ids))
+            rows = await run_db(query.all)
+            for r in rows:
+                await asyncio.to_thread(compose_renderer.render_project, r.id, r.port)
+            return
+        async with fleet_lock:
+            rows = await run_db(self.db.query(Instance.id, Instance.port).all)
+            compose_renderer.render([(r.id, r.port) for r in rows])
+
+
+async def run_instance_op(
+    action: str,
+    instance_id: str,
+    op: Callable[["InstanceService"], Awaitable[T]],
+    *key: object,
+) -> T:
+    """在实例锁内执行单实例操作；同一实例上相同的进行中操作（action 与 key 相同）只执行一次，
+    所有请求共享其结果。操作使用独立的数据库会话，不受某个请求提前断开的影响。"""
+
+    async def _run() -> T:
+        db = SessionLocal()
+        try:
+            async with instance_locks.hold(instance_id):
+                return await op(InstanceService(db))
+        finally:
+            db.close()
+
+    return await coalescer.run((action, instance_id, *key), _run)
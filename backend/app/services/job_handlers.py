@@ -0,0 +1,80 @@
+"""
+后台任务处理函数：备份、恢复、初始化与创建实例
+"""
+
+from typing import Optional
+
+from app.database import SessionLocal
+from app.services.backup_service import BackupService
+from app.services.docker_service import DockerService
+from app.services.instance_locks import instance_locks
+from app.services.instance_service import InstanceService
+from app.services.job_service import JobContext, job_manager
+
+
+async def create_backup(ctx: JobContext, params: dict) -> dict:
+    db = SessionLocal()
+    try:
+        backup = await BackupService(db, progress=ctx.progress).create_backup()
+        return {"backup": backup.to_dict()}
+    finally:
+        db.close()
+
+
+async def backup_instance(ctx: JobContext, params: dict) -> dict:
+    db = SessionLocal()
+    try:
+        service = BackupService(db, progress=ctx.progress)
+        backup = await service.backup_instance(params["instance_id"])
+        return {"backup": backup.to_dict()}
+    finally:
+        db.close()
+
+
+async def restore_backup(ctx: JobContext, params: dict) -> dict:
+    db = SessionLocal()
+    try:
+        service = BackupService(db, progress=ctx.progress)
+        return await service.restore_backup(params["backup_id"], params.get("instance_ids"))
+    finally:
+        db.close()
+
+
+async def gc_backups(ctx: JobContext, params: dict) -> dict:
+    db = SessionLocal()
+    try:
+        return {"removed": await BackupService(db).gc()}
+    finally:
+        db.close()
+
+
+async def init_instance(ctx: JobContext, params: dict) -> dict:
+    instance_id = params["instance_id"]
+    async with instance_locks.hold(instance_id):
+        result = await DockerService().init_instance(instance_id, progress=ctx.progress)
+    return {"result": result}
+
+
+async def create_instance(ctx: JobContext, params: dict) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        ctx.progress(0, "写入配置")
+        instance, _ = await InstanceService(db).create_instance(
+            params["id"], params["name"], params["password"]
+        )
+        # 任务结果会写入 jobs 表并通过事件流广播，不包含 gateway token；客户端通过 gateway-token 接口读取
+        return {"instance": instance.to_dict()}
+    finally:
+        db.close()
+
+
+# 备份、恢复与块回收共用 backup 池（默认互斥）；这些操作可重复执行，服务重启后自动重跑。
+# 创建实例的密码不落库，中断后无法重跑，标记为失败
+job_manager.register("backup.create", create_backup, pool="backup", resumable=True)
+job_manager.register("backup.instance", backup_instance, pool="backup", resumable=True)
+job_manager.register("backup.restore", restore_backup, pool="backup", resumable=True)
+job_manager.register("backup.gc", gc_backups, pool="backup", resumable=True)
+job_manager.register("instance.init", init_instance, pool="instance", resumable=True)
+job_manager.register(
+    "instance.create", create_instance, pool="instance", secret_params=("password",)
+)
@@ -0,0 +1,315 @@
+"""
+后台任务：长耗时操作写入 jobs 表后由进程内 worker 异步执行，按任务池限制并发，支持幂等键与重启恢复
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.database import SessionLocal, run_db
+from app.models import Job
+from app.services.event_bus import event_bus
+
+logger = logging.getLogger(__name__)
+
+FINISHED = ("succeeded", "failed")
+
+
+class JobConflictError(ValueError):
+    """幂等键已被参数不同的任务使用"""
+
+
+class JobContext:
+    """传给任务处理函数：上报进度（可在工作线程中调用）"""
+
+    # 进度事件的最小推送间隔（秒）
+    PUBLISH_INTERVAL = 0.5
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.percent = 0.0
+        self.message: Optional[str] = None
+        self._last_published = 0.0
+
+    def progress(self, percent: float, message: Optional[str] = None) -> None:
+        """更新进度（0-100）；message 为空时沿用上一条说明"""
+        self.percent = round(min(max(percent, 0.0), 100.0), 1)
+        if message is not None:
+            self.message = message
+        now = time.monotonic()
+        if message is not None or now - self._last_published >= self.PUBLISH_INTERVAL:
+            self._last_published = now
+            event_bus.publish(
+                "job.progress",
+                {"id": self.job_id, "progress": self.percent, "message": self.message},
+            )
+
+
+@dataclass
+class JobHandler:
+    func: Callable[[JobContext, dict], Awaitable[Optional[dict]]]
+    pool: str
+    # 服务重启时中断的任务能否重新执行（操作幂等）；否则标记为失败
+    resumable: bool
+    # 不写入 jobs 表的参数（如密码），仅随内存中的任务传递
+    secret_params: tuple[str, ...]
+
+
+class JobManager:
+    """任务提交、执行与查询；任务状态以 jobs 表为准，运行中的进度保存在内存"""
+
+    def __init__(self):
+        self._handlers: dict[str, JobHandler] = {}
+        self._pools: dict[str, asyncio.Semaphore] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._contexts: dict[str, JobContext] = {}
+
+    def register(
+        self,
+        kind: str,
+        func: Callable[[JobContext, dict], Awaitable[Optional[dict]]],
+        pool: Optional[str] = None,
+        resumable: bool = False,
+        secret_params: tuple[str, ...] = (),
+    ) -> None:
+        self._handlers[kind] = JobHandler(func, pool or kind.split(".")[0], resumable, secret_params)
+
+    def _pool(self, name: str) -> asyncio.Semaphore:
+        if name not in self._pools:
+            limit = settings.job_concurrency.get(name, settings.job_default_concurrency)
+            self._pools[name] = asyncio.Semaphore(max(1, limit))
+        return self._pools[name]
+
+    # ---- 生命周期 ----
+
+    async def start(self) -> None:
+        """清理过期记录，并恢复上次退出时未完成的任务"""
+        await run_db(_prune, settings.job_retention_days)
+        pending = await run_db(_unfinished)
+        for job in pending:
+            handler = self._handlers.get(job.kind)
+            if handler is None or not handler.resumable:
+                logger.warning("任务 %s (%s) 因服务重启中断，标记为失败", job.id, job.kind)
+                await self._finish(job.id, "failed", error="服务重启，任务中断")
+                continue
+            logger.info("恢复任务 %s (%s)", job.id, job.kind)
+            await run_db(_update, job.id, status="queued")
+            self._spawn(job.id, job.kind, json.loads(job.params) if job.params else {})
+
+    async def stop(self) -> None:
+        """取消运行中的任务；其记录保持 queued/running，下次启动时恢复或标记失败"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._contexts.clear()
+
+    # ---- 提交与查询 ----
+
+    async def submit(
+        self, kind: str, params: dict, idempotency_key: Optional[str] = None
+    ) -> tuple[dict, bool]:
+        """提交任务，返回 (任务, 是否新建)；相同幂等键的重复提交返回已有任务"""
+        handler = self._handlers[kind]
+        stored = {k: v for k, v in params.items() if k not in handler.secret_params}
+        if idempotency_key:
+            existing = await run_db(_find_by_key, idempotency_key)
+            if existing is not None:
+                return self._check_replay(existing, kind, stored), False
+
+        job_id = uuid.uuid4().hex
+        try:
+            job = await run_db(_insert, job_id, kind, stored, idempotency_key)
+        except IntegrityError:
+            # 并发提交了相同幂等键
+            existing = await run_db(_find_by_key, idempotency_key)
+            return self._check_replay(existing, kind, stored), False
+        event_bus.publish("job.status", job)
+        self._spawn(job_id, kind, params)
+        return job, True
+
+    def _check_replay(self, job: Job, kind: str, stored: dict) -> dict:
+        if job.kind != kind or (json.loads(job.params) if job.params else {}) != stored:
+            raise JobConflictError("幂等键已用于参数不同的请求")
+        return self._with_live(job.to_dict())
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = await run_db(_get, job_id)
+        return self._with_live(job.to_dict()) if job else None
+
+    async def list_jobs(
+        self, kind: Optional[str] = None, status: Optional[str] = None, limit: int = 50
+    ) -> list[dict]:
+        jobs = await run_db(_list, kind, status, limit)
+        return [self._with_live(j.to_dict()) for j in jobs]
+
+    def _with_live(self, job: dict) -> dict:
+        ctx = self._contexts.get(job["id"])
+        if ctx is not None and job["status"] == "running":
+            job["progress"], job["message"] = ctx.percent, ctx.message
+        return job
+
+    # ---- 执行 ----
+
+    def _spawn(self, job_id: str, kind: str, params: dict) -> None:
+        task = asyncio.create_task(self._run(job_id, kind, params))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run(self, job_id: str, kind: str, params: dict) -> None:
+        handler = self._handlers[kind]
+        async with self._pool(handler.pool):
+            ctx = JobContext(job_id)
+            self._contexts[job_id] = ctx
+            try:
+                job = await run_db(_start, job_id)
+                event_bus.publish("job.status", job)
+                try:
+                    result = await handler.func(ctx, params)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.exception("任务 %s (%s) 失败: %s", job_id, kind, e)
+                    await self._finish(job_id, "failed", error=str(e), ctx=ctx)
+                else:
+                    await self._finish(job_id, "succeeded", result=result, ctx=ctx)
+            finally:
+                self._contexts.pop(job_id, None)
+
+    async def _finish(
+        self,
+        job_id: str,
+        status: str,
+        result: Optional[dict] = None,
+        error: Optional[str] = None,
+        ctx: Optional[JobContext] = None,
+    ) -> None:
+        fields: dict = {"status": status, "error": error, "finished_at": datetime.utcnow()}
+        if result is not None:
+            fields["result"] = json.dumps(result, ensure_ascii=False, default=str)
+        if status == "succeeded":
+            fields["progress"] = 100.0
+        elif ctx is not None:
+            fields["progress"] = ctx.percent
+        if ctx is not None:
+            fields["message"] = ctx.message
+        job = await run_db(_update, job_id, **fields)
+        if job is None:
+            logger.warning("任务 %s 的记录已不存在，结果未保存", job_id)
+            return
+        event_bus.publish("job.status", job)
+
+
+def _get(job_id: str) -> Optional[Job]:
+    db = SessionLocal()
+    try:
+        return db.get(Job, job_id)
+    finally:
+        db.close()
+
+
+def _find_by_key(key: str) -> Optional[Job]:
+    db = SessionLocal()
+    try:
+        return db.query(Job).filter(Job.idempotency_key == key).first()
+    finally:
+        db.close()
+
+
+def _list(kind: Optional[str], status: Optional[str], limit: int) -> list[Job]:
+    db = SessionLocal()
+    try:
+        query = db.query(Job)
+        if kind:
+            query = query.filter(Job.kind == kind)
+        if status:
+            query = query.filter(Job.status == status)
+        return query.order_by(Job.created_at.desc()).limit(limit).all()
+    finally:
+        db.close()
+
+
+def _insert(job_id: str, kind: str, params: dict, key: Optional[str]) -> dict:
+    db = SessionLocal()
+    try:
+        job = Job(
+            id=job_id,
+            kind=kind,
+            status="queued",
+            params=json.dumps(params, ensure_ascii=False),
+            idempotency_key=key or None,
+        )
+        db.add(job)
+        db.commit()
+        return job.to_dict()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _update(job_id: str, **fields) -> Optional[dict]:
+    """更新任务字段；记录不存在时返回 None"""
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        if job is None:
+            return None
+        for name, value in fields.items():
+            setattr(job, name, value)
+        db.commit()
+        return job.to_dict()
+    finally:
+        db.close()
+
+
+def _start(job_id: str) -> dict:
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        job.attempts = (job.attempts or 0) + 1
+        db.commit()
+        return job.to_dict()
+    finally:
+        db.close()
+
+
+def _unfinished() -> list[Job]:
+    db = SessionLocal()
+    try:
+        return (
+            db.query(Job)
+            .filter(Job.status.notin_(FINISHED))
+            .order_by(Job.created_at)
+            .all()
+        )
+    finally:
+        db.close()
+
+
+def _prune(days: int) -> None:
+    db = SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        db.query(Job).filter(Job.status.in_(FINISHED), Job.finished_at < cutoff).delete(
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+# 进程内共享实例，由 main.lifespan 启停；处理函数在 job_handlers 中注册
+job_manager = JobManager()
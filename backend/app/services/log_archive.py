@@ -0,0 +1,285 @@
+"""
+实例日志归档：后台持续采集运行中实例的日志，按时间分段压缩存储并建立稀疏时间索引
+"""
+
+import asyncio
+import gzip
+import logging
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+
+from app.config import settings
+from app.database import PROJECT_ROOT
+from app.services.docker_service import DockerService
+from app.services.state_cache import state_cache
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".log.gz"
+INDEX_SUFFIX = ".idx"
+
+
+# 归档目录位于实例目录下；备份与恢复跳过该目录（归档持续追加写入，且可由容器日志重新生成）
+ARCHIVE_DIRNAME = "logs"
+
+
+def archive_dir(instance_id: str) -> Path:
+    return PROJECT_ROOT / "instances" / instance_id / ARCHIVE_DIRNAME
+
+
+def parse_timestamp(line: str) -> Optional[int]:
+    """解析 docker --timestamps 行首的 RFC3339Nano 时间戳（UTC），返回毫秒；无法解析返回 None"""
+    try:
+        base = datetime.strptime(line[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    ms = 0
+    if line[19:20] == ".":
+        digits = re.match(r"\d+", line[20:29])
+        ms = int((digits.group(0) + "00")[:3]) if digits else 0
+    return int(base.timestamp()) * 1000 + ms
+
+
+class LogArchive:
+    """单个实例的日志归档目录：
+
+    - <start_ms>.log.gz：分段文件，由多个独立的 gzip member（块）拼接而成，可直接 zcat
+    - <start_ms>.idx：稀疏索引，每块一行 "最小时间 最大时间 偏移 长度 行数"
+
+    查询时按分段起始时间与块索引定位，只解压与时间范围相交的块。
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._pending: list[tuple[int, str]] = []
+        self._pending_bytes = 0
+        self._segment: Optional[int] = None
+        self._last_flush = time.monotonic()
+        # 刷盘在工作线程中执行，串行化同一归档的写入
+        self._lock = threading.Lock()
+
+    # ---- 写入 ----
+
+    def append(self, ts: int, line: str) -> None:
+        """缓存一行（含原始时间戳前缀）；达到块大小后由调用方 flush"""
+        self._pending.append((ts, line))
+        self._pending_bytes += len(line) + 1
+
+    def should_flush(self) -> bool:
+        return bool(self._pending) and (
+            self._pending_bytes >= settings.log_block_bytes
+            or time.monotonic() - self._last_flush >= settings.log_flush_seconds
+        )
+
+    def take(self) -> list[tuple[int, str]]:
+        """取出待写入的行（在事件循环线程调用，随后交给 write_block）"""
+        block, self._pending, self._pending_bytes = self._pending, [], 0
+        self._last_flush = time.monotonic()
+        return block
+
+    def write_block(self, block: list[tuple[int, str]]) -> None:
+        """把一块日志作为一个 gzip member 追加到当前分段，再追加索引行（同步阻塞）"""
+        if not block:
+            return
+        with self._lock:
+            segment = self._current_segment(block[0][0])
+            data = gzip.compress(
+                "".join(line + "\n" for _, line in block).encode("utf-8"), compresslevel=6
+            )
+            path = self.root / f"{segment}{SEGMENT_SUFFIX}"
+            with path.open("ab") as f:
+                offset = f.tell()
+                f.write(data)
+            stamps = [ts for ts, _ in block]
+            # 数据先于索引落盘，读方看到的索引条目总指向完整的块
+            with (self.root / f"{segment}{INDEX_SUFFIX}").open("a", encoding="ascii") as f:
+                f.write(f"{min(stamps)} {max(stamps)} {offset} {len(data)} {len(block)}\n")
+
+    def _current_segment(self, first_ts: int) -> int:
+        """当前分段的起始时间；超过大小或时长阈值时轮转并清理过期分段"""
+        if self._segment is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            segments = self.segments()
+            self._segment = segments[-1] if segments else first_ts
+        path = self.root / f"{self._segment}{SEGMENT_SUFFIX}"
+        size = path.stat().st_size if path.exists() else 0
+        if size and (
+            size >= settings.log_segment_bytes
+            or first_ts - self._segment >= settings.log_segment_seconds * 1000
+        ):
+            # 分段名即起始时间，必须严格递增
+            self._segment = max(first_ts, self._segment + 1)
+            self.prune()
+        return self._segment
+
+    # ---- 读取 ----
+
+    def segments(self) -> list[int]:
+        """按起始时间排序的分段列表"""
+        if not self.root.exists():
+            return []
+        return sorted(
+            int(p.name[: -len(SEGMENT_SUFFIX)])
+            for p in self.root.glob(f"*{SEGMENT_SUFFIX}")
+            if p.name[: -len(SEGMENT_SUFFIX)].isdigit()
+        )
+
+    def _index(self, segment: int) -> list[tuple[int, int, int, int]]:
+        """读取分段索引 [(最小时间, 最大时间, 偏移, 长度)]；跳过正在写入的残缺行"""
+        entries = []
+        try:
+            text = (self.root / f"{segment}{INDEX_SUFFIX}").read_text(encoding="ascii")
+        except FileNotFoundError:
+            return entries
+        for row in text.splitlines():
+            parts = row.split()
+            if len(parts) == 5 and all(p.isdigit() for p in parts):
+                entries.append((int(parts[0]), int(parts[1]), int(parts[2]), int(parts[3])))
+        return entries
+
+    def last_timestamp(self) -> Optional[int]:
+        """已归档的最新时间戳（毫秒），用于重启后续采"""
+        for segment in reversed(self.segments()):
+            entries = self._index(segment)
+            if entries:
+                return max(e[1] for e in entries)
+        return None
+
+    def query(
+        self,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        pattern: Optional[re.Pattern] = None,
+        limit: int = 1000,
+    ) -> Iterator[str]:
+        """按时间范围（毫秒，闭区间）与正则检索，按时间顺序输出至多 limit 行（同步生成器）"""
+        if limit <= 0:
+            return
+        segments = self.segments()
+        count = 0
+        for i, segment in enumerate(segments):
+            # 分段覆盖 [起始时间, 下一分段起始时间)
+            if until is not None and segment > until:
+                break
+            if since is not None and i + 1 < len(segments) and segments[i + 1] <= since:
+                continue
+            blocks = [
+                (offset, length)
+                for low, high, offset, length in self._index(segment)
+                if (since is None or high >= since) and (until is None or low <= until)
+            ]
+            if not blocks:
+                continue
+            with (self.root / f"{segment}{SEGMENT_SUFFIX}").open("rb") as f:
+                for offset, length in blocks:
+                    f.seek(offset)
+                    raw = zlib.decompress(f.read(length), wbits=31)
+                    for line in raw.decode("utf-8", errors="replace").splitlines():
+                        ts = parse_timestamp(line)
+                        if ts is not None and (
+                            (since is not None and ts < since) or (until is not None and ts > until)
+                        ):
+                            continue
+                        if pattern is not None and not pattern.search(line):
+                            continue
+                        yield line
+                        count += 1
+                        if count >= limit:
+                            return
+
+    def prune(self) -> int:
+        """删除整段早于保留期限的分段（以下一分段的起始时间判断），返回删除数量"""
+        cutoff = int(time.time() * 1000) - settings.log_retention_days * 86400 * 1000
+        segments = self.segments()
+        removed = 0
+        for segment, following in zip(segments, segments[1:]):
+            if following >= cutoff:
+                break
+            (self.root / f"{segment}{SEGMENT_SUFFIX}").unlink(missing_ok=True)
+            (self.root / f"{segment}{INDEX_SUFFIX}").unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+
+class LogArchiver:
+    """为每个运行中的实例维护一个采集任务，将带时间戳的日志写入 LogArchive"""
+
+    # 检查新启动实例的间隔（秒）
+    RECONCILE_INTERVAL = 10.0
+
+    def __init__(self):
+        self._archives: dict[str, LogArchive] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._loop_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if settings.log_archive_enabled:
+            self._loop_task = asyncio.create_task(self._reconcile_loop())
+
+    async def stop(self) -> None:
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+        for instance_id in list(self._tasks):
+            await self.stop_instance(instance_id)
+
+    async def stop_instance(self, instance_id: str) -> None:
+        """停止采集并写出缓存的日志（删除实例前调用，避免重新创建已删除的目录）"""
+        task = self._tasks.pop(instance_id, None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        archive = self._archives.pop(instance_id, None)
+        if archive is not None:
+            await asyncio.to_thread(archive.write_block, archive.take())
+
+    def archive(self, instance_id: str) -> LogArchive:
+        return self._archives.get(instance_id) or LogArchive(archive_dir(instance_id))
+
+    async def _reconcile_loop(self) -> None:
+        while True:
+            try:
+                for instance_id, status in state_cache.snapshot().items():
+                    task = self._tasks.get(instance_id)
+                    if status == "running" and (task is None or task.done()):
+                        self._tasks[instance_id] = asyncio.create_task(self._collect(instance_id))
+                # 日志停顿时也按刷盘间隔写出缓存
+                for archive in list(self._archives.values()):
+                    if archive.should_flush():
+                        await asyncio.to_thread(archive.write_block, archive.take())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("日志归档巡检失败: %s", e)
+            await asyncio.sleep(self.RECONCILE_INTERVAL)
+
+    async def _collect(self, instance_id: str) -> None:
+        archive = self._archives.setdefault(instance_id, LogArchive(archive_dir(instance_id)))
+        last = await asyncio.to_thread(archive.last_timestamp)
+        # 从上次归档位置续采；首次采集时归档容器现有的全部日志
+        # （docker 的 since 格式为 "秒.九位纳秒"）
+        since = None
+        if last is not None:
+            since = f"{(last + 1) // 1000}.{(last + 1) % 1000 * 1_000_000:09d}"
+        try:
+            async for line in DockerService().stream_logs(instance_id, since=since, timestamps=True):
+                ts = parse_timestamp(line)
+                archive.append(ts if ts is not None else int(time.time() * 1000), line)
+                if archive.should_flush():
+                    await asyncio.to_thread(archive.write_block, archive.take())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("实例 %s 日志归档中断: %s", instance_id, e)
+        # 容器停止时跟随结束，写出剩余日志；下次巡检发现实例运行时重新续采
+        await asyncio.to_thread(archive.write_block, archive.take())
+
+
+# 进程内共享实例
+log_archiver = LogArchiver()
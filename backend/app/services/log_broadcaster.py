@@ -0,0 +1,249 @@
+"""
+实例日志广播：每个实例只保留一个上游 docker logs 跟随，所有订阅者共享
+"""
+
+import asyncio
+import logging
+import re
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, Callable, Literal, Optional
+
+from app.config import settings
+from app.services.docker_service import DockerService
+
+logger = logging.getLogger(__name__)
+
+# 订阅队列满时的处理策略：丢弃最旧的行 / 丢弃新行 / 断开该订阅者
+DropPolicy = Literal["drop_oldest", "drop_newest", "disconnect"]
+
+_END = object()
+
+
+class LogLagError(RuntimeError):
+    """订阅者消费过慢，按 disconnect 策略被断开"""
+
+
+class LogSubscription:
+    """单个订阅者：有界队列 + 丢弃计数"""
+
+    def __init__(self, maxsize: int, policy: DropPolicy):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.policy = policy
+        # 因消费过慢被丢弃的行数（累计）
+        self.dropped = 0
+        self._closed = False
+
+    def offer(self, line: str) -> None:
+        if self._closed:
+            return
+        if not self.queue.full():
+            self.queue.put_nowait(line)
+            return
+        self.dropped += 1
+        if self.policy == "drop_oldest":
+            self.queue.get_nowait()
+            self.queue.put_nowait(line)
+        elif self.policy == "disconnect":
+            self.close(LogLagError(f"日志消费过慢，已丢弃 {self.dropped} 行，连接被断开"))
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        """结束订阅；结束标记总能入队（必要时挤掉最旧的一行）"""
+        if self._closed:
+            return
+        self._closed = True
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(error if error is not None else _END)
+
+    async def get(self) -> Optional[str]:
+        """取下一行；流结束返回 None，上游出错时抛出异常"""
+        item = await self.queue.get()
+        if item is _END:
+            return None
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def get_nowait(self) -> Optional[str]:
+        """非阻塞取一行；队列为空时抛出 asyncio.QueueEmpty"""
+        item = self.queue.get_nowait()
+        if item is _END:
+            return None
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        while (line := await self.get()) is not None:
+            yield line
+
+
+_LEVEL_RE = re.compile(r"\b(fatal|error|err|warn|warning|info|debug|trace)\b", re.IGNORECASE)
+_LEVEL_RANK = {
+    "trace": 0, "debug": 1, "info": 2, "warn": 3, "warning": 3, "err": 4, "error": 4, "fatal": 5,
+}
+
+LogLevel = Literal["trace", "debug", "info", "warn", "error", "fatal"]
+
+
+def make_line_filter(
+    level: Optional[LogLevel] = None, pattern: Optional[str] = None
+) -> Optional[Callable[[str], bool]]:
+    """构造服务端日志过滤：level 为最低级别（无法识别级别的行按 info 处理），pattern 为正则。
+    正则非法时抛出 re.error。"""
+    if not level and not pattern:
+        return None
+    min_rank = _LEVEL_RANK[level] if level else 0
+    regex = re.compile(pattern) if pattern else None
+
+    def _accept(line: str) -> bool:
+        if min_rank:
+            m = _LEVEL_RE.search(line)
+            if (_LEVEL_RANK[m.group(1).lower()] if m else _LEVEL_RANK["info"]) < min_rank:
+                return False
+        return regex is None or regex.search(line) is not None
+
+    return _accept
+
+
+async def batch_lines(
+    sub: LogSubscription,
+    interval: float,
+    max_lines: int,
+    max_bytes: int,
+    accept: Optional[Callable[[str], bool]] = None,
+) -> AsyncIterator[list[str]]:
+    """把订阅流合并为批次：首行到达后最多等待 interval 秒，或凑满 max_lines 行 / max_bytes 字节即输出。
+    订阅者因过慢被丢弃的行以一条“已跳过 N 行”标记代替。"""
+    loop = asyncio.get_running_loop()
+    reported = 0
+    ended = False
+    while not ended:
+        line = await sub.get()
+        if line is None:
+            break
+        batch: list[str] = []
+        size = 0
+        deadline = loop.time() + interval
+        while True:
+            if accept is None or accept(line):
+                batch.append(line)
+                size += len(line) + 1
+            if len(batch) >= max_lines or size >= max_bytes:
+                break
+            try:
+                line = sub.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    line = await asyncio.wait_for(sub.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if line is None:
+                ended = True
+                break
+        if sub.dropped > reported:
+            batch.append(f"[... 客户端处理过慢，已跳过 {sub.dropped - reported} 行日志 ...]")
+            reported = sub.dropped
+        if batch:
+            yield batch
+
+
+class LogBroadcaster:
+    """单个实例的日志广播：上游跟随一次，写入环形缓冲并分发给所有订阅者"""
+
+    def __init__(self, instance_id: str, buffer_size: int):
+        self.instance_id = instance_id
+        self.buffer: deque[str] = deque(maxlen=buffer_size)
+        self.subscribers: set[LogSubscription] = set()
+        self.ended = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._pump())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def subscribe(self, queue_size: int, policy: DropPolicy) -> LogSubscription:
+        """新订阅者先收到环形缓冲中的最近日志"""
+        sub = LogSubscription(max(queue_size, len(self.buffer) + 1), policy)
+        for line in self.buffer:
+            sub.offer(line)
+        self.subscribers.add(sub)
+        return sub
+
+    async def _pump(self) -> None:
+        error: Optional[BaseException] = None
+        try:
+            # 上游从最近 buffer_size 行开始跟随，直接填满环形缓冲
+            lines: AsyncGenerator[str, None] = DockerService().stream_logs(
+                self.instance_id, tail=str(self.buffer.maxlen)
+            )
+            try:
+                async for line in lines:
+                    self.buffer.append(line)
+                    for sub in self.subscribers:
+                        sub.offer(line)
+            finally:
+                await lines.aclose()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("实例 %s 日志跟随失败: %s", self.instance_id, e)
+            error = e
+        self.ended = True
+        for sub in self.subscribers:
+            sub.close(error)
+
+
+class LogHub:
+    """按实例管理日志广播，引用计数：首个订阅者启动上游，最后一个离开时关闭"""
+
+    def __init__(self):
+        self._broadcasters: dict[str, LogBroadcaster] = {}
+
+    @asynccontextmanager
+    async def subscribe(
+        self,
+        instance_id: str,
+        policy: DropPolicy = "drop_oldest",
+    ) -> AsyncIterator[LogSubscription]:
+        broadcaster = self._broadcasters.get(instance_id)
+        if broadcaster is None or broadcaster.ended:
+            broadcaster = LogBroadcaster(instance_id, settings.log_buffer_lines)
+            self._broadcasters[instance_id] = broadcaster
+            broadcaster.start()
+        sub = broadcaster.subscribe(settings.log_subscriber_queue, policy)
+        try:
+            yield sub
+        finally:
+            broadcaster.subscribers.discard(sub)
+            if not broadcaster.subscribers:
+                if self._broadcasters.get(instance_id) is broadcaster:
+                    del self._broadcasters[instance_id]
+                await broadcaster.stop()
+
+    def stats(self) -> dict[str, dict]:
+        return {
+            instance_id: {"subscribers": len(b.subscribers), "buffered": len(b.buffer)}
+            for instance_id, b in self._broadcasters.items()
+        }
+
+    async def close(self) -> None:
+        broadcasters = list(self._broadcasters.values())
+        self._broadcasters.clear()
+        for b in broadcasters:
+            for sub in b.subscribers:
+                sub.close()
+            await b.stop()
+
+
+# 进程内共享实例
+log_hub = LogHub()
@@ -0,0 +1,238 @@
+"""
+Prometheus 指标：进程内计数器与直方图，/metrics 以文本格式导出（不依赖 prometheus_client）
+"""
+
+import functools
+import math
+import threading
+import time
+from typing import Awaitable, Callable, Iterable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# 默认延迟分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # 每组标签：(各分桶计数（非累计）, 总和, 次数)
+        self._values: dict[tuple[str, ...], tuple[list[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = next(i for i, b in enumerate(self.buckets) if value <= b)
+        with self._lock:
+            counts, total, n = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value, n + 1)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = [(k, (list(c), s, n)) for k, (c, s, n) in self._values.items()]
+        lines = self.header()
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+class GaugeFamily:
+    """采集时生成的仪表盘指标：(标签值, 数值) 由 collector 在导出时提供"""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def render(self, samples: Iterable[tuple[tuple[str, ...], float]]) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in samples]
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], list[str]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], list[str]]) -> None:
+        """导出时调用的回调，返回若干行文本格式指标"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for collector in self._collectors:
+            lines += collector()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "claw_http_request_duration_seconds",
+    "API 请求处理耗时",
+    ("method", "route", "status"),
+))
+docker_operation_duration = registry.register(Histogram(
+    "claw_docker_operation_duration_seconds",
+    "DockerService 操作耗时",
+    ("operation",),
+))
+docker_operation_failures = registry.register(Counter(
+    "claw_docker_operation_failures_total",
+    "DockerService 操作失败次数",
+    ("operation",),
+))
+
+
+def timed_docker_operation(
+    name: Optional[str] = None,
+) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """记录 DockerService 异步方法的耗时与失败次数"""
+
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        operation = name or func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs) -> T:
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                docker_operation_failures.inc(operation=operation)
+                raise
+            finally:
+                docker_operation_duration.observe(time.perf_counter() - start, operation=operation)
+
+        return wrapper
+
+    return decorator
+
+
+def _route_template(scope) -> str:
+    """请求对应的路由模板（如 /api/instances/{instance_id}）；未匹配（404）统一归为 unmatched，避免标签膨胀。
+
+    路由匹配后 Starlette 会把 route 写入 scope；include_router 的前缀可能不在 route.path 中，
+    按模板段数从实际路径补回。
+    """
+    template = getattr(scope.get("route"), "path", None)
+    if not template:
+        return "unmatched"
+    parts = scope["path"].split("/")
+    prefix = "/".join(parts[: max(len(parts) - template.count("/"), 1)])
+    return prefix + template
+
+
+class MetricsMiddleware:
+    """ASGI 中间件：按路由模板记录请求耗时（到响应头发出为止，SSE/日志流等长响应不会拉高延迟）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        recorded = False
+
+        def record(status: int) -> None:
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            route = _route_template(scope)
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=route,
+                status=str(status),
+            )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                record(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            record(500)
+            raise
@@ -0,0 +1,206 @@
+"""
+网关端口分配：内存位图记录已占用的端口对，启动时由 instances 表重建
+"""
+
+import logging
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Instance
+
+logger = logging.getLogger(__name__)
+
+# 与官方 Gateway 端口一致：18789 / 18790，每实例占 2 个连续端口
+BASE_PORT = 18789
+
+
+def _host_port_free(port: int) -> bool:
+    """宿主机上 port 是否未被其他进程监听"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            s.bind(("0.0.0.0", port))
+        except OSError:
+            return False
+    return True
+
+
+class PortAllocator:
+    """端口对分配器：槽位 i 对应端口 BASE_PORT + 2i 与 +1，位图第 i 位为 1 表示已占用。
+
+    取最低空闲位只需几次大整数位运算，不随实例数线性扫描。历史数据中未按槽位对齐的端口
+    会同时占用其跨越的两个槽位。
+    """
+
+    def __init__(self, base_port: int = BASE_PORT, max_port: int = 65535):
+        self.base_port = base_port
+        self.max_slot = (max_port - 1 - base_port) // 2
+        self._ports: set[int] = set()
+        # 预留给预热槽位、尚未归属实例的端口；重新加载时保留
+        self._pinned: set[int] = set()
+        # 已分配但实例尚未入库的端口；重新加载时同样保留
+        self._pending: set[int] = set()
+        self._used = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    # ---- 槽位 ----
+
+    def _slots_of(self, port: int) -> set[int]:
+        """实例端口 port 占用 port 与 port+1 所在的槽位"""
+        return {(p - self.base_port) // 2 for p in (port, port + 1) if p >= self.base_port}
+
+    def _slot_taken(self, slot: int) -> bool:
+        first = self.base_port + 2 * slot
+        return any(p in self._ports for p in (first - 1, first, first + 1))
+
+    def _free_slots(self, taken: int) -> Iterator[int]:
+        """按从小到大输出位图 taken 中的空闲槽位"""
+        while True:
+            slot = (~taken & (taken + 1)).bit_length() - 1
+            if slot > self.max_slot:
+                return
+            yield slot
+            taken |= 1 << slot
+
+    # ---- 加载 ----
+
+    def load(self, ports: Optional[list[int]] = None) -> None:
+        """由数据库中全部实例端口重建位图"""
+        if ports is None:
+            db = SessionLocal()
+            try:
+                ports = [r.port for r in db.query(Instance.port).all()]
+            finally:
+                db.close()
+        with self._lock:
+            self._ports = set(ports)
+            conflicts = self._pinned & self._ports
+            if conflicts:
+                # 如恢复备份后数据库中的实例占用了预热槽位的端口：槽位作废，由预热池丢弃
+                logger.warning("预热槽位端口 %s 已被实例占用", sorted(conflicts))
+                self._pinned -= conflicts
+            self._ports |= self._pinned | self._pending
+            self._used = 0
+            for port in self._ports:
+                for slot in self._slots_of(port):
+                    self._used |= 1 << slot
+            self._loaded = True
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.load()
+
+    # ---- 分配 ----
+
+    def reserve(self, pinned: bool = False) -> int:
+        """占用最低的空闲端口对并返回网关端口；宿主机上已被其他进程监听的端口对会被跳过。
+        pinned 表示为预热槽位占用，否则在 reservation 结束前视为待定。
+
+        先在锁内占用候选端口对，再在锁外探测宿主机，探测期间不阻塞其他分配；
+        探测会发起 bind 系统调用，异步代码中应通过 asyncio.to_thread 调用。"""
+        self._ensure_loaded()
+        busy: list[int] = []
+        try:
+            while True:
+                with self._lock:
+                    slot = next(self._free_slots(self._used), None)
+                    if slot is None:
+                        raise RuntimeError("没有可用的网关端口")
+                    port = self.base_port + 2 * slot
+                    self._ports.add(port)
+                    (self._pinned if pinned else self._pending).add(port)
+                    self._used |= 1 << slot
+                if not settings.port_check_host or (
+                    _host_port_free(port) and _host_port_free(port + 1)
+                ):
+                    return port
+                logger.info("端口 %d/%d 已被宿主机其他进程占用，跳过", port, port + 1)
+                busy.append(port)
+        finally:
+            # 被跳过的端口对在分配结束后归还，下次分配时重新探测
+            for port in busy:
+                self.release(port)
+
+    def pin(self, port: int) -> bool:
+        """为预热槽位占用指定端口对；已被占用时返回 False"""
+        self._ensure_loaded()
+        with self._lock:
+            if port in self._pinned:
+                return True
+            if any(self._slot_taken(slot) for slot in self._slots_of(port)):
+                return False
+            self._ports.add(port)
+            self._pinned.add(port)
+            for slot in self._slots_of(port):
+                self._used |= 1 << slot
+            return True
+
+    def is_pinned(self, port: int) -> bool:
+        with self._lock:
+            return port in self._pinned
+
+    def unpin(self, port: int) -> None:
+        """槽位被实例认领：端口转为待定的实例端口（仍占用）"""
+        with self._lock:
+            if port in self._pinned:
+                self._pinned.discard(port)
+                self._pending.add(port)
+
+    def release(self, port: int) -> None:
+        """释放实例端口对（实例删除或创建失败回滚时调用）"""
+        with self._lock:
+            self._pinned.discard(port)
+            self._pending.discard(port)
+            self._ports.discard(port)
+            for slot in self._slots_of(port):
+                if not self._slot_taken(slot):
+                    self._used &= ~(1 << slot)
+
+    @contextmanager
+    def reservation(self, port: Optional[int] = None) -> Iterator[int]:
+        """占用一个端口对（或接管已由 reserve / 预热槽位占用的 port），块内抛出异常（如数据库提交失败）时
+        自动释放；正常结束时实例已入库，端口不再视为待定"""
+        if port is None:
+            port = self.reserve()
+        else:
+            self.unpin(port)
+        try:
+            yield port
+        except BaseException:
+            self.release(port)
+            raise
+        with self._lock:
+            self._pending.discard(port)
+
+    # ---- 查询 ----
+
+    def used_ports(self) -> list[int]:
+        self._ensure_loaded()
+        with self._lock:
+            return sorted(self._ports)
+
+    def recommended(self, count: int = 10) -> list[int]:
+        """接下来会被分配的 count 个网关端口（不占用）；在位图快照上于锁外探测宿主机"""
+        self._ensure_loaded()
+        with self._lock:
+            taken = self._used
+        result = []
+        for slot in self._free_slots(taken):
+            port = self.base_port + 2 * slot
+            if settings.port_check_host and not (
+                _host_port_free(port) and _host_port_free(port + 1)
+            ):
+                continue
+            result.append(port)
+            if len(result) >= count:
+                break
+        return result
+
+
+# 进程内共享实例
+port_allocator = PortAllocator()
@@ -0,0 +1,32 @@
+"""
+有界并发调度工具
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Iterable, Sequence, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def chunked(items: Sequence[T], size: int) -> list[list[T]]:
+    """按 size 切分列表"""
+    size = max(1, size)
+    return [list(items[i:i + size]) for i in range(0, len(items), size)]
+
+
+async def run_bounded(
+    items: Iterable[T],
+    func: Callable[[T], Awaitable[R]],
+    limit: int,
+) -> list[tuple[T, R | BaseException]]:
+    """以最多 limit 个并发执行 func(item)，按输入顺序返回 (item, 结果或异常)"""
+    sem = asyncio.Semaphore(max(1, limit))
+
+    async def _one(item: T) -> R:
+        async with sem:
+            return await func(item)
+
+    items = list(items)
+    results = await asyncio.gather(*(_one(i) for i in items), return_exceptions=True)
+    return list(zip(items, results))
@@ -0,0 +1,257 @@
+"""
+容器状态缓存：订阅 Docker 事件流，在内存维护实例状态并批量回写数据库
+"""
+
+import asyncio
+import json
+import logging
+import re
+import secrets
+import time
+from typing import AsyncGenerator, Optional
+
+from app.database import SessionLocal, run_db
+from app.models import Instance
+from app.services.docker_api import get_docker_client
+from app.services.event_bus import event_bus
+
+logger = logging.getLogger(__name__)
+
+CONTAINER_PREFIX = "openclaw-"
+
+_EXITED_RE = re.compile(r"Exited \((\d+)\)")
+
+
+class ContainerStateCache:
+    """实例状态（created/running/stopped/error）的内存视图，由 Docker 事件驱动更新"""
+
+    # 批量回写数据库的间隔（秒）
+    FLUSH_INTERVAL = 1.0
+    # 事件流断开后的最大重连间隔（秒）
+    RETRY_MAX = 30.0
+
+    def __init__(self):
+        self._states: dict[str, str] = {}
+        self._dirty: dict[str, str] = {}
+        # 收到 kill 事件的容器：随后的 die 视为正常停止而非崩溃
+        self._stopping: set[str] = set()
+        self._tasks: list[asyncio.Task] = []
+        # 实例集合或任一实例状态变化时递增；与进程启动标识一起构成列表接口的 ETag
+        self.version = 0
+        self._epoch = secrets.token_hex(4)
+
+    # ---- 读取 ----
+
+    def get(self, instance_id: str, default: Optional[str] = None) -> Optional[str]:
+        return self._states.get(instance_id, default)
+
+    def snapshot(self) -> dict[str, str]:
+        return dict(self._states)
+
+    def version_tag(self) -> str:
+        return f"{self._epoch}-{self.version}"
+
+    def counts(self) -> tuple[int, int]:
+        """返回 (实例总数, 运行中实例数)"""
+        running = sum(1 for s in self._states.values() if s == "running")
+        return len(self._states), running
+
+    # ---- 路由/服务写入（调用方已提交数据库，无需回写） ----
+
+    def set(self, instance_id: str, status: str) -> None:
+        if self._states.get(instance_id) != status:
+            self.version += 1
+            event_bus.publish("instance.status", {"id": instance_id, "status": status})
+        self._states[instance_id] = status
+        self._dirty.pop(instance_id, None)
+
+    def discard(self, instance_id: str) -> None:
+        if self._states.pop(instance_id, None) is not None:
+            self.version += 1
+        self._dirty.pop(instance_id, None)
+        self._stopping.discard(instance_id)
+
+    def touch(self) -> None:
+        """实例的其他字段发生变化（如恢复备份覆盖了数据库）时使列表缓存失效"""
+        self.version += 1
+
+    # ---- 生命周期 ----
+
+    def load(self) -> None:
+        """从数据库加载实例状态"""
+        db = SessionLocal()
+        try:
+            self._states = {i.id: i.status for i in db.query(Instance.id, Instance.status).all()}
+        finally:
+            db.close()
+        self.version += 1
+
+    async def start(self) -> None:
+        self.load()
+        self._tasks = [
+            asyncio.create_task(self._watch()),
+            asyncio.create_task(self._flush_loop()),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.flush()
+
+    # ---- 内部实现 ----
+
+    def _apply(self, instance_id: str, status: str) -> None:
+        if instance_id not in self._states or self._states[instance_id] == status:
+            return
+        logger.info("实例状态变化: %s %s -> %s", instance_id, self._states[instance_id], status)
+        self._states[instance_id] = status
+        self._dirty[instance_id] = status
+        self.version += 1
+        event_bus.publish("instance.status", {"id": instance_id, "status": status})
+
+    async def _watch(self) -> None:
+        """全量同步一次后持续消费事件流；断开后指数退避重连"""
+        delay = 1.0
+        while True:
+            try:
+                since = int(time.time())
+                await self._sync()
+                async for event in self._events(since):
+                    self._handle(event)
+                    delay = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Docker 事件流中断，%.0fs 后重连: %s", delay, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.RETRY_MAX)
+
+    async def _sync(self) -> None:
+        """按当前容器列表校正状态"""
+        api = get_docker_client()
+        seen: dict[str, str] = {}
+        if api is not None:
+            for c in await api.list_containers(CONTAINER_PREFIX):
+                for name in c.get("Names") or []:
+                    seen[name.lstrip("/")] = _container_status(c.get("State"), c.get("Status"))
+        else:
+            proc = await asyncio.create_subprocess_exec(
+                "docker", "ps", "-a", "--filter", f"name={CONTAINER_PREFIX}",
+                "--format", "{{.Names}}\t{{.State}}\t{{.Status}}",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            stdout, stderr = await proc.communicate()
+            if proc.returncode != 0:
+                raise RuntimeError(stderr.decode("utf-8", errors="replace").strip())
+            for line in stdout.decode("utf-8", errors="replace").splitlines():
+                parts = line.split("\t")
+                if len(parts) == 3:
+                    seen[parts[0]] = _container_status(parts[1], parts[2])
+
+        for instance_id, current in list(self._states.items()):
+            status = seen.get(CONTAINER_PREFIX + instance_id)
+            if status is not None:
+                self._apply(instance_id, status)
+            elif current == "running":
+                # 容器已不存在
+                self._apply(instance_id, "stopped")
+
+    async def _events(self, since: int) -> AsyncGenerator[dict, None]:
+        api = get_docker_client()
+        if api is not None:
+            async for event in api.events({"type": ["container"]}, since=since):
+                yield event
+            return
+
+        proc = await asyncio.create_subprocess_exec(
+            "docker", "events", "--filter", "type=container",
+            "--since", str(since), "--format", "{{json .}}",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            while proc.stdout:
+                line = await proc.stdout.readline()
+                if not line:
+                    break
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+        raise RuntimeError("docker events 进程已退出")
+
+    def _handle(self, event: dict) -> None:
+        attrs = (event.get("Actor") or {}).get("Attributes") or {}
+        name = attrs.get("name") or ""
+        if not name.startswith(CONTAINER_PREFIX):
+            return
+        instance_id = name[len(CONTAINER_PREFIX):]
+        action = (event.get("Action") or event.get("status") or "").split(":")[0]
+
+        if action in ("start", "restart", "unpause"):
+            self._stopping.discard(instance_id)
+            self._apply(instance_id, "running")
+        elif action == "kill":
+            self._stopping.add(instance_id)
+        elif action == "die":
+            expected = instance_id in self._stopping or attrs.get("exitCode") == "0"
+            self._stopping.discard(instance_id)
+            self._apply(instance_id, "stopped" if expected else "error")
+        elif action == "stop":
+            self._apply(instance_id, "stopped")
+        elif action == "destroy" and self._states.get(instance_id) == "running":
+            self._apply(instance_id, "stopped")
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("回写实例状态失败: %s", e)
+
+    async def flush(self) -> None:
+        """将累积的状态变化一次性写入 instances 表"""
+        if not self._dirty:
+            return
+        pending, self._dirty = self._dirty, {}
+        try:
+            await run_db(_write_statuses, pending)
+        except BaseException:
+            # 写入失败：放回待写队列下次重试。期间又有变化的实例以新状态为准，
+            # 已由路由写库（set）或已删除的实例不再回写
+            for instance_id, status in pending.items():
+                if self._states.get(instance_id) == status:
+                    self._dirty.setdefault(instance_id, status)
+            raise
+
+
+def _container_status(state: Optional[str], status: Optional[str]) -> str:
+    """Docker 容器状态 → 实例状态"""
+    if state in ("running", "restarting", "paused"):
+        return "running"
+    if state == "created":
+        return "created"
+    m = _EXITED_RE.search(status or "")
+    if state == "dead" or (m and m.group(1) not in ("0", "137", "143")):
+        return "error"
+    return "stopped"
+
+
+def _write_statuses(pending: dict[str, str]) -> None:
+    db = SessionLocal()
+    try:
+        for inst in db.query(Instance).filter(Instance.id.in_(list(pending))).all():
+            inst.status = pending[inst.id]
+        db.commit()
+    finally:
+        db.close()
+
+
+# 进程内共享实例，由 main.lifespan 启停
+state_cache = ContainerStateCache()
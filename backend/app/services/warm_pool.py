@@ -0,0 +1,138 @@
+"""
+实例预热池：提前占用端口对并生成实例目录与默认配置，创建实例时直接认领，后台按配置数量补齐
+"""
+
+import asyncio
+import json
+import logging
+import shutil
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+from app.database import PROJECT_ROOT
+from app.services.instance_layout import write_instance_files
+from app.services.metrics import GaugeFamily, registry
+from app.services.port_allocator import port_allocator
+
+logger = logging.getLogger(__name__)
+
+# 与 instances/ 同级（同一文件系统，认领时只需重命名目录），不随备份打包
+POOL_DIR = PROJECT_ROOT / "warm-pool"
+SLOT_FILE = "slot.json"
+
+
+class WarmPool:
+    """预热槽位保存在 POOL_DIR/<slot_id>/，slot.json 记录其端口；重启后重新占用这些端口"""
+
+    # 创建槽位失败后的重试间隔（秒）
+    RETRY_INTERVAL = 30.0
+
+    def __init__(self, size: int):
+        self.size = size
+        self._slots: deque[tuple[str, int]] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def ready(self) -> int:
+        return len(self._slots)
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self._load)
+        if self.size > 0:
+            self._task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def claim(self, dest: Path) -> Optional[int]:
+        """将一个槽位目录移动到 dest 并返回其端口（仍处于占用状态）；没有可用槽位时返回 None"""
+        # 目标目录已存在（如删除实例时保留了数据）时走常规创建流程
+        if dest.exists():
+            return None
+        while self._slots:
+            slot_id, port = self._slots.popleft()
+            self._wakeup.set()
+            src = POOL_DIR / slot_id
+            if not port_allocator.is_pinned(port):
+                # 端口已被实例占用（如恢复备份后重建了端口位图），槽位作废
+                await asyncio.to_thread(shutil.rmtree, src, True)
+                continue
+            try:
+                await asyncio.to_thread(_move_slot, src, dest)
+            except OSError as e:
+                logger.warning("认领预热槽位 %s 失败: %s", slot_id, e)
+                port_allocator.release(port)
+                await asyncio.to_thread(shutil.rmtree, src, True)
+                continue
+            logger.info("认领预热槽位 %s（端口 %d）→ %s", slot_id, port, dest.name)
+            return port
+        return None
+
+    def _load(self) -> None:
+        """重新占用磁盘上已有槽位的端口；不完整或端口冲突的槽位直接删除"""
+        self._slots.clear()
+        if not POOL_DIR.exists():
+            return
+        for slot_dir in sorted(POOL_DIR.iterdir()):
+            port = None
+            try:
+                port = json.loads((slot_dir / SLOT_FILE).read_text(encoding="utf-8"))["port"]
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+            if (
+                port is not None
+                and (slot_dir / "data" / "openclaw.json").exists()
+                and port_allocator.pin(port)
+            ):
+                self._slots.append((slot_dir.name, port))
+            else:
+                logger.info("丢弃无效的预热槽位 %s", slot_dir.name)
+                shutil.rmtree(slot_dir, ignore_errors=True)
+
+    async def _refill_loop(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                while len(self._slots) < self.size:
+                    self._slots.append(await asyncio.to_thread(_provision))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("创建预热槽位失败，%.0fs 后重试: %s", self.RETRY_INTERVAL, e)
+                await asyncio.sleep(self.RETRY_INTERVAL)
+                continue
+            await self._wakeup.wait()
+
+
+def _provision() -> tuple[str, int]:
+    """创建一个槽位（同步阻塞）：占用端口对、生成目录与默认配置，最后写入 slot.json 标记完成"""
+    slot_id = uuid.uuid4().hex[:12]
+    slot_dir = POOL_DIR / slot_id
+    port = port_allocator.reserve(pinned=True)
+    try:
+        write_instance_files(slot_dir, port)
+        (slot_dir / SLOT_FILE).write_text(json.dumps({"port": port}), encoding="utf-8")
+    except BaseException:
+        port_allocator.release(port)
+        shutil.rmtree(slot_dir, ignore_errors=True)
+        raise
+    return slot_id, port
+
+
+def _move_slot(src: Path, dest: Path) -> None:
+    (src / SLOT_FILE).unlink(missing_ok=True)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    shutil.move(str(src), str(dest))
+
+
+# 进程内共享实例，由 main.lifespan 启停
+warm_pool = WarmPool(settings.warm_pool_size)
+
+_SLOTS = GaugeFamily("claw_warm_pool_slots", "可认领的预热槽位数")
+registry.add_collector(lambda: _SLOTS.render([((), warm_pool.ready())]))
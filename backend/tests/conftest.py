@@ -0,0 +1,45 @@
+"""
+测试公共夹具
+"""
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import database
+from app.models import Base
+
+
+@pytest.fixture
+def db():
+    """独立的内存数据库会话（不触碰 data/openclaw.db）"""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    session = sessionmaker(autoflush=False, expire_on_commit=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def file_db(tmp_path, monkeypatch):
+    """指向临时文件的 WAL 数据库，替换 app.database 中的路径与引擎"""
+    path = tmp_path / "data" / "openclaw.db"
+    path.parent.mkdir()
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def _wal(dbapi_conn, _record):
+        dbapi_conn.execute("PRAGMA journal_mode=WAL")
+        dbapi_conn.execute("PRAGMA wal_autocheckpoint=0")
+
+    monkeypatch.setattr(database, "DB_PATH", path)
+    monkeypatch.setattr(database, "engine", engine)
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine, expire_on_commit=False)
+    engine.dispose()
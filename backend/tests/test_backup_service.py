@@ -0,0 +1,185 @@
+"""
+备份归档与恢复
+"""
+
+import zipfile
+
+import pytest
+
+from app import database
+from app.models import Backup, Instance, Job
+from app.services.backup_service import BackupService, _copy_tree, _tree_files, _write_zip
+from app.services.port_allocator import port_allocator
+from app.services.state_cache import state_cache
+
+
+@pytest.fixture
+def src(tmp_path):
+    root = tmp_path / "src"
+    (root / "sub").mkdir(parents=True)
+    (root / "a.txt").write_bytes(b"a" * 5000)
+    (root / "sub" / "b.txt").write_bytes(b"b" * 300)
+    return root
+
+
+def _files(root):
+    return [(f"instances/x/{p.relative_to(root).as_posix()}", p) for p in sorted(root.rglob("*")) if p.is_file()]
+
+
+@pytest.mark.parametrize("codec", ["zlib", "none"])
+def test_write_zip_streams_files_and_reports_progress(src, tmp_path, monkeypatch, codec):
+    monkeypatch.setattr("app.services.backup_service.settings.backup_codec", codec)
+    progress = []
+    path = tmp_path / "b.zip"
+
+    total = _write_zip(path, iter(_files(src)), lambda done, total: progress.append((done, total)))
+    assert total == 5300
+    assert progress[-1] == (5300, 5300)
+    assert [d for d, _ in progress] == sorted(d for d, _ in progress)
+    with zipfile.ZipFile(path) as zf:
+        assert zf.read("instances/x/a.txt") == b"a" * 5000
+        assert zf.read("instances/x/sub/b.txt") == b"b" * 300
+    assert not list(tmp_path.glob(".*.tmp"))
+
+
+def test_write_zip_failure_leaves_no_partial_archive(src, tmp_path):
+    path = tmp_path / "b.zip"
+
+    def boom(done, total):
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        _write_zip(path, iter(_files(src)), boom)
+    assert not path.exists()
+    assert not list(tmp_path.glob(".*.tmp"))
+
+
+@pytest.fixture
+def restore_env(db, tmp_path, monkeypatch):
+    """两个实例 a（运行中）与 b，各有一份数据文件；PROJECT_ROOT 指向临时目录"""
+    monkeypatch.setattr(BackupService, "BACKUP_DIR", tmp_path / "backup")
+    monkeypatch.setattr("app.services.backup_service.PROJECT_ROOT", tmp_path)
+    monkeypatch.setattr(state_cache, "_states", {"a": "running", "b": "stopped"})
+    for i, instance_id in enumerate(["a", "b"]):
+        db.add(Instance(id=instance_id, name=instance_id, port=20000 + 2 * i))
+        data = tmp_path / "instances" / instance_id / "data"
+        data.mkdir(parents=True)
+        (data / "openclaw.json").write_text(f'{{"id": "{instance_id}"}}')
+    db.commit()
+
+    service = BackupService(db)
+    calls = []
+
+    async def _stop(instance_id):
+        calls.append(("stop", instance_id))
+
+    async def _start(instance_id):
+        calls.append(("start", instance_id))
+
+    monkeypatch.setattr(service, "_stop_container", _stop)
+    monkeypatch.setattr(service, "_start_container", _start)
+    return service, calls
+
+
+def _instance_files(root):
+    return [(p.relative_to(root).as_posix(), p) for p in sorted((root / "instances").rglob("*")) if p.is_file()]
+
+
+def _save_backup(db, filename):
+    backup = Backup(filename=filename, size=0, instance_count=2)
+    db.add(backup)
+    db.commit()
+    return backup.id
+
+
+async def test_selective_restore_only_touches_selected_instances(restore_env, db, tmp_path):
+    service, calls = restore_env
+    service.store.snapshot("b.json", _instance_files(tmp_path), {})
+    backup_id = _save_backup(db, "b.json")
+    (tmp_path / "instances" / "a" / "data" / "openclaw.json").write_text("changed a")
+    (tmp_path / "instances" / "b" / "data" / "openclaw.json").write_text("changed b")
+
+    assert await service.restore_backup(backup_id, ["a"]) == {"restored": 1, "skipped": 0}
+    assert (tmp_path / "instances" / "a" / "data" / "openclaw.json").read_text() == '{"id": "a"}'
+    assert (tmp_path / "instances" / "b" / "data" / "openclaw.json").read_text() == "changed b"
+    # 只有被恢复且原本在运行的实例被重启
+    assert calls == [("stop", "a"), ("start", "a")]
+
+
+async def test_restore_skips_unchanged_files(restore_env, db, tmp_path):
+    service, calls = restore_env
+    _write_zip(service.BACKUP_DIR / "b.zip", iter(_instance_files(tmp_path)), lambda d, t: None)
+    backup_id = _save_backup(db, "b.zip")
+    (tmp_path / "instances" / "b" / "data" / "openclaw.json").write_text("changed b")
+
+    assert await service.restore_backup(backup_id) == {"restored": 1, "skipped": 1}
+    assert (tmp_path / "instances" / "b" / "data" / "openclaw.json").read_text() == '{"id": "b"}'
+
+
+def test_log_archive_is_left_out_of_backups(src, tmp_path):
+    (src / "logs").mkdir()
+    (src / "logs" / "1.log.gz").write_bytes(b"x")
+    (src / "sub" / "logs").mkdir()
+    (src / "sub" / "logs" / "keep.txt").write_bytes(b"y")
+    assert [a for a, _ in _tree_files(src, "instances/x")] == [
+        "instances/x/a.txt", "instances/x/sub/b.txt", "instances/x/sub/logs/keep.txt",
+    ]
+    _copy_tree(src, tmp_path / "snap", hardlink=True)
+    assert not (tmp_path / "snap" / "logs").exists()
+    assert (tmp_path / "snap" / "sub" / "logs" / "keep.txt").exists()
+
+
+async def test_restore_does_not_overwrite_log_archive(restore_env, db, tmp_path):
+    # 旧备份中包含日志归档分段
+    service, _ = restore_env
+    segment = tmp_path / "instances" / "b" / "logs" / "1.log.gz"
+    segment.parent.mkdir()
+    segment.write_bytes(b"old")
+    _write_zip(service.BACKUP_DIR / "b.zip", iter(_instance_files(tmp_path)), lambda d, t: None)
+    backup_id = _save_backup(db, "b.zip")
+    segment.write_bytes(b"appended")
+
+    assert await service.restore_backup(backup_id) == {"restored": 0, "skipped": 2}
+    assert segment.read_bytes() == b"appended"
+
+
+async def test_restore_rejects_unknown_instances(restore_env, db, tmp_path):
+    service, _ = restore_env
+    service.store.snapshot("b.json", _instance_files(tmp_path), {})
+    backup_id = _save_backup(db, "b.json")
+
+    with pytest.raises(ValueError):
+        await service.restore_backup(backup_id, ["missing"])
+
+
+@pytest.mark.parametrize("mode", ["incremental", "full"])
+async def test_full_restore_replaces_database_but_keeps_jobs(file_db, tmp_path, monkeypatch, mode):
+    monkeypatch.setattr(BackupService, "BACKUP_DIR", tmp_path / "backup")
+    monkeypatch.setattr(BackupService, "STAGING_DIR", tmp_path / "backup" / ".staging")
+    monkeypatch.setattr(BackupService, "INSTANCES_DIR", tmp_path / "instances")
+    monkeypatch.setattr("app.services.backup_service.PROJECT_ROOT", tmp_path)
+    monkeypatch.setattr("app.services.backup_service.DB_PATH", database.DB_PATH)
+    monkeypatch.setattr("app.services.backup_service.settings.backup_strategy", "offline")
+    monkeypatch.setattr("app.services.backup_service.settings.backup_mode", mode)
+    monkeypatch.setattr(port_allocator, "load", lambda: None)
+    monkeypatch.setattr(state_cache, "load", lambda: None)
+
+    session = file_db()
+    session.add(Instance(id="a", name="a", port=20000, status="stopped"))
+    session.commit()
+    backup = await BackupService(session).create_backup()
+    assert not list((tmp_path / "backup" / ".staging").iterdir())
+
+    session.add(Instance(id="b", name="b", port=20002, status="stopped"))
+    session.add(Job(id="restore-job", kind="backup.restore", status="running"))
+    session.commit()
+    session.close()
+
+    session = file_db()
+    result = await BackupService(session).restore_backup(backup.id)
+    assert result["restored"] == 1
+    session = file_db()
+    assert [i.id for i in session.query(Instance).all()] == ["a"]
+    assert [j.id for j in session.query(Job).all()] == ["restore-job"]
+    assert [b.id for b in session.query(Backup).all()] == [backup.id]
+    session.close()
@@ -0,0 +1,140 @@
+"""
+内容寻址块存储：去重、索引复用、还原与垃圾回收
+"""
+
+import json
+import os
+
+import pytest
+
+from app.models import Backup
+from app.services import backup_store
+from app.services.backup_service import BackupService
+from app.services.backup_store import ChunkStore, _compress, _decompress
+
+
+@pytest.fixture
+def store(tmp_path) -> ChunkStore:
+    return ChunkStore(tmp_path / "backup", codec="zlib", workers=2)
+
+
+@pytest.fixture
+def src(tmp_path):
+    root = tmp_path / "src"
+    (root / "sub").mkdir(parents=True)
+    (root / "a.txt").write_bytes(b"hello" * 1000)
+    (root / "sub" / "b.bin").write_bytes(os.urandom(1024))
+    return root
+
+
+def _files(root):
+    return [(p.relative_to(root).as_posix(), p) for p in sorted(root.rglob("*")) if p.is_file()]
+
+
+def _chunk_count(store: ChunkStore) -> int:
+    return sum(1 for _ in store.chunks_dir.glob("*/*"))
+
+
+@pytest.mark.parametrize("codec", ["zlib", "none"])
+def test_compress_roundtrip(codec):
+    for data in (b"", b"x" * 10000, os.urandom(100)):
+        assert _decompress(_compress(codec, data, 6)) == data
+
+
+def test_put_chunk_deduplicates(store):
+    digest, written = store.put_chunk(b"data" * 100)
+    assert written > 0
+    assert store.put_chunk(b"data" * 100) == (digest, 0)
+    assert store.get_chunk(digest) == b"data" * 100
+
+
+def test_snapshot_and_restore_roundtrip(store, src, tmp_path):
+    total, written = store.snapshot("one.json", _files(src), {"created_at": "t"})
+    assert total == 5000 + 1024
+    manifest = store.read_manifest("one.json")
+    assert manifest["created_at"] == "t"
+
+    dest = tmp_path / "dest"
+    for arcname, entry in manifest["files"].items():
+        assert not store.matches(entry, dest / arcname)
+        store.restore_file(entry, dest / arcname)
+        assert store.matches(entry, dest / arcname)
+    assert (dest / "a.txt").read_bytes() == (src / "a.txt").read_bytes()
+    assert (dest / "sub" / "b.bin").read_bytes() == (src / "sub" / "b.bin").read_bytes()
+
+
+def test_second_snapshot_of_unchanged_files_writes_only_manifest(store, src, monkeypatch):
+    store.snapshot("one.json", _files(src), {})
+    chunks = _chunk_count(store)
+
+    # 索引命中的文件不再重新读取与哈希
+    monkeypatch.setattr(store, "put_chunk", lambda data: pytest.fail("unchanged file re-hashed"))
+    _, written = store.snapshot("two.json", _files(src), {})
+    assert _chunk_count(store) == chunks
+    assert written == len(store.manifest_path("two.json").read_bytes())
+
+
+def test_gc_removes_only_unreferenced_chunks(store, src):
+    store.snapshot("one.json", _files(src), {})
+    (src / "a.txt").write_bytes(b"changed")
+    store.snapshot("two.json", _files(src), {})
+    before = _chunk_count(store)
+
+    assert store.gc() == 0
+    store.manifest_path("one.json").unlink()
+    assert store.gc() == 1
+    assert _chunk_count(store) == before - 1
+
+    # 剩余清单仍可完整还原
+    for entry in store.read_manifest("two.json")["files"].values():
+        for digest in entry["chunks"]:
+            assert store.has_chunk(digest)
+    index = json.loads(store.index_path.read_text())
+    assert all(store.has_chunk(c) for v in index.values() for c in v["chunks"])
+
+
+def test_gc_skips_when_a_manifest_is_unreadable(store, src):
+    store.snapshot("one.json", _files(src), {})
+    store.manifest_path("one.json").unlink()
+    store.manifest_path("broken.json").write_text("{not json")
+    assert store.gc() == 0
+    assert _chunk_count(store) > 0
+
+
+def test_unavailable_codec_falls_back_to_zlib(tmp_path, monkeypatch):
+    monkeypatch.setattr(backup_store, "zstandard", None)
+    assert ChunkStore(tmp_path / "b", codec="zstd").codec == "zlib"
+
+
+async def test_delete_backup_defers_gc_to_job_engine(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(BackupService, "BACKUP_DIR", tmp_path / "backup")
+    submitted = []
+
+    async def fake_submit(kind, params, idempotency_key=None):
+        submitted.append(kind)
+        return {}, True
+
+    monkeypatch.setattr("app.services.backup_service.job_manager.submit", fake_submit)
+    service = BackupService(db)
+    service.store.gc = lambda: pytest.fail("gc ran inline on the event loop")
+    service.store.write_manifest("b.json", {"files": {}})
+    db.add(Backup(filename="b.json", size=0, instance_count=0))
+    db.commit()
+
+    await service.delete_backup(1)
+    assert not service.store.manifest_path("b.json").exists()
+    assert submitted == ["backup.gc"]
+
+
+async def test_backups_in_the_same_second_get_distinct_manifests(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(BackupService, "BACKUP_DIR", tmp_path / "backup")
+    monkeypatch.setattr("app.services.backup_service.settings.backup_strategy", "hot")
+    service = BackupService(db)
+    monkeypatch.setattr(service, "_backup_files", lambda snapshots=None, db_snapshot=None: iter(()))
+    monkeypatch.setattr("app.services.backup_service.DB_PATH", tmp_path / "missing.db")
+
+    first = await service.create_backup()
+    second = await service.create_backup()
+    assert first.filename != second.filename
+    assert service.store.manifest_path(first.filename).exists()
+    assert service.store.manifest_path(second.filename).exists()
@@ -0,0 +1,85 @@
+"""
+批量实例操作：实例选择规则、分块执行与失败回退
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import Instance
+from app.services.batch_service import BatchService
+from app.services.instance_service import InstanceService
+from app.services.state_cache import state_cache
+
+
+@pytest.fixture
+def service(db, monkeypatch):
+    for i, (instance_id, status) in enumerate(
+        [("a", "running"), ("b", "stopped"), ("c", "stopped"), ("d", "running")]
+    ):
+        db.add(Instance(id=instance_id, name=instance_id, port=20000 + 2 * i, status=status))
+    db.commit()
+    # 列表接口展示的状态取自缓存：c 已被 Docker 事件更新为 running，数据库尚未回写
+    monkeypatch.setattr(
+        state_cache, "_states", {"a": "running", "b": "stopped", "c": "running", "d": "running"}
+    )
+
+    async def _noop(self, instance_ids=None):
+        return None
+
+    monkeypatch.setattr(InstanceService, "_regenerate_compose", _noop)
+    return BatchService(db)
+
+
+def _ids(instances: list[Instance]) -> list[str]:
+    return [inst.id for inst in instances]
+
+
+def test_select_empty_ids_selects_nothing(service):
+    assert service.select([], None) == []
+    assert service.select([], "running") == []
+
+
+def test_select_all_only_without_filters(service):
+    assert _ids(service.select(None, None)) == ["a", "b", "c", "d"]
+    assert _ids(service.select(["b", "x"], None)) == ["b"]
+
+
+def test_select_status_uses_displayed_state(service):
+    assert _ids(service.select(None, "running")) == ["a", "c", "d"]
+    assert _ids(service.select(None, "stopped")) == ["b"]
+    assert _ids(service.select(["a", "b", "c"], "running")) == ["a", "c"]
+
+
+async def test_run_falls_back_to_single_instances_on_chunk_failure(service, monkeypatch):
+    monkeypatch.setattr("app.services.batch_service.settings.batch_chunk_size", 2)
+    calls = []
+
+    async def fake_call(action, ids):
+        calls.append(list(ids))
+        if "b" in ids:
+            raise RuntimeError("boom")
+
+    monkeypatch.setattr(service, "_call", fake_call)
+    instances = service.select(["a", "b", "c"], None)
+
+    results = await service.run("start", instances)
+    assert results == {"a": None, "b": "boom", "c": None}
+    # 失败的块逐个重试，成功的块只调用一次
+    assert calls.count(["a", "b"]) == 1
+    assert ["a"] in calls and ["b"] in calls
+    assert calls.count(["c"]) == 1
+    assert {i.id: i.status for i in instances} == {"a": "running", "b": "error", "c": "running"}
+    assert state_cache.get("b") == "error"
+
+
+async def test_run_rejects_unknown_action(service):
+    with pytest.raises(ValueError):
+        await service.run("pause", service.select(None, None))
+
+
+@pytest.mark.parametrize("path", ["/api/instances:batch", "/api/instances:patch-config"])
+def test_route_requires_explicit_selector(path):
+    body = {"action": "stop"} if path.endswith("batch") else {"patch": {"a": 1}}
+    resp = TestClient(app).post(path, json=body)
+    assert resp.status_code == 400
@@ -0,0 +1,131 @@
+"""
+docker-compose.yml 增量渲染
+"""
+
+import pytest
+
+from app.config import settings
+from app.models import Instance
+from app.services import instance_service
+from app.services.compose_renderer import (
+    SHARED_NETWORK,
+    ComposeRenderer,
+    project_compose_path,
+    project_name,
+)
+from app.services.instance_service import InstanceService
+
+
+@pytest.fixture
+def renderer(tmp_path) -> ComposeRenderer:
+    return ComposeRenderer(tmp_path / "docker-compose.yml", tmp_path / "docker-compose.template.yml")
+
+
+def test_render_writes_only_when_content_changes(renderer):
+    assert renderer.render([("a", 18789), ("b", 18791)]) is True
+    mtime = renderer.compose_path.stat().st_mtime_ns
+    assert renderer.render([("a", 18789), ("b", 18791)]) is False
+    assert renderer.compose_path.stat().st_mtime_ns == mtime
+
+    assert renderer.render([("a", 18789), ("b", 18793)]) is True
+    content = renderer.compose_path.read_text()
+    assert '"18793:18789"' in content
+    assert '"18791:18789"' not in content
+
+
+def test_render_drops_removed_services(renderer):
+    renderer.render([("a", 18789), ("b", 18791)])
+    renderer.render([("a", 18789)])
+    content = renderer.compose_path.read_text()
+    assert '"a":' in content
+    assert '"b":' not in content
+
+
+def test_render_empty_fleet_is_valid_mapping(renderer):
+    renderer.render([])
+    assert "services:\n  {}" in renderer.compose_path.read_text()
+
+
+def test_numeric_ids_are_quoted(renderer):
+    renderer.render([("1", 18789)])
+    assert '  "1":\n' in renderer.compose_path.read_text()
+
+
+def test_existing_identical_file_is_not_rewritten(renderer, tmp_path):
+    renderer.render([("a", 18789)])
+    mtime = renderer.compose_path.stat().st_mtime_ns
+
+    # 新进程（缓存为空）渲染出相同内容时不写文件
+    fresh = ComposeRenderer(renderer.compose_path, renderer.template_path)
+    assert fresh.render([("a", 18789)]) is False
+    assert renderer.compose_path.stat().st_mtime_ns == mtime
+
+
+def test_template_change_rerenders(renderer):
+    renderer.render([("a", 18789)])
+    before = renderer.service_hash("a")
+
+    renderer.template_path.write_text("x-extra: true\nservices:\n{services}\n", encoding="utf-8")
+    assert renderer.render([("a", 18789)]) is True
+    assert renderer.compose_path.read_text().startswith("x-extra: true\n")
+    assert renderer.service_hash("a") != before
+
+
+def test_invalidate_forces_comparison_with_disk(renderer):
+    renderer.render([("a", 18789)])
+    renderer.compose_path.write_text("tampered", encoding="utf-8")
+    assert renderer.render([("a", 18789)]) is False
+
+    renderer.invalidate()
+    assert renderer.render([("a", 18789)]) is True
+    assert renderer.compose_path.read_text() != "tampered"
+
+
+@pytest.fixture
+def project_root(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.services.compose_renderer.PROJECT_ROOT", tmp_path)
+    return tmp_path
+
+
+def test_project_name_is_compose_safe():
+    assert project_name("web-1") == "openclaw-web-1"
+    upper, lower = project_name("Web"), project_name("web")
+    assert upper != lower
+    assert upper == upper.lower()
+
+
+def test_render_project_writes_single_service_on_shared_network(renderer, project_root):
+    assert renderer.render_project("a", 18789) is True
+    content = project_compose_path("a").read_text()
+    assert content.startswith("name: openclaw-a\nservices:\n")
+    assert "- ./data:/home/node/.openclaw" in content
+    assert f"name: {SHARED_NETWORK}\n    external: true" in content
+    assert renderer.render_project("a", 18789) is False
+
+
+def test_render_project_honours_template(renderer, project_root):
+    renderer.render_project("a", 18789)
+    before = renderer.service_hash("a")
+
+    renderer.template_path.write_text("x-extra: true\nservices:\n{services}\n", encoding="utf-8")
+    assert renderer.render_project("a", 18789) is True
+    assert "x-extra: true\nservices:\n" in project_compose_path("a").read_text()
+    assert renderer.service_hash("a") != before
+
+
+async def test_per_instance_layout_renders_only_affected_projects(db, monkeypatch):
+    for i, instance_id in enumerate(["a", "b", "c"]):
+        db.add(Instance(id=instance_id, name=instance_id, port=20000 + 2 * i))
+    db.commit()
+    rendered = []
+    monkeypatch.setattr(settings, "compose_layout", "per_instance")
+    monkeypatch.setattr(
+        instance_service.compose_renderer, "render_project", lambda i, p: rendered.append((i, p))
+    )
+
+    await InstanceService(db)._regenerate_compose(["b"])
+    assert rendered == [("b", 20002)]
+
+    rendered.clear()
+    await InstanceService(db)._regenerate_compose()
+    assert sorted(rendered) == [("a", 20000), ("b", 20002), ("c", 20004)]
@@ -0,0 +1,141 @@
+"""
+实例配置解析缓存与 merge-patch 写回
+"""
+
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+from app.main import app
+from app.models import Instance
+from app.services import config_cache as config_cache_module
+from app.services.config_cache import ConfigCache, merge_patch
+
+
+@pytest.fixture
+def cache() -> ConfigCache:
+    return ConfigCache(maxsize=2)
+
+
+@pytest.fixture
+def path(tmp_path):
+    p = tmp_path / "openclaw.json"
+    p.write_text('{\n  // 注释\n  gateway: { auth: { token: "t1" } },\n}\n', encoding="utf-8")
+    return p
+
+
+def _touch(path, ns_offset: int) -> None:
+    """同一时间粒度内的写入 mtime 可能不变，测试中显式推进 mtime"""
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + ns_offset))
+
+
+def test_load_parses_json5_and_reuses_cached_object(cache, path, monkeypatch):
+    cfg = cache.load(path)
+    assert cfg["gateway"]["auth"]["token"] == "t1"
+
+    monkeypatch.setattr(config_cache_module.pyjson5, "loads", lambda s: pytest.fail("re-parsed"))
+    assert cache.load(path) is cfg
+
+
+def test_load_reparses_after_file_changes(cache, path):
+    cache.load(path)
+    path.write_text('{"gateway": {"auth": {"token": "t2"}}}', encoding="utf-8")
+    _touch(path, 1_000_000)
+    assert cache.load(path)["gateway"]["auth"]["token"] == "t2"
+
+
+def test_load_missing_file_raises_and_drops_entry(cache, path):
+    cache.load(path)
+    path.unlink()
+    with pytest.raises(FileNotFoundError):
+        cache.load(path)
+    assert path not in cache._entries
+
+
+def test_lru_evicts_least_recently_used(cache, tmp_path):
+    paths = []
+    for name in ["a", "b", "c"]:
+        p = tmp_path / f"{name}.json"
+        p.write_text("{}", encoding="utf-8")
+        paths.append(p)
+    cache.load(paths[0])
+    cache.load(paths[1])
+    cache.load(paths[0])
+    cache.load(paths[2])
+    assert list(cache._entries) == [paths[0], paths[2]]
+
+
+def test_non_object_config_is_rejected(cache, tmp_path):
+    p = tmp_path / "list.json"
+    p.write_text("[1, 2]", encoding="utf-8")
+    with pytest.raises(ValueError):
+        cache.load(p)
+
+
+def test_gateway_token(cache, path, monkeypatch):
+    monkeypatch.setattr(
+        config_cache_module, "instance_config_path", lambda instance_id: (path, path.with_name("x"))
+    )
+    assert cache.gateway_token("a") == "t1"
+    path.write_text("{broken", encoding="utf-8")
+    _touch(path, 1_000_000)
+    assert cache.gateway_token("a") is None
+
+
+
+def test_merge_patch_follows_rfc7396():
+    target = {"a": {"b": 1, "c": 2}, "d": [1], "e": 1}
+    assert merge_patch(target, {"a": {"b": None, "x": 3}, "d": [2], "e": None}) == {
+        "a": {"c": 2, "x": 3},
+        "d": [2],
+    }
+    assert target == {"a": {"b": 1, "c": 2}, "d": [1], "e": 1}
+    assert merge_patch(target, ["replaced"]) == ["replaced"]
+
+
+def test_patch_writes_only_on_change(cache, path):
+    assert cache.patch(path, {"gateway": {"auth": {"token": "t1"}}}) is False
+    assert "// 注释" in path.read_text(encoding="utf-8")
+
+    assert cache.patch(path, {"gateway": {"auth": {"token": "t2"}}}) is True
+    assert cache.load(path)["gateway"]["auth"]["token"] == "t2"
+
+
+def test_write_and_patch_share_the_file_lock(cache, path, monkeypatch):
+    held = []
+    real_write = config_cache_module.atomic_write_text
+
+    def _write(p, content):
+        held.append(cache._write_lock(p).locked())
+        real_write(p, content)
+
+    monkeypatch.setattr(config_cache_module, "atomic_write_text", _write)
+    cache.write(path, "{\n  // 保留注释\n  a: 1,\n}\n")
+    cache.patch(path, {"b": 2})
+    assert held == [True, True]
+    assert cache.load(path) == {"a": 1, "b": 2}
+
+
+def test_put_config_writes_through_cache(tmp_path, monkeypatch, db):
+    monkeypatch.setattr(config_cache_module, "PROJECT_ROOT", tmp_path)
+    db.add(Instance(id="a", name="a", port=20000))
+    db.commit()
+    # 只有 config/ 下的旧配置时，PUT 应写回读取时使用的同一文件
+    legacy = tmp_path / "instances" / "a" / "config" / "openclaw.json"
+    legacy.parent.mkdir(parents=True)
+    legacy.write_text("{}", encoding="utf-8")
+    written = []
+    monkeypatch.setattr(
+        config_cache_module.config_cache, "write", lambda p, content: written.append((p, content))
+    )
+
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        resp = TestClient(app).put("/api/instances/a/config", json={"content": "{a: 1}"})
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+    assert resp.status_code == 200
+    assert written == [(legacy, "{a: 1}")]
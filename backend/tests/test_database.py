@@ -0,0 +1,98 @@
+"""
+数据库快照与还原：在线备份包含 WAL 中的事务，原地还原时保留 jobs 表且不影响已打开的连接
+"""
+
+import sqlite3
+from contextlib import closing
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import database
+from app.models import Base, Instance, Job
+
+
+def _rows(path, sql):
+    with closing(sqlite3.connect(path)) as conn:
+        return conn.execute(sql).fetchall()
+
+
+def test_snapshot_includes_uncheckpointed_wal_rows(file_db, tmp_path):
+    session = file_db()
+    session.add(Instance(id="a", name="a", port=20000))
+    session.commit()
+    # 连接保持打开，事务仍只在 -wal 中
+    assert database.DB_PATH.with_name("openclaw.db-wal").stat().st_size > 0
+
+    dest = tmp_path / "snap.db"
+    database.snapshot_database(dest)
+    assert _rows(dest, "SELECT id FROM instances") == [("a",)]
+    session.close()
+
+
+def test_restore_keeps_current_jobs(file_db, tmp_path):
+    session = file_db()
+    session.add(Instance(id="live", name="live", port=20000))
+    session.add(Job(id="restore-job", kind="backup.restore", status="running"))
+    session.commit()
+    session.close()
+
+    # 备份中的数据库：不同的实例，以及一条备份时仍在运行的旧任务
+    src = tmp_path / "backup.db"
+    backup_engine = create_engine(f"sqlite:///{src}")
+    Base.metadata.create_all(backup_engine)
+    with sessionmaker(bind=backup_engine)() as backup_session:
+        backup_session.add(Instance(id="old", name="old", port=20002))
+        backup_session.add(Job(id="stale-job", kind="backup.create", status="running"))
+        backup_session.commit()
+    backup_engine.dispose()
+
+    database.restore_database(src)
+    session = file_db()
+    assert [i.id for i in session.query(Instance).all()] == ["old"]
+    assert [(j.id, j.status) for j in session.query(Job).all()] == [("restore-job", "running")]
+    session.close()
+
+
+def test_restore_migrates_backups_without_jobs_table(file_db, tmp_path):
+    session = file_db()
+    session.add(Job(id="restore-job", kind="backup.restore", status="running"))
+    session.commit()
+    session.close()
+
+    src = tmp_path / "legacy.db"
+    with closing(sqlite3.connect(src)) as conn:
+        conn.execute("CREATE TABLE instances (id VARCHAR PRIMARY KEY, name VARCHAR, port INTEGER)")
+        conn.execute("INSERT INTO instances VALUES ('old', 'old', 20002)")
+        conn.commit()
+
+    database.restore_database(src)
+    session = file_db()
+    assert [i.id for i in session.query(Instance).all()] == ["old"]
+    assert [j.id for j in session.query(Job).all()] == ["restore-job"]
+    session.close()
+
+
+def test_restore_in_place_keeps_open_connections_working(file_db, tmp_path):
+    src = tmp_path / "backup.db"
+    with closing(sqlite3.connect(src)) as conn:
+        conn.execute("CREATE TABLE instances (id VARCHAR PRIMARY KEY, name VARCHAR, port INTEGER)")
+        conn.execute("INSERT INTO instances VALUES ('old', 'old', 20002)")
+        conn.commit()
+
+    # 恢复期间持有连接的会话（如状态回写、任务进度）
+    session = file_db()
+    session.add(Instance(id="live", name="live", port=20000))
+    session.commit()
+    session.query(Instance).all()
+
+    database.restore_database(src)
+    session.add(Job(id="after", kind="backup.restore", status="running"))
+    session.commit()
+    session.close()
+
+    # 写入落在同一个数据库文件中，没有写到已被删除的旧文件
+    path = database.DB_PATH
+    assert _rows(path, "SELECT id FROM instances") == [("old",)]
+    assert _rows(path, "SELECT id FROM jobs") == [("after",)]
+    assert path.with_name("openclaw.db-wal").exists()
@@ -0,0 +1,169 @@
+"""
+Docker Engine API 客户端：请求经 unix socket 转发到（伪造的）守护进程，多路复用流的拆帧
+"""
+
+import asyncio
+import json
+import struct
+
+import pytest
+
+from app.services import docker_service
+from app.services.compose_renderer import SERVICE_HASH_LABEL, ComposeRenderer
+from app.services.docker_api import DockerAPIClient, DockerAPIError, _frames
+
+
+class FakeDaemon:
+    """最小的 HTTP/1.1 服务端：记录收到的请求，按 (method, path) 返回预设响应，支持 keep-alive"""
+
+    def __init__(self):
+        self.requests: list[tuple[str, str, bytes]] = []
+        self.routes: dict[tuple[str, str], tuple[int, bytes]] = {}
+        self.connections = 0
+
+    def route(self, method: str, path: str, status: int = 200, body=b"") -> None:
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.routes[(method, path)] = (status, body)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    return
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                method, target, _ = request_line.split(" ", 2)
+                headers = {
+                    k.strip().lower(): v.strip()
+                    for k, v in (line.split(":", 1) for line in header_lines if ":" in line)
+                }
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                self.requests.append((method, target, body))
+                path = target.split("?", 1)[0]
+                status, payload = self.routes.get((method, path), (404, b'{"message": "not found"}'))
+                writer.write(
+                    f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1") + payload
+                )
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+@pytest.fixture
+async def daemon(tmp_path):
+    fake = FakeDaemon()
+    socket_path = str(tmp_path / "docker.sock")
+    server = await asyncio.start_unix_server(fake.handle, socket_path)
+    client = DockerAPIClient(socket_path, api_version="v1.41", max_connections=2, timeout=5)
+    yield fake, client
+    await client.aclose()
+    server.close()
+    await server.wait_closed()
+
+
+def _frame(kind: int, payload: bytes) -> bytes:
+    return struct.pack(">BxxxI", kind, len(payload)) + payload
+
+
+async def _chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+async def _collect(*parts: bytes) -> list[tuple[int, bytes]]:
+    return [frame async for frame in _frames(_chunks(*parts))]
+
+
+async def test_inspect_forwards_versioned_path(daemon):
+    fake, client = daemon
+    fake.route("GET", "/v1.41/containers/openclaw-a/json", body={"Id": "abc"})
+
+    assert await client.inspect_container("openclaw-a") == {"Id": "abc"}
+    assert fake.requests[0][:2] == ("GET", "/v1.41/containers/openclaw-a/json")
+
+
+async def test_inspect_missing_container_returns_none(daemon):
+    _, client = daemon
+    assert await client.inspect_container("openclaw-missing") is None
+
+
+async def test_error_status_raises_with_daemon_message(daemon):
+    fake, client = daemon
+    fake.route("POST", "/v1.41/containers/openclaw-a/start", 500, {"message": "boom"})
+
+    with pytest.raises(DockerAPIError) as exc:
+        await client.start_container("openclaw-a")
+    assert exc.value.status_code == 500
+    assert str(exc.value) == "boom"
+
+
+async def test_list_containers_sends_name_filter(daemon):
+    fake, client = daemon
+    fake.route("GET", "/v1.41/containers/json", body=[{"Names": ["/openclaw-a"]}])
+
+    assert await client.list_containers("openclaw-", all=False) == [{"Names": ["/openclaw-a"]}]
+    target = fake.requests[0][1]
+    assert "all=false" in target
+    assert "openclaw-" in target
+
+
+async def test_requests_reuse_keepalive_connection(daemon):
+    fake, client = daemon
+    fake.route("GET", "/v1.41/info", body={"ServerVersion": "27.0"})
+
+    for _ in range(5):
+        assert (await client.info())["ServerVersion"] == "27.0"
+    assert fake.connections == 1
+
+
+async def test_exec_run_demultiplexes_stdout_and_stderr(daemon):
+    fake, client = daemon
+    fake.route("POST", "/v1.41/containers/openclaw-a/exec", 201, {"Id": "e1"})
+    fake.route(
+        "POST",
+        "/v1.41/exec/e1/start",
+        body=_frame(1, b"hello ") + _frame(2, b"oops") + _frame(1, b"world"),
+    )
+    fake.route("GET", "/v1.41/exec/e1/json", body={"ExitCode": 3})
+
+    assert await client.exec_run("openclaw-a", ["echo"]) == (3, "hello world", "oops")
+    create_body = json.loads(fake.requests[0][2])
+    assert create_body["Cmd"] == ["echo"]
+    assert create_body["Tty"] is False
+
+
+async def test_frames_reassembles_frames_split_across_chunks():
+    data = _frame(1, b"abc") + _frame(2, b"") + _frame(1, b"x" * 100)
+    # 逐字节送入：帧头与负载都被拆开
+    frames = await _collect(*(data[i:i + 1] for i in range(len(data))))
+    assert frames == [(1, b"abc"), (2, b""), (1, b"x" * 100)]
+
+
+async def test_frames_many_frames_in_one_chunk_and_trailing_partial():
+    data = b"".join(_frame(1, str(i).encode()) for i in range(1000))
+    frames = await _collect(data + _frame(2, b"incomplete")[:-3])
+    assert len(frames) == 1000
+    assert frames[-1] == (1, b"999")
+
+
+def test_up_to_date_requires_matching_service_hash(tmp_path, monkeypatch):
+    renderer = ComposeRenderer(tmp_path / "docker-compose.yml", tmp_path / "template.yml")
+    monkeypatch.setattr(docker_service, "compose_renderer", renderer)
+
+    assert not docker_service._up_to_date("a", {"Config": {"Labels": {}}})
+    renderer.render([("a", 18789)])
+    expected = renderer.service_hash("a")
+    assert f"{SERVICE_HASH_LABEL}={expected}" in (tmp_path / "docker-compose.yml").read_text()
+
+    assert docker_service._up_to_date("a", {"Config": {"Labels": {SERVICE_HASH_LABEL: expected}}})
+    assert not docker_service._up_to_date("a", None)
+    assert not docker_service._up_to_date("a", {"Config": {"Labels": {}}})
+
+    # 端口变化后旧容器不再是最新的，需经 compose 重建
+    renderer.render([("a", 18791)])
+    assert renderer.service_hash("a") != expected
+    assert not docker_service._up_to_date("a", {"Config": {"Labels": {SERVICE_HASH_LABEL: expected}}})
@@ -0,0 +1,90 @@
+"""
+Docker 守护进程健康探测缓存
+"""
+
+import asyncio
+
+import pytest
+
+from app.services import docker_health as docker_health_module
+from app.services.docker_health import DockerHealthProbe
+
+_sleep = asyncio.sleep
+
+
+class FakeDocker:
+    """docker info 的替身：记录调用次数，可切换为失败"""
+
+    calls = 0
+    error = None
+
+    async def info(self, timeout=None):
+        FakeDocker.calls += 1
+        await _sleep(0.01)
+        if FakeDocker.error is not None:
+            raise FakeDocker.error
+        return {"ServerVersion": "27.0", "Containers": 3, "NCPU": 8}
+
+
+@pytest.fixture
+def probe(monkeypatch):
+    FakeDocker.calls, FakeDocker.error = 0, None
+    monkeypatch.setattr(docker_health_module, "DockerService", FakeDocker)
+    events = []
+    monkeypatch.setattr(
+        docker_health_module.event_bus, "publish", lambda kind, data: events.append((kind, data["running"]))
+    )
+    p = DockerHealthProbe()
+    p.events = events
+    return p
+
+
+async def test_status_probes_once_then_serves_cache(probe):
+    status = await probe.status()
+    assert status["running"] is True
+    assert status["details"]["server_version"] == "27.0"
+    await probe.status()
+    assert FakeDocker.calls == 1
+
+
+async def test_concurrent_status_calls_share_one_probe(probe):
+    results = await asyncio.gather(*(probe.status() for _ in range(5)))
+    assert all(r["running"] for r in results)
+    assert FakeDocker.calls == 1
+
+
+async def test_status_reprobes_after_ttl(probe, monkeypatch):
+    monkeypatch.setattr(docker_health_module.settings, "docker_health_ttl", 0.0)
+    await probe.status()
+    probe.checked_at -= 1
+    await probe.status()
+    assert FakeDocker.calls == 2
+
+
+async def test_failure_is_cached_and_transitions_are_published(probe):
+    assert await probe.probe() is True
+    FakeDocker.error = OSError("socket gone")
+    assert await probe.probe() is False
+    assert probe.snapshot()["error"] == "socket gone"
+    # 状态未变化时不重复推送
+    assert await probe.probe() is False
+    FakeDocker.error = None
+    assert await probe.probe() is True
+    assert probe.events == [("system.health", True), ("system.health", False), ("system.health", True)]
+
+
+async def test_loop_backs_off_while_daemon_is_down(probe, monkeypatch):
+    monkeypatch.setattr(docker_health_module.settings, "docker_health_interval", 1.0)
+    monkeypatch.setattr(docker_health_module.settings, "docker_health_max_backoff", 4.0)
+    FakeDocker.error = OSError("down")
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+        if len(delays) >= 4:
+            raise asyncio.CancelledError
+
+    monkeypatch.setattr(docker_health_module.asyncio, "sleep", fake_sleep)
+    with pytest.raises(asyncio.CancelledError):
+        await probe._loop()
+    assert delays == [2.0, 4.0, 4.0, 4.0]
@@ -0,0 +1,83 @@
+"""
+事件总线：回放缓冲、Last-Event-ID 续传与 SSE 输出
+"""
+
+import json
+
+import pytest
+
+from app.routers import system
+from app.services.event_bus import EventBus
+
+
+@pytest.fixture
+def bus(monkeypatch) -> EventBus:
+    b = EventBus(replay_size=3, queue_size=2)
+    monkeypatch.setattr(system, "event_bus", b)
+    return b
+
+
+async def test_subscriber_receives_live_events_by_type(bus):
+    async with bus.subscribe(types=("instance.",)) as sub:
+        assert sub.backlog == []
+        bus.publish("backup.created", {"id": 1})
+        bus.publish("instance.status", {"id": "a"})
+        event = await sub.get()
+        assert (event.type, event.data) == ("instance.status", {"id": "a"})
+    assert bus.subscriber_count() == 0
+
+
+async def test_last_event_id_replays_missed_events(bus):
+    for i in range(3):
+        bus.publish("instance.status", {"n": i})
+    async with bus.subscribe(last_event_id=1) as sub:
+        assert [e.id for e in sub.backlog] == [2, 3]
+    # 已经是最新：无需补发
+    async with bus.subscribe(last_event_id=3) as sub:
+        assert sub.backlog == []
+
+
+async def test_replay_gap_requires_resync(bus):
+    for i in range(5):
+        bus.publish("instance.status", {"n": i})
+    # 1、2 已滚出缓冲（保留 3..5），从 2 之后仍可补齐，从 1 之后不行
+    async with bus.subscribe(last_event_id=2) as sub:
+        assert [e.id for e in sub.backlog] == [3, 4, 5]
+    async with bus.subscribe(last_event_id=1) as sub:
+        assert sub.backlog is None
+    # 编号超前（服务已重启，计数从头开始）
+    async with bus.subscribe(last_event_id=99) as sub:
+        assert sub.backlog is None
+
+
+async def test_slow_subscriber_is_disconnected(bus):
+    async with bus.subscribe() as sub:
+        for i in range(3):
+            bus.publish("instance.status", {"n": i})
+        assert await sub.get() is None
+
+
+async def _frames(response, count):
+    it = response.body_iterator
+    try:
+        return [await it.__anext__() for _ in range(count)]
+    finally:
+        await it.aclose()
+
+
+async def test_sse_stream_resumes_from_last_event_id(bus):
+    bus.publish("instance.status", {"id": "a"})
+    bus.publish("backup.created", {"id": 1})
+    bus.publish("instance.status", {"id": "b"})
+
+    response = await system.stream_events(last_event_id=1, since=None, types="instance.")
+    frames = await _frames(response, 2)
+    assert frames[0] == "retry: 3000\n\n"
+    head, _, payload = frames[1].rpartition("data: ")
+    assert head == "id: 3\nevent: instance.status\n"
+    assert json.loads(payload)["id"] == "b"
+
+
+async def test_sse_stream_sends_resync_when_replay_is_impossible(bus):
+    response = await system.stream_events(last_event_id=None, since=42, types=None)
+    assert (await _frames(response, 2))[1] == "event: resync\ndata: {}\n\n"
@@ -0,0 +1,121 @@
+"""
+网关 RPC 客户端：握手、连接复用、断线重试与 CLI 回退
+"""
+
+import json
+
+import pytest
+from websockets.asyncio.server import serve
+
+from app.config import settings
+from app.services import gateway_client
+from app.services.gateway_client import GatewayPool
+
+
+class FakeGateway:
+    """按方法名应答的网关：handlers 返回 payload，返回 ... 表示不应答，未注册的方法返回错误"""
+
+    def __init__(self):
+        self.handlers = {"connect": lambda p: {"protocol": p["maxProtocol"]}}
+        self.received = []
+        self.connections = 0
+        self.port = None
+
+    async def _handle(self, ws):
+        self.connections += 1
+        async for raw in ws:
+            frame = json.loads(raw)
+            self.received.append(frame["method"])
+            handler = self.handlers.get(frame["method"])
+            if handler is None:
+                reply = {"ok": False, "error": {"code": "INVALID_REQUEST", "message": "unknown method"}}
+            else:
+                payload = handler(frame["params"])
+                if payload is ...:
+                    continue
+                reply = {"ok": True, "payload": payload}
+            await ws.send(json.dumps({"type": "res", "id": frame["id"], **reply}))
+
+
+class FakeDocker:
+    calls = []
+
+    async def devices_list(self, instance_id, token):
+        self.calls.append(("list", instance_id))
+        return '{"pending": [], "paired": ["cli"]}'
+
+    async def devices_approve(self, instance_id, request_id, token):
+        self.calls.append(("approve", request_id))
+
+
+@pytest.fixture
+async def gateway(monkeypatch):
+    monkeypatch.setattr(settings, "gateway_timeout", 0.2)
+    monkeypatch.setattr(gateway_client, "DockerService", FakeDocker)
+    FakeDocker.calls = []
+    fake = FakeGateway()
+    async with serve(fake._handle, "127.0.0.1", 0) as server:
+        fake.port = server.sockets[0].getsockname()[1]
+        yield fake
+
+
+@pytest.fixture
+async def pool():
+    p = GatewayPool()
+    yield p
+    await p.close()
+
+
+async def test_reuses_connection_and_caches_devices(gateway, pool):
+    gateway.handlers[gateway_client.METHOD_DEVICES_LIST] = lambda p: {"pending": [{"requestId": "r1"}]}
+    first = await pool.devices_list("a", gateway.port, "t")
+    assert first == {"pending": [{"requestId": "r1"}]}
+    assert await pool.devices_list("a", gateway.port, "t") == first
+    assert gateway.received == ["connect", gateway_client.METHOD_DEVICES_LIST]
+
+    # 配对事件使缓存失效，复用同一条连接
+    pool.on_event("a", "device.pair.requested")
+    await pool.devices_list("a", gateway.port, "t")
+    assert gateway.connections == 1
+    assert FakeDocker.calls == []
+
+
+async def test_reconnects_when_reused_connection_was_closed(gateway, pool):
+    gateway.handlers[gateway_client.METHOD_DEVICES_APPROVE] = lambda p: {}
+    await pool.devices_approve("a", gateway.port, "t", "r1")
+    conn = pool._connections["a"]
+    await conn._ws.close()
+    await pool.devices_approve("a", gateway.port, "t", "r2")
+    assert gateway.connections == 2
+    assert gateway.received.count(gateway_client.METHOD_DEVICES_APPROVE) == 2
+    assert FakeDocker.calls == []
+
+
+async def test_timeout_after_send_is_not_retried(gateway, pool):
+    gateway.handlers[gateway_client.METHOD_DEVICES_APPROVE] = lambda p: ...
+    with pytest.raises(RuntimeError, match="超时"):
+        await pool.devices_approve("a", gateway.port, "t", "r1")
+    # 批准帧只发送一次，也不经 CLI 重复批准
+    assert gateway.received.count(gateway_client.METHOD_DEVICES_APPROVE) == 1
+    assert FakeDocker.calls == []
+
+
+async def test_unknown_method_falls_back_to_cli(gateway, pool):
+    assert await pool.devices_list("a", gateway.port, "t") == {"pending": [], "paired": ["cli"]}
+    await pool.devices_approve("a", gateway.port, "t", "r1")
+    assert FakeDocker.calls == [("list", "a"), ("approve", "r1")]
+
+
+async def test_unreachable_gateway_falls_back_to_cli(gateway, pool):
+    async with serve(lambda ws: None, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+    await pool.devices_approve("a", port, "t", "r1")
+    assert FakeDocker.calls == [("approve", "r1")]
+
+
+async def test_handshake_timeout_falls_back_to_cli(gateway, pool):
+    # 握手超时时业务请求尚未发出，可以安全回退
+    gateway.handlers["connect"] = lambda p: ...
+    await pool.devices_approve("a", gateway.port, "t", "r1")
+    assert FakeDocker.calls == [("approve", "r1")]
+    assert gateway.received == ["connect"]
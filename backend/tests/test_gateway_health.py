@@ -0,0 +1,71 @@
+"""
+网关健康探测：HTTP 探测需收到协议响应，docker-proxy 式的“能连不能用”端口不算就绪
+"""
+
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services.gateway_health import GatewayHealthMonitor
+from app.services.state_cache import state_cache
+
+
+async def _serve(reply: bytes):
+    """reply 为空时模拟 docker-proxy：接受连接后立即断开"""
+
+    async def handle(reader, writer):
+        if reply:
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(reply)
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def _http(status: str) -> bytes:
+    return f"HTTP/1.1 {status}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode()
+
+
+@pytest.fixture
+async def monitor(monkeypatch):
+    monkeypatch.setattr(settings, "gateway_host", "127.0.0.1")
+    monkeypatch.setattr(settings, "gateway_probe_timeout", 1.0)
+    monkeypatch.setattr(state_cache, "_states", {"a": "running"})
+    m = GatewayHealthMonitor()
+    yield m
+    await m.stop()
+
+
+def test_http_probe_is_the_default():
+    assert type(settings).model_fields["gateway_probe_mode"].default == "http"
+
+
+async def test_http_probe_requires_a_response(monitor):
+    server, port = await _serve(b"")
+    async with server:
+        assert (await monitor.check("a", port))["up"] is False
+    for status, up in [("200 OK", True), ("404 Not Found", True), ("503 Service Unavailable", False)]:
+        server, port = await _serve(_http(status))
+        async with server:
+            assert (await monitor.check("a", port))["up"] is up, status
+
+
+async def test_tcp_probe_only_checks_the_port(monitor, monkeypatch):
+    monkeypatch.setattr(settings, "gateway_probe_mode", "tcp")
+    server, port = await _serve(b"")
+    async with server:
+        assert (await monitor.check("a", port))["up"] is True
+
+
+async def test_wait_ready_fails_fast_when_container_exits(monitor, monkeypatch):
+    monkeypatch.setattr(GatewayHealthMonitor, "POLL_INTERVAL", 0.01)
+    server, port = await _serve(b"")
+    async with server:
+        with pytest.raises(TimeoutError):
+            await monitor.wait_ready("a", port, 0.05)
+        state_cache._states["a"] = "exited"
+        with pytest.raises(RuntimeError, match="容器已退出"):
+            await monitor.wait_ready("a", port, 5)
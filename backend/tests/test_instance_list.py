@@ -0,0 +1,87 @@
+"""
+实例列表：游标分页、字段选择与 ETag 重验证
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+from app.main import app
+from app.models import Instance
+from app.routers.instances import _decode_cursor, _encode_cursor
+from app.services.state_cache import state_cache
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    for i, instance_id in enumerate(["web-1", "web-2", "api-1", "中文"]):
+        db.add(Instance(id=instance_id, name=instance_id, port=20000 + 2 * i, status="stopped"))
+    db.commit()
+    monkeypatch.setattr(state_cache, "_states", {"web-1": "running"})
+    app.dependency_overrides[get_db] = lambda: db
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+
+
+def test_cursor_roundtrip():
+    for instance_id in ["a", "web-1", "中文", "x" * 50]:
+        cursor = _encode_cursor(instance_id)
+        assert "=" not in cursor
+        assert _decode_cursor(cursor) == instance_id
+
+
+def test_paginates_by_id(client):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        data = client.get("/api/instances", params=params).json()["data"]
+        seen += [i["id"] for i in data["instances"]]
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["api-1", "web-1", "web-2", "中文"]
+
+
+def test_invalid_cursor_is_rejected(client):
+    for cursor in ["%%%", "abc!", "_w"]:
+        assert client.get("/api/instances", params={"cursor": cursor}).status_code == 400
+
+
+def test_fields_and_filters(client):
+    data = client.get("/api/instances", params={"name_prefix": "web", "fields": "id,status"}).json()
+    assert data["data"]["instances"] == [
+        {"id": "web-1", "status": "running"},
+        {"id": "web-2", "status": "stopped"},
+    ]
+    assert client.get("/api/instances", params={"fields": "id,secret"}).status_code == 400
+
+
+def test_etag_revalidation(client):
+    resp = client.get("/api/instances")
+    etag = resp.headers["ETag"]
+    assert client.get("/api/instances", headers={"If-None-Match": etag}).status_code == 304
+    # 查询参数不同，ETag 不同
+    assert client.get("/api/instances", params={"limit": 1}).headers["ETag"] != etag
+
+    state_cache.touch()
+    resp = client.get("/api/instances", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+
+
+def test_status_filter_uses_displayed_state(client):
+    # 数据库中全部为 stopped，缓存中 web-1 已在运行
+    data = client.get("/api/instances", params={"status": "running", "fields": "id,status"}).json()["data"]
+    assert data["instances"] == [{"id": "web-1", "status": "running"}]
+
+    seen, cursor = [], None
+    while True:
+        params = {"status": "stopped", "limit": 1, **({"cursor": cursor} if cursor else {})}
+        data = client.get("/api/instances", params=params).json()["data"]
+        # 跳过不匹配的行后每页仍是满的
+        assert len(data["instances"]) == 1
+        seen += [(i["id"], i["status"]) for i in data["instances"]]
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [("api-1", "stopped"), ("web-2", "stopped"), ("中文", "stopped")]
@@ -0,0 +1,89 @@
+"""
+实例锁与请求合并
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.instance_locks import Coalescer, KeyedLocks
+
+
+async def test_same_key_serializes_and_different_keys_run_in_parallel():
+    locks = KeyedLocks()
+    order = []
+
+    async def op(key, name, delay):
+        async with locks.hold(key):
+            order.append(f"{name}+")
+            await asyncio.sleep(delay)
+            order.append(f"{name}-")
+
+    await asyncio.gather(op("a", "a1", 0.02), op("a", "a2", 0), op("b", "b1", 0))
+    assert order.index("a1-") < order.index("a2+")
+    # b 不必等待 a1 结束
+    assert order.index("b1-") < order.index("a1-")
+
+
+async def test_idle_locks_are_reclaimed():
+    locks = KeyedLocks()
+    async with locks.hold("a"):
+        assert locks.locked("a")
+    assert not locks.locked("a")
+    assert locks._locks == {}
+
+    with pytest.raises(RuntimeError):
+        async with locks.hold("b"):
+            raise RuntimeError
+    assert locks._locks == {}
+
+
+async def test_hold_many_in_fixed_order_does_not_deadlock():
+    locks = KeyedLocks()
+    held = []
+
+    async def batch(keys):
+        async with locks.hold_many(keys):
+            held.append(tuple(keys))
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(asyncio.gather(batch(["a", "b", "a"]), batch(["b", "a"])), 1)
+    assert len(held) == 2
+    assert locks._locks == {}
+
+
+async def test_coalescer_shares_one_execution():
+    coalescer = Coalescer()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(coalescer.run("k", work) for _ in range(3)))
+    assert results == [1, 1, 1]
+    assert coalescer.inflight() == 0
+    # 完成后的新请求重新执行
+    assert await coalescer.run("k", work) == 2
+
+
+async def test_coalescer_shares_exceptions_and_survives_cancelled_waiters():
+    coalescer = Coalescer()
+    started = asyncio.Event()
+
+    async def fail():
+        started.set()
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    first = asyncio.ensure_future(coalescer.run("k", fail))
+    await started.wait()
+    second = asyncio.ensure_future(coalescer.run("k", fail))
+    await asyncio.sleep(0)
+    # 一个等待者断开不取消共享的操作
+    first.cancel()
+    with pytest.raises(ValueError):
+        await second
+    assert coalescer.inflight() == 0
@@ -0,0 +1,135 @@
+"""
+后台任务：幂等提交、执行结果、重启恢复，以及恢复备份后不会重跑旧任务
+"""
+
+import asyncio
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from app import database
+from app.models import Instance, Job
+from app.services import job_handlers, job_service
+from app.services.job_service import JobConflictError, JobManager
+
+
+@pytest.fixture
+def manager(file_db, monkeypatch):
+    monkeypatch.setattr(job_service, "SessionLocal", file_db)
+    monkeypatch.setattr(job_service.event_bus, "publish", lambda kind, data: None)
+    m = JobManager()
+    m.calls = []
+
+    async def echo(ctx, params):
+        m.calls.append(params)
+        ctx.progress(50, "半程")
+        if params.get("fail"):
+            raise RuntimeError("boom")
+        return {"echo": params.get("value")}
+
+    m.register("test.echo", echo, resumable=True, secret_params=("password",))
+    m.register("test.once", echo)
+    return m
+
+
+async def _wait(manager):
+    await asyncio.gather(*list(manager._tasks.values()))
+
+
+async def test_submit_runs_job_and_stores_result(manager):
+    job, created = await manager.submit("test.echo", {"value": 1, "password": "p"})
+    assert created and job["status"] == "queued"
+    await _wait(manager)
+
+    done = await manager.get(job["id"])
+    assert done["status"] == "succeeded"
+    assert done["result"] == {"echo": 1}
+    assert done["progress"] == 100.0
+    # 秘密参数只随内存中的任务传递，不写入数据库
+    assert manager.calls == [{"value": 1, "password": "p"}]
+    assert "password" not in done["params"]
+
+
+async def test_failed_job_records_error_and_progress(manager):
+    job, _ = await manager.submit("test.echo", {"fail": True})
+    await _wait(manager)
+    done = await manager.get(job["id"])
+    assert (done["status"], done["error"], done["progress"]) == ("failed", "boom", 50.0)
+
+
+async def test_idempotency_key_replays_and_rejects_conflicts(manager):
+    first, created = await manager.submit("test.echo", {"value": 1}, idempotency_key="k")
+    again, created_again = await manager.submit("test.echo", {"value": 1}, idempotency_key="k")
+    assert created and not created_again
+    assert again["id"] == first["id"]
+    with pytest.raises(JobConflictError):
+        await manager.submit("test.echo", {"value": 2}, idempotency_key="k")
+    await _wait(manager)
+    assert len(manager.calls) == 1
+
+
+async def test_start_resumes_resumable_jobs_and_fails_the_rest(manager, file_db):
+    session = file_db()
+    session.add(Job(id="r", kind="test.echo", status="running", params='{"value": 7}'))
+    session.add(Job(id="o", kind="test.once", status="queued", params="{}"))
+    session.commit()
+    session.close()
+
+    await manager.start()
+    await _wait(manager)
+    assert (await manager.get("r"))["result"] == {"echo": 7}
+    once = await manager.get("o")
+    assert once["status"] == "failed"
+    assert manager.calls == [{"value": 7}]
+
+
+async def test_finish_tolerates_missing_job_row(manager):
+    await manager._finish("gone", "succeeded", result={})
+
+
+async def test_restored_database_does_not_resurrect_running_jobs(manager, file_db, tmp_path):
+    # 备份时有一个运行中的任务
+    session = file_db()
+    session.add(Job(id="stale", kind="test.echo", status="running", params="{}"))
+    session.commit()
+    session.close()
+    snapshot = tmp_path / "snap.db"
+    database.snapshot_database(snapshot, ("jobs",))
+    with closing(sqlite3.connect(snapshot)) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM jobs").fetchone() == (0,)
+
+    session = file_db()
+    session.query(Job).delete()
+    session.commit()
+    session.close()
+    database.restore_database(snapshot)
+
+    await manager.start()
+    await _wait(manager)
+    assert manager.calls == []
+    assert await manager.get("stale") is None
+
+
+
+async def test_create_instance_job_does_not_store_or_publish_gateway_token(manager, file_db, monkeypatch):
+    class FakeService:
+        def __init__(self, db):
+            pass
+
+        async def create_instance(self, instance_id, name, password):
+            return Instance(id=instance_id, name=name, port=20000, status="created"), "secret-token"
+
+    published = []
+    monkeypatch.setattr(job_service.event_bus, "publish", lambda kind, data: published.append(data))
+    monkeypatch.setattr(job_handlers, "SessionLocal", file_db)
+    monkeypatch.setattr(job_handlers, "InstanceService", FakeService)
+    manager.register("test.create", job_handlers.create_instance, secret_params=("password",))
+
+    job, _ = await manager.submit("test.create", {"id": "a", "name": "a", "password": "p"})
+    await _wait(manager)
+    done = await manager.get(job["id"])
+    assert done["status"] == "succeeded"
+    assert done["result"]["instance"]["id"] == "a"
+    assert "secret-token" not in str(done)
+    assert published and "secret-token" not in str(published)
@@ -0,0 +1,82 @@
+"""
+日志归档：分段写入、稀疏索引检索与过期清理
+"""
+
+import gzip
+import re
+import time
+
+import pytest
+
+from app.services.log_archive import INDEX_SUFFIX, SEGMENT_SUFFIX, LogArchive, parse_timestamp
+
+BASE = 1_700_000_000_000
+
+
+def _line(ts: int, text: str) -> str:
+    """构造 docker --timestamps 格式的日志行"""
+    stamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ts // 1000))
+    return f"{stamp}.{ts % 1000:03d}123456Z {text}"
+
+
+@pytest.fixture
+def archive(tmp_path) -> LogArchive:
+    return LogArchive(tmp_path / "logs")
+
+
+def _write(archive: LogArchive, stamps: list[int]) -> None:
+    for ts in stamps:
+        archive.append(ts, _line(ts, f"msg {ts - BASE}"))
+    archive.write_block(archive.take())
+
+
+def test_parse_timestamp():
+    assert parse_timestamp(_line(BASE + 42, "x")) == BASE + 42
+    assert parse_timestamp("2023-11-14T22:13:20Z x") == BASE
+    assert parse_timestamp("no timestamp") is None
+
+
+def test_query_by_time_range_and_pattern(archive):
+    _write(archive, [BASE, BASE + 1000])
+    _write(archive, [BASE + 2000, BASE + 3000])
+
+    def texts(**kwargs):
+        return [line.split(" ", 1)[1] for line in archive.query(**kwargs)]
+
+    assert texts() == ["msg 0", "msg 1000", "msg 2000", "msg 3000"]
+    assert texts(since=BASE + 1000, until=BASE + 2000) == ["msg 1000", "msg 2000"]
+    assert texts(pattern=re.compile(r"msg [23]")) == ["msg 2000", "msg 3000"]
+    assert texts(limit=3) == ["msg 0", "msg 1000", "msg 2000"]
+    assert archive.last_timestamp() == BASE + 3000
+
+
+def test_segment_is_concatenated_gzip_with_index(archive):
+    _write(archive, [BASE])
+    _write(archive, [BASE + 1])
+    segment = archive.segments()[0]
+    data = (archive.root / f"{segment}{SEGMENT_SUFFIX}").read_bytes()
+    assert gzip.decompress(data).decode().count("\n") == 2
+    assert len((archive.root / f"{segment}{INDEX_SUFFIX}").read_text().splitlines()) == 2
+
+
+def test_query_ignores_partial_index_rows(archive):
+    _write(archive, [BASE])
+    segment = archive.segments()[0]
+    with (archive.root / f"{segment}{INDEX_SUFFIX}").open("a") as f:
+        f.write("123 45")
+    assert len(list(archive.query())) == 1
+
+
+def test_segments_rotate_and_expired_ones_are_pruned(archive, monkeypatch):
+    monkeypatch.setattr("app.services.log_archive.settings.log_segment_seconds", 60)
+    monkeypatch.setattr("app.services.log_archive.settings.log_retention_days", 1)
+    now = int(time.time() * 1000)
+    old = now - 3 * 86400 * 1000
+    _write(archive, [old])
+    _write(archive, [old + 120_000])
+    assert len(archive.segments()) == 2
+
+    # 新分段轮转时清理整段早于保留期限的分段
+    _write(archive, [now])
+    assert archive.segments() == [old + 120_000, now]
+    assert [parse_timestamp(line) for line in archive.query()] == [old + 120_000, now]
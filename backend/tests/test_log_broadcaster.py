@@ -0,0 +1,141 @@
+"""
+实例日志广播：共享上游、环形缓冲与慢订阅者策略
+"""
+
+import asyncio
+import re
+
+import pytest
+
+from app.services import log_broadcaster
+from app.services.log_broadcaster import (
+    LogHub,
+    LogLagError,
+    LogSubscription,
+    batch_lines,
+    make_line_filter,
+)
+
+
+def test_subscription_drop_oldest_keeps_latest_lines():
+    sub = LogSubscription(2, "drop_oldest")
+    for line in ["1", "2", "3"]:
+        sub.offer(line)
+    assert sub.dropped == 1
+    assert [sub.get_nowait(), sub.get_nowait()] == ["2", "3"]
+
+
+def test_subscription_drop_newest_keeps_earliest_lines():
+    sub = LogSubscription(2, "drop_newest")
+    for line in ["1", "2", "3"]:
+        sub.offer(line)
+    assert sub.dropped == 1
+    assert [sub.get_nowait(), sub.get_nowait()] == ["1", "2"]
+
+
+async def test_subscription_disconnect_raises_lag_error():
+    sub = LogSubscription(1, "disconnect")
+    sub.offer("1")
+    sub.offer("2")
+    with pytest.raises(LogLagError):
+        await sub.get()
+    sub.offer("3")
+    assert sub.queue.empty()
+
+
+class FakeDocker:
+    """按需产出日志行的假上游；记录被跟随的次数"""
+
+    follows = 0
+
+    def __init__(self):
+        self.lines: asyncio.Queue = FakeDocker.queue
+
+    async def stream_logs(self, instance_id, tail="100"):
+        FakeDocker.follows += 1
+        while (line := await self.lines.get()) is not None:
+            yield line
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    FakeDocker.follows = 0
+    FakeDocker.queue = asyncio.Queue()
+    monkeypatch.setattr(log_broadcaster, "DockerService", FakeDocker)
+    return FakeDocker.queue
+
+
+async def test_hub_shares_one_upstream_and_replays_buffer(upstream):
+    hub = LogHub()
+    async with hub.subscribe("a") as first:
+        upstream.put_nowait("hello")
+        assert await first.get() == "hello"
+
+        async with hub.subscribe("a") as second:
+            # 后加入的订阅者先收到缓冲中的历史行
+            assert await second.get() == "hello"
+            upstream.put_nowait("world")
+            assert await first.get() == "world"
+            assert await second.get() == "world"
+            assert hub.stats() == {"a": {"subscribers": 2, "buffered": 2}}
+        assert FakeDocker.follows == 1
+    # 最后一个订阅者离开后上游关闭
+    assert hub.stats() == {}
+
+
+async def test_upstream_end_closes_subscribers(upstream):
+    hub = LogHub()
+    async with hub.subscribe("a") as sub:
+        upstream.put_nowait("x")
+        upstream.put_nowait(None)
+        assert [line async for line in sub] == ["x"]
+
+
+def test_line_filter_by_level_and_pattern():
+    assert make_line_filter() is None
+    accept = make_line_filter("warn")
+    assert accept("2024 WARN disk low")
+    assert accept("[error] boom")
+    assert not accept("debug: tick")
+    # 无法识别级别的行按 info 处理
+    assert not accept("plain line")
+
+    accept = make_line_filter("info", r"gateway \d+")
+    assert accept("info gateway 42 ready")
+    assert not accept("info gateway ready")
+    with pytest.raises(re.error):
+        make_line_filter(pattern="(")
+
+
+async def test_batch_lines_groups_by_count_and_bytes():
+    sub = LogSubscription(100, "drop_oldest")
+    for i in range(5):
+        sub.offer(f"line{i}")
+    sub.close()
+    batches = [b async for b in batch_lines(sub, 1.0, max_lines=2, max_bytes=1024)]
+    assert batches == [["line0", "line1"], ["line2", "line3"], ["line4"]]
+
+    sub = LogSubscription(100, "drop_oldest")
+    for line in ["x" * 10, "y" * 10, "z"]:
+        sub.offer(line)
+    sub.close()
+    batches = [b async for b in batch_lines(sub, 1.0, max_lines=100, max_bytes=15)]
+    assert batches == [["x" * 10, "y" * 10], ["z"]]
+
+
+async def test_batch_lines_flushes_after_interval():
+    sub = LogSubscription(100, "drop_oldest")
+    sub.offer("first")
+    batches = batch_lines(sub, 0.01, max_lines=100, max_bytes=1024)
+    assert await asyncio.wait_for(batches.__anext__(), 1) == ["first"]
+    sub.close()
+    await batches.aclose()
+
+
+async def test_batch_lines_filters_and_reports_dropped_lines():
+    sub = LogSubscription(2, "drop_oldest")
+    for line in ["info a", "debug b", "info c"]:
+        sub.offer(line)
+    sub.close()
+    batches = [b async for b in batch_lines(sub, 1.0, 100, 1024, make_line_filter("info"))]
+    assert batches == [["info c", "[... 客户端处理过慢，已跳过 1 行日志 ...]"]]
@@ -0,0 +1,92 @@
+"""
+Prometheus 指标：文本格式、路由模板标签与容器资源样本
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+from app.main import app
+from app.services.container_stats import container_stats, summarize
+from app.services.metrics import Counter, Histogram, http_request_duration, timed_docker_operation
+
+
+def test_counter_and_histogram_render_text_format():
+    counter = Counter("t_total", "测试", ("op",))
+    counter.inc(op="a")
+    counter.inc(2, op='q"x')
+    assert counter.render() == [
+        "# HELP t_total 测试",
+        "# TYPE t_total counter",
+        't_total{op="a"} 1',
+        't_total{op="q\\"x"} 2',
+    ]
+
+    hist = Histogram("t_seconds", "测试", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        hist.observe(value)
+    assert hist.render()[2:] == [
+        't_seconds_bucket{le="0.1"} 1',
+        't_seconds_bucket{le="1"} 2',
+        't_seconds_bucket{le="+Inf"} 3',
+        "t_seconds_sum 5.55",
+        "t_seconds_count 3",
+    ]
+
+
+async def test_timed_docker_operation_counts_failures(monkeypatch):
+    hist = Histogram("d_seconds", "测试", ("operation",))
+    failures = Counter("d_total", "测试", ("operation",))
+    monkeypatch.setattr("app.services.metrics.docker_operation_duration", hist)
+    monkeypatch.setattr("app.services.metrics.docker_operation_failures", failures)
+
+    @timed_docker_operation("boom")
+    async def boom():
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        await boom()
+    assert 'd_total{operation="boom"} 1' in failures.render()
+    assert 'd_seconds_count{operation="boom"} 1' in hist.render()
+
+
+def test_metrics_endpoint_labels_requests_by_route_template(db):
+    client = TestClient(app)
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        client.get("/api/instances/abc/config")
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+    client.get("/no/such/path")
+    body = client.get("/metrics").text
+    assert 'route="/api/instances/{instance_id}/config"' in body
+    assert 'route="unmatched"' in body
+    assert "/api/instances/abc/config" not in body
+    assert "# TYPE claw_instances gauge" in body
+    assert any(k[1] == "/api/instances/{instance_id}/config" for k in http_request_duration._values)
+
+
+def test_summarize_container_stats(monkeypatch):
+    sample = {
+        "cpu_stats": {"cpu_usage": {"total_usage": 3_000_000_000}, "system_cpu_usage": 200, "online_cpus": 2},
+        "precpu_stats": {"cpu_usage": {"total_usage": 2_999_999_990}, "system_cpu_usage": 100},
+        "memory_stats": {"usage": 1000, "limit": 4000, "stats": {"inactive_file": 300}},
+        "networks": {"eth0": {"rx_bytes": 10, "tx_bytes": 20}, "eth1": {"rx_bytes": 1, "tx_bytes": 2}},
+        "blkio_stats": {"io_service_bytes_recursive": [
+            {"op": "Read", "value": 5}, {"op": "Write", "value": 7}, {"op": "read", "value": 1},
+        ]},
+        "pids_stats": {"current": 12},
+    }
+    summary = summarize(sample)
+    assert summary["cpu_seconds"] == 3.0
+    assert summary["cpu_percent"] == pytest.approx(20.0)
+    assert summary["memory_usage"] == 700
+    assert (summary["rx_bytes"], summary["tx_bytes"]) == (11, 22)
+    assert (summary["blkio_read"], summary["blkio_write"]) == (6, 7)
+    assert summary["pids"] == 12
+
+    monkeypatch.setattr(container_stats, "_samples", {"a": summary})
+    monkeypatch.setattr(container_stats, "_restarts", {"a": 2})
+    lines = container_stats.collect()
+    assert 'claw_container_memory_usage_bytes{instance="a"} 700' in lines
+    assert 'claw_container_restarts_total{instance="a"} 2' in lines
@@ -0,0 +1,94 @@
+"""
+网关端口分配：位图、宿主机端口探测与重新加载
+"""
+
+import threading
+
+import pytest
+
+from app.services import port_allocator as port_allocator_module
+from app.services.port_allocator import PortAllocator
+
+BASE = 20000
+
+
+@pytest.fixture
+def allocator(monkeypatch) -> PortAllocator:
+    monkeypatch.setattr(port_allocator_module.settings, "port_check_host", False)
+    alloc = PortAllocator(base_port=BASE, max_port=BASE + 7)
+    alloc.load([])
+    return alloc
+
+
+def test_reserve_takes_lowest_free_pair_and_release_reuses_it(allocator):
+    assert [allocator.reserve() for _ in range(3)] == [BASE, BASE + 2, BASE + 4]
+    allocator.release(BASE + 2)
+    assert allocator.reserve() == BASE + 2
+
+
+def test_reserve_raises_when_exhausted(allocator):
+    for _ in range(4):
+        allocator.reserve()
+    with pytest.raises(RuntimeError):
+        allocator.reserve()
+
+
+def test_unaligned_port_blocks_both_slots(allocator):
+    allocator.load([BASE + 1])
+    assert allocator.reserve() == BASE + 4
+    assert allocator.recommended(10) == [BASE + 6]
+
+
+def test_pin_rejects_taken_ports(allocator):
+    allocator.load([BASE])
+    assert allocator.pin(BASE) is False
+    assert allocator.pin(BASE + 1) is False
+    assert allocator.pin(BASE + 2) is True
+    assert allocator.reserve() == BASE + 4
+
+
+def test_reservation_releases_on_error(allocator):
+    with pytest.raises(ValueError):
+        with allocator.reservation() as port:
+            raise ValueError("commit failed")
+    assert allocator.reserve() == port
+
+
+def test_load_keeps_pinned_and_pending_reservations(allocator):
+    allocator.reserve(pinned=True)
+    with allocator.reservation() as port:
+        # 恢复备份后按数据库重建位图：尚未入库的端口不能被再次分配
+        allocator.load([BASE + 6])
+        assert allocator.used_ports() == [BASE, port, BASE + 6]
+        assert allocator.recommended(10) == [BASE + 4]
+    # 块正常结束（实例已入库）后不再视为待定，重新加载以数据库为准
+    allocator.load([])
+    assert allocator.used_ports() == [BASE]
+
+
+def test_host_probe_skips_busy_ports_outside_the_lock(allocator, monkeypatch):
+    monkeypatch.setattr(port_allocator_module.settings, "port_check_host", True)
+    probed_unlocked = []
+
+    def _free(port):
+        probed_unlocked.append(allocator._lock.acquire(blocking=False))
+        if probed_unlocked[-1]:
+            allocator._lock.release()
+        return port not in (BASE, BASE + 1)
+
+    monkeypatch.setattr(port_allocator_module, "_host_port_free", _free)
+    assert allocator.recommended(2) == [BASE + 2, BASE + 4]
+    assert allocator.reserve() == BASE + 2
+    assert all(probed_unlocked)
+    # 被跳过的端口对不保持占用
+    assert allocator.used_ports() == [BASE + 2]
+
+
+def test_concurrent_reserves_get_distinct_ports(allocator):
+    ports = []
+    threads = [threading.Thread(target=lambda: ports.append(allocator.reserve())) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(ports) == [BASE, BASE + 2, BASE + 4, BASE + 6]
@@ -0,0 +1,98 @@
+"""
+实例状态缓存：Docker 事件 → 实例状态，以及批量回写数据库
+"""
+
+import pytest
+
+from app.services import state_cache as state_cache_module
+from app.services.state_cache import ContainerStateCache, _container_status
+
+
+def _event(action: str, instance_id: str, **attrs) -> dict:
+    return {"Action": action, "Actor": {"Attributes": {"name": f"openclaw-{instance_id}", **attrs}}}
+
+
+@pytest.fixture
+def cache() -> ContainerStateCache:
+    c = ContainerStateCache()
+    c._states = {"a": "stopped", "b": "running"}
+    return c
+
+
+def test_container_status_mapping():
+    assert _container_status("running", "Up 3 minutes") == "running"
+    assert _container_status("paused", "Up (Paused)") == "running"
+    assert _container_status("created", "Created") == "created"
+    assert _container_status("exited", "Exited (0) 2 minutes ago") == "stopped"
+    assert _container_status("exited", "Exited (137) 1 second ago") == "stopped"
+    assert _container_status("exited", "Exited (1) 1 second ago") == "error"
+    assert _container_status("dead", "") == "error"
+
+
+async def test_events_drive_status(cache):
+    cache._handle(_event("start", "a"))
+    assert cache.get("a") == "running"
+
+    # 先 kill 再 die：正常停止
+    cache._handle(_event("kill", "a"))
+    cache._handle(_event("die", "a", exitCode="137"))
+    assert cache.get("a") == "stopped"
+
+    # 未经 kill 的非零退出：崩溃
+    cache._handle(_event("die", "b", exitCode="1"))
+    assert cache.get("b") == "error"
+
+
+async def test_events_for_unknown_or_foreign_containers_are_ignored(cache):
+    version = cache.version
+    cache._handle(_event("start", "unknown"))
+    cache._handle({"Action": "start", "Actor": {"Attributes": {"name": "postgres"}}})
+    assert cache.get("unknown") is None
+    assert cache.version == version
+
+
+async def test_changes_bump_version_and_mark_dirty(cache):
+    version = cache.version
+    cache._handle(_event("start", "a"))
+    cache._handle(_event("start", "a"))
+    assert cache.version == version + 1
+    assert cache._dirty == {"a": "running"}
+
+    # 路由写入时已提交数据库，不再回写
+    cache.set("a", "stopped")
+    assert cache._dirty == {}
+
+
+async def test_flush_writes_batch(cache, monkeypatch):
+    written = []
+    monkeypatch.setattr(state_cache_module, "_write_statuses", lambda p: written.append(dict(p)))
+    cache._handle(_event("start", "a"))
+    cache._handle(_event("die", "b", exitCode="1"))
+
+    await cache.flush()
+    assert written == [{"a": "running", "b": "error"}]
+    assert cache._dirty == {}
+
+
+async def test_failed_flush_requeues_without_overwriting_newer_state(cache, monkeypatch):
+    def fail(pending):
+        # 写库期间：a 又发生变化，b 由路由写入，均比本批次新
+        cache._handle(_event("kill", "a"))
+        cache._handle(_event("die", "a", exitCode="0"))
+        cache.set("b", "stopped")
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(state_cache_module, "_write_statuses", fail)
+    cache._states["c"] = "stopped"
+    cache._handle(_event("start", "a"))
+    cache._handle(_event("die", "b", exitCode="1"))
+    cache._handle(_event("start", "c"))
+
+    with pytest.raises(RuntimeError):
+        await cache.flush()
+    assert cache._dirty == {"a": "stopped", "c": "running"}
+
+    written = []
+    monkeypatch.setattr(state_cache_module, "_write_statuses", lambda p: written.append(dict(p)))
+    await cache.flush()
+    assert written == [{"a": "stopped", "c": "running"}]
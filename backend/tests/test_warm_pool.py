@@ -0,0 +1,98 @@
+"""
+实例预热池：补齐槽位、认领、重启后重新占用端口
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from app.config import settings
+from app.services import warm_pool as warm_pool_module
+from app.services.port_allocator import PortAllocator
+from app.services.warm_pool import SLOT_FILE, WarmPool
+
+BASE = 20000
+
+
+@pytest.fixture
+def allocator(tmp_path, monkeypatch) -> PortAllocator:
+    monkeypatch.setattr(settings, "port_check_host", False)
+    monkeypatch.setattr(warm_pool_module, "POOL_DIR", tmp_path / "warm-pool")
+    alloc = PortAllocator(base_port=BASE, max_port=BASE + 7)
+    alloc.load([])
+    monkeypatch.setattr(warm_pool_module, "port_allocator", alloc)
+    return alloc
+
+
+async def _filled(pool: WarmPool) -> None:
+    for _ in range(100):
+        if pool.ready() == pool.size:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("预热池未补齐")
+
+
+def test_disabled_by_default():
+    assert type(settings).model_fields["warm_pool_size"].default == 0
+
+
+async def test_refills_and_claims_slots(allocator, tmp_path):
+    pool = WarmPool(2)
+    await pool.start()
+    try:
+        await _filled(pool)
+        assert allocator.used_ports() == [BASE, BASE + 2]
+
+        dest = tmp_path / "instances" / "a"
+        assert await pool.claim(dest) == BASE
+        assert (dest / "data" / "openclaw.json").exists()
+        assert not (dest / SLOT_FILE).exists()
+        # 认领后端口仍被占用，并在后台补上一个新槽位
+        assert allocator.is_pinned(BASE)
+        await _filled(pool)
+        assert allocator.used_ports() == [BASE, BASE + 2, BASE + 4]
+    finally:
+        await pool.stop()
+
+
+async def test_existing_destination_is_not_claimed(allocator, tmp_path):
+    pool = WarmPool(1)
+    await pool.start()
+    try:
+        await _filled(pool)
+        dest = tmp_path / "instances" / "a"
+        dest.mkdir(parents=True)
+        assert await pool.claim(dest) is None
+        assert pool.ready() == 1
+    finally:
+        await pool.stop()
+
+
+async def test_restart_repins_complete_slots_and_drops_broken_ones(allocator):
+    pool = WarmPool(1)
+    await pool.start()
+    await _filled(pool)
+    await pool.stop()
+    pool_dir = warm_pool_module.POOL_DIR
+    (pool_dir / "broken").mkdir()
+    (pool_dir / "broken" / SLOT_FILE).write_text(json.dumps({"port": BASE + 4}), encoding="utf-8")
+
+    # 重启：端口位图从数据库重建，预热槽位的端口需重新占用
+    allocator.load([])
+    restarted = WarmPool(0)
+    await restarted.start()
+    assert restarted.ready() == 1
+    assert allocator.used_ports() == [BASE]
+    assert not (pool_dir / "broken").exists()
+
+
+async def test_slot_whose_port_was_taken_is_discarded(allocator, tmp_path):
+    pool = WarmPool(1)
+    await pool.start()
+    await _filled(pool)
+    await pool.stop()
+    # 恢复备份后端口位图按实例重建，槽位端口已被实例占用
+    allocator.load([BASE])
+    assert await pool.claim(tmp_path / "instances" / "a") is None
+    assert list(warm_pool_module.POOL_DIR.iterdir()) == []
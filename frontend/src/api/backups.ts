@@ -1,18 +1,30 @@
 import request from './request'
 import type { ApiResponse } from '../types'
+import { idempotencyHeaders } from './jobs'
 
 export const getBackups = () => {
   return request.get<ApiResponse>('/backups')
 }
 
 export const createBackup = () => {
-  return request.post<ApiResponse>('/backups')
+  return request.post<ApiResponse>('/backups', null, idempotencyHeaders())
 }
 
 export const deleteBackup = (id: number) => {
   return request.delete<ApiResponse>(`/backups/${id}`)
 }
 
-export const restoreBackup = (id: number) => {
-  return request.post<ApiResponse>(`/backups/${id}/restore`)
+export const restoreBackup = (id: number, instanceId?: string) => {
+  return request.post<ApiResponse>(`/backups/${id}/restore`, null, {
+    params: instanceId ? { instance_id: instanceId } : undefined,
+    ...idempotencyHeaders(),
+  })
+}
+
+export const backupInstance = (instanceId: string) => {
+  return request.post<ApiResponse>(`/instances/${instanceId}/backup`, null, idempotencyHeaders())
+}
+
+export const getBackupProgress = () => {
+  return request.get<ApiResponse>('/backups/progress')
 }
@@ -1,12 +1,13 @@
 import request from './request'
 import type { ApiResponse, Instance } from '../types'
+import { idempotencyHeaders } from './jobs'
 
 export const getInstances = () => {
   return request.get<ApiResponse>('/instances')
 }
 
 export const createInstance = (id: string, name: string, password: string) => {
-  return request.post<ApiResponse>('/instances', { id, name, password })
+  return request.post<ApiResponse>('/instances', { id, name, password }, idempotencyHeaders())
 }
 
 export const deleteInstance = (id: string, keepData: boolean = false) => {
@@ -22,7 +23,7 @@ export const stopInstance = (id: string) => {
 }
 
 export const initInstance = (id: string) => {
-  return request.post<ApiResponse>(`/instances/${id}/init`)
+  return request.post<ApiResponse>(`/instances/${id}/init`, null, idempotencyHeaders())
 }
 
 export const getInstanceConfig = (id: string) => {
@@ -48,3 +49,34 @@ export const approveDevice = (id: string, requestId: string) => {
 export const updateInstanceConfig = (id: string, content: string) => {
   return request.put<ApiResponse>(`/instances/${id}/config`, { content })
 }
+
+export const batchInstances = (
+  action: 'start' | 'stop' | 'restart',
+  ids?: string[],
+  status?: string,
+  all = false,
+) => {
+  return request.post<ApiResponse>('/instances:batch', { action, ids, status, all })
+}
+
+export const queryInstanceLogs = (
+  id: string,
+  params: { since?: string; until?: string; q?: string; limit?: number } = {},
+) => {
+  return request.get<string>(`/instances/${id}/logs`, { params, responseType: 'text' })
+}
+
+export const patchInstanceConfig = (id: string, patch: Record<string, unknown>) => {
+  return request.patch<ApiResponse>(`/instances/${id}/config`, patch, {
+    headers: { 'Content-Type': 'application/merge-patch+json' },
+  })
+}
+
+export const batchPatchConfig = (
+  patch: Record<string, unknown>,
+  ids?: string[],
+  status?: string,
+  all = false,
+) => {
+  return request.post<ApiResponse>('/instances:patch-config', { patch, ids, status, all })
+}
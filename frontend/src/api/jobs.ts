@@ -0,0 +1,31 @@
+import request from './request'
+import type { ApiResponse, Job } from '../types'
+
+export const getJobs = (params?: { kind?: string; status?: string; limit?: number }) => {
+  return request.get<ApiResponse>('/jobs', { params })
+}
+
+export const getJob = (id: string) => {
+  return request.get<ApiResponse>(`/jobs/${id}`)
+}
+
+/** 提交后台任务时携带的幂等键：同一次操作重试时复用，服务端不会重复执行 */
+export const idempotencyHeaders = (key: string = crypto.randomUUID()) => ({
+  headers: { 'Idempotency-Key': key },
+})
+
+/** 轮询任务直到结束；成功返回任务（结果在 job.result），失败时抛出任务错误 */
+export const waitForJob = async (
+  id: string,
+  onProgress?: (job: Job) => void,
+  intervalMs: number = 1000,
+): Promise<Job> => {
+  for (;;) {
+    const res = await getJob(id)
+    const job: Job = res.data.data.job
+    onProgress?.(job)
+    if (job.status === 'succeeded') return job
+    if (job.status === 'failed') throw new Error(job.error || '任务失败')
+    await new Promise((resolve) => setTimeout(resolve, intervalMs))
+  }
+}
@@ -8,3 +8,29 @@ export const getSystemStatus = () => {
 export const getAvailablePorts = () => {
   return request.get<ApiResponse>('/system/ports')
 }
+
+/** 订阅服务端事件流（SSE），浏览器断线后会携带 Last-Event-ID 自动重连 */
+export const subscribeEvents = (
+  onEvent: (type: string, data: any) => void,
+  types?: string[],
+) => {
+  const query = types?.length ? `?types=${encodeURIComponent(types.join(','))}` : ''
+  const source = new EventSource(`/api/events${query}`)
+  const eventTypes = [
+    'instance.created',
+    'instance.deleted',
+    'instance.status',
+    'instance.health',
+    'backup.created',
+    'backup.deleted',
+    'backup.progress',
+    'system.health',
+    'job.status',
+    'job.progress',
+    'resync',
+  ]
+  for (const type of eventTypes) {
+    source.addEventListener(type, (e) => onEvent(type, JSON.parse((e as MessageEvent).data)))
+  }
+  return source
+}
@@ -14,9 +14,11 @@ import {
 import {
   getBackups as apiGetBackups,
   createBackup as apiCreateBackup,
-  deleteBackup as apiDeleteBackup
+  deleteBackup as apiDeleteBackup,
+  restoreBackup as apiRestoreBackup
 } from '../api/backups'
 import { getSystemStatus as apiGetSystemStatus } from '../api/system'
+import { waitForJob } from '../api/jobs'
 
 export const useInstanceStore = defineStore('instances', () => {
   // State
@@ -45,10 +47,15 @@ export const useInstanceStore = defineStore('instances', () => {
     }
   }
 
+  // 创建、初始化与备份为后台任务：提交后等待任务结束，返回任务结果
   async function createInstance(id: string, name: string, password: string) {
     const res = await apiCreateInstance(id, name, password)
-    await fetchInstances()
-    return res.data
+    try {
+      const job = await waitForJob(res.data.data.job.id)
+      return job.result
+    } finally {
+      await fetchInstances()
+    }
   }
 
   async function deleteInstance(id: string, keepData: boolean = false) {
@@ -67,7 +74,9 @@ export const useInstanceStore = defineStore('instances', () => {
   }
 
   async function initInstance(id: string) {
-    return await apiInitInstance(id)
+    const res = await apiInitInstance(id)
+    const job = await waitForJob(res.data.data.job.id)
+    return job.result
   }
 
   async function getInstanceConfig(id: string) {
@@ -85,10 +94,21 @@ export const useInstanceStore = defineStore('instances', () => {
   }
 
   async function createBackup() {
-    await apiCreateBackup()
+    const res = await apiCreateBackup()
+    await waitForJob(res.data.data.job.id)
     await fetchBackups()
   }
 
+  async function restoreBackup(id: number, instanceId?: string) {
+    const res = await apiRestoreBackup(id, instanceId)
+    try {
+      const job = await waitForJob(res.data.data.job.id)
+      return job.result
+    } finally {
+      await fetchInstances()
+    }
+  }
+
   async function deleteBackup(id: number) {
     await apiDeleteBackup(id)
     await fetchBackups()
@@ -117,6 +137,7 @@ export const useInstanceStore = defineStore('instances', () => {
     updateInstanceConfig,
     fetchBackups,
     createBackup,
+    restoreBackup,
     deleteBackup,
     fetchSystemStatus
   }
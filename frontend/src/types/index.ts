@@ -5,15 +5,25 @@ export interface Instance {
   name: string
   port: number
   status: 'created' | 'running' | 'stopped' | 'error'
+  health?: InstanceHealth | null
   created_at: string
   updated_at: string
 }
 
+/** 最近一次网关端口探测结果（仅运行中实例） */
+export interface InstanceHealth {
+  up: boolean
+  latency_ms: number | null
+  error: string | null
+  checked_at: number
+}
+
 export interface Backup {
   id: number
   filename: string
   size: number
   instance_count: number
+  instance_id: string | null
   created_at: string
 }
 
@@ -22,6 +32,33 @@ export interface SystemStatus {
   base_port: number
   instance_count: number
   running_count: number
+  docker?: {
+    running: boolean
+    details: {
+      server_version?: string
+      containers?: number
+      containers_running?: number
+      storage_driver?: string
+      [key: string]: unknown
+    }
+    error: string | null
+    checked_at: number | null
+  }
+}
+
+export interface Job<R = any> {
+  id: string
+  kind: string
+  status: 'queued' | 'running' | 'succeeded' | 'failed'
+  params: Record<string, unknown>
+  result: R | null
+  error: string | null
+  progress: number
+  message: string | null
+  attempts: number
+  created_at: string
+  started_at: string | null
+  finished_at: string | null
 }
 
 export interface ApiResponse<T = any> {